@@ -6,7 +6,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional, Tuple
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
 
 
 DEBUG_API = Blueprint("debug", __name__)
@@ -14,6 +14,7 @@ MAP_API = Blueprint("map", __name__)
 PKG_API = Blueprint("package", __name__)
 ROBOT_API = Blueprint("robot", __name__)
 SIM_API = Blueprint("sim", __name__)
+STATIONS_API = Blueprint("stations", __name__)
 
 
 def json_response(payload: Dict[str, Any], status: int = 200):
@@ -28,3 +29,17 @@ def json_response(payload: Dict[str, Any], status: int = 200):
         A Flask Response object with application/json content type.
     """
     return jsonify(payload), status
+
+
+def json_raw_response(body: str, status: int = 200):
+    """
+    Return an already JSON-encoded body without re-serializing it.
+
+    Args:
+        body: JSON text.
+        status: HTTP status code (default: 200).
+
+    Returns:
+        A Flask Response object with application/json content type.
+    """
+    return Response(body, status=status, mimetype="application/json")
@@ -1,7 +1,13 @@
 """
 API for basic debugging purposes.
 """
-from flask import g, render_template
+import pstats
+
+from flask import Response, current_app, g, render_template, request
+
+from backend.metrics import METRICS, simulation_gauges
+from backend.profiling import PROFILER, render
+from backend.warmup import WARMUP
 from . import json_response, DEBUG_API
 
 
@@ -13,6 +19,16 @@ def api_index():
     return render_template("index.html", sim=g.sim)
 
 
+@DEBUG_API.route("/ready", methods=["GET"])
+def api_ready():
+    """
+    Readiness: 200 once the startup warmup has finished, 503 before.
+    Returns the state and duration of every warmup stage.
+    """
+    status = WARMUP.status()
+    return json_response(status, 200 if status["ready"] else 503)
+
+
 @DEBUG_API.route("/api/hello", methods=["GET"])
 def api_hello():
     """
@@ -29,3 +45,80 @@ def api_string(text):
     Example: /api/string/test → { "received": "test" }
     """
     return json_response({"received": text})
+
+
+@DEBUG_API.route("/api/debug/metrics", methods=["GET"])
+def api_metrics():
+    """
+    Request latencies, route job / routing timers and simulation gauges
+    in the Prometheus text format.
+    """
+    body = METRICS.render(simulation_gauges(g.sim))
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+def _profiling_disabled():
+    if current_app.config.get("PROFILING"):
+        return None
+    return json_response({"error": "Profiling is disabled (start the backend with KVV_PROFILING=1)."}, 403)
+
+
+@DEBUG_API.route("/api/debug/profile", methods=["GET"])
+def api_profile_status():
+    """
+    State of the profiling session.
+    """
+    return _profiling_disabled() or json_response(PROFILER.status())
+
+
+@DEBUG_API.route("/api/debug/profile/start", methods=["POST"])
+def api_profile_start():
+    """
+    Starts a profiling session.
+    JSON: { "mode": "cprofile" | "sample" | "memory", "seconds": 30,
+            "interval_ms": 10 (sample), "frames": 10 (memory) }
+    """
+    disabled = _profiling_disabled()
+    if disabled:
+        return disabled
+    payload = request.get_json(silent=True) or {}
+    try:
+        status = PROFILER.start(
+            str(payload.get("mode", "sample")),
+            seconds=float(payload.get("seconds", 30.0)),
+            interval_s=float(payload.get("interval_ms", 10.0)) / 1000.0,
+            frames=int(payload.get("frames", 10)),
+        )
+    except (TypeError, ValueError) as e:
+        return json_response({"error": str(e)}, 400)
+    except RuntimeError as e:
+        return json_response({"error": str(e)}, 409)
+    return json_response(status)
+
+
+@DEBUG_API.route("/api/debug/profile/stop", methods=["POST"])
+def api_profile_stop():
+    """
+    Stops the session (or fetches the result of one that reached its time limit).
+    Query: format ("pstats" | "raw" for cprofile), sort (pstats key), limit,
+           group ("lineno" | "filename" | "traceback" for memory)
+    """
+    disabled = _profiling_disabled()
+    if disabled:
+        return disabled
+    sort = request.args.get("sort", "cumulative")
+    group = request.args.get("group", "lineno")
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return json_response({"error": "Invalid limit."}, 400)
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        return json_response({"error": f"Invalid sort key: {sort}"}, 400)
+    if group not in ("lineno", "filename", "traceback"):
+        return json_response({"error": "group must be lineno, filename or traceback."}, 400)
+
+    result = PROFILER.stop()
+    if result is None:
+        return json_response({"error": "No profiling session."}, 409)
+    body, mimetype = render(result, request.args.get("format"), sort=sort, limit=limit, group=group)
+    return Response(body, mimetype=mimetype)
@@ -10,13 +10,17 @@ Variante A (Backend-master):
 from __future__ import annotations
 
 from flask import request, g, jsonify
-import osmnx as ox
 
 from backend.geography import Map
+from backend.dispatch import DispatchError, parse_requests, route_batch
+from backend.road_network import (GRAPHS, ROBOT_SPEED_M_S, RoadNetworkUnavailableError, UnknownPlaceError,
+                                  distance_matrix, geocode, load_road_network)
 from backend.tram_lines import list_lines, get_line_color_by_number, get_line_color_by_id
 from . import MAP_API
 
 END_POINT = "/api/map"
+MAX_MATRIX_POINTS = 1000
+MAX_DISPATCH_ROUTES = 5000
 
 
 def _bad_request(msg: str):
@@ -26,11 +30,16 @@ def _bad_request(msg: str):
 @MAP_API.route(END_POINT, methods=["GET"])
 def api_map():
     # simple demo map (no robot polling)
-    web_map = Map(
-        start="Karlsruhe Hauptbahnhof, Germany",
-        end="Karlsruhe Durlach Bahnhof, Germany",
-        robot_id=None,
-    ).to_html()
+    try:
+        web_map = Map(
+            start="Karlsruhe Hauptbahnhof, Germany",
+            end="Karlsruhe Durlach Bahnhof, Germany",
+            robot_id=None,
+        ).to_html()
+    except UnknownPlaceError as e:
+        return _bad_request(str(e))
+    except RoadNetworkUnavailableError as e:
+        return jsonify({"error": f"Road network unavailable: {e}"}), 503
     return jsonify({"map": web_map}), 200
 
 
@@ -66,6 +75,13 @@ def api_map_route():
         duration_s = 25.0
     duration_s = max(3.0, min(duration_s, 300.0))
 
+    # optional waiting time at every station on the way
+    try:
+        dwell_s = float(payload.get("dwell_s", 0))
+    except Exception:
+        dwell_s = 0.0
+    dwell_s = max(0.0, min(dwell_s, 120.0))
+
     # tram line color
     line_number = payload.get("line_number")
     line_id = payload.get("line_id")
@@ -76,15 +92,23 @@ def api_map_route():
     elif isinstance(line_id, str) and line_id.strip():
         route_color = get_line_color_by_id(line_id.strip(), default=route_color)
 
+    city = payload.get("city", Map.CITY_DEFAULT)
+    if not isinstance(city, str) or not city.strip():
+        return _bad_request("Invalid 'city' (must be a non-empty string).")
+    city = city.strip()
+
     # compute coords once (backend uses them for simulation)
-    city = Map.CITY_DEFAULT
-    G = ox.graph_from_place(city, network_type="drive")
-    start_lat, start_lon = ox.geocode(start.strip())
-    end_lat, end_lon = ox.geocode(end.strip())
-    start_node = ox.distance.nearest_nodes(G, start_lon, start_lat)
-    end_node = ox.distance.nearest_nodes(G, end_lon, end_lat)
-    route = ox.shortest_path(G, start_node, end_node, weight="length")
-    coords = [(G.nodes[n]["y"], G.nodes[n]["x"]) for n in route]
+    try:
+        network = load_road_network(city)
+        start_lat, start_lon = geocode(start.strip())
+        end_lat, end_lon = geocode(end.strip())
+        coords, _ = network.route((start_lat, start_lon), (end_lat, end_lon))
+    except UnknownPlaceError as e:
+        return _bad_request(str(e))
+    except RoadNetworkUnavailableError as e:
+        return jsonify({"error": f"Road network unavailable: {e}"}), 503
+    except ValueError as e:  # no path between start and end
+        return _bad_request(str(e))
 
     # start backend route job
     try:
@@ -93,16 +117,19 @@ def api_map_route():
             coords=coords,
             duration_s=duration_s,
             route_color=route_color,
+            destination=end.strip(),
+            dwell_s=dwell_s,
         )
     except IndexError:
         return _bad_request("robot_id out of range. Create robot first.")
-    except Exception as e:
-        return jsonify({"error": f"Could not start route job: {e}"}), 500
+    except ValueError as e:
+        return _bad_request(f"Could not start route job: {e}")
 
     # return map that polls robot state
     web_map = Map(
         start=start.strip(),
         end=end.strip(),
+        city=city,
         route_color=route_color,
         show_grey=show_grey,
         show_km=show_km,
@@ -122,6 +149,86 @@ def api_map_route():
     ), 200
 
 
+@MAP_API.route(f"{END_POINT}/matrix", methods=["POST"])
+def api_map_matrix():
+    """
+    Road distance / duration matrix between many origins and destinations
+    (KVV stations or [lat, lon] pairs).
+    """
+    payload = request.get_json(silent=True) or {}
+    origins = payload.get("origins")
+    destinations = payload.get("destinations")
+
+    if not isinstance(origins, list) or not origins:
+        return _bad_request("Missing or invalid 'origins' (must be a non-empty list).")
+    if destinations is not None and (not isinstance(destinations, list) or not destinations):
+        return _bad_request("Invalid 'destinations' (must be a non-empty list).")
+    if len(origins) > MAX_MATRIX_POINTS or len(destinations or []) > MAX_MATRIX_POINTS:
+        return _bad_request(f"At most {MAX_MATRIX_POINTS} origins and destinations.")
+
+    try:
+        result = distance_matrix(origins, destinations)
+    except ValueError as e:
+        return _bad_request(str(e))
+    except RoadNetworkUnavailableError as e:
+        return jsonify({"error": f"Road network unavailable: {e}"}), 503
+
+    return jsonify(result.to_dict()), 200
+
+
+@MAP_API.route(f"{END_POINT}/dispatch", methods=["POST"])
+def api_map_dispatch():
+    """
+    Starts route jobs for many robots in one request (no HTML map).
+    All requests are validated and routed before any job starts.
+    """
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("routes")
+    if not isinstance(items, list) or not items:
+        return _bad_request("Missing or invalid 'routes' (must be a non-empty list).")
+    if len(items) > MAX_DISPATCH_ROUTES:
+        return _bad_request(f"At most {MAX_DISPATCH_ROUTES} routes per request.")
+    try:
+        speed = float(payload.get("speed_m_s", ROBOT_SPEED_M_S))
+    except (TypeError, ValueError):
+        speed = 0.0
+    if speed <= 0:
+        return _bad_request("Invalid 'speed_m_s' (must be a positive number).")
+
+    try:
+        parsed = parse_requests(items, len(g.sim.robots))
+    except DispatchError as e:
+        return jsonify({"error": str(e), "errors": e.to_list()}), 400
+    try:
+        network = load_road_network()
+    except RoadNetworkUnavailableError as e:
+        return jsonify({"error": f"Road network unavailable: {e}"}), 503
+    try:
+        routes = route_batch(parsed, network, speed)
+    except DispatchError as e:
+        return jsonify({"error": str(e), "errors": e.to_list()}), 400
+
+    try:
+        route_ids = g.sim.start_route_jobs([
+            {"robot_id": r.robot_id, "coords": r.coords, "duration_s": r.duration_s,
+             "destination": r.destination, "dwell_s": r.dwell_s}
+            for r in routes
+        ])
+    except ValueError as e:  # e.g. start and destination on the same node
+        return _bad_request(f"Could not start route jobs: {e}")
+    for r, route_id in zip(routes, route_ids):
+        r.route_id = route_id
+    return jsonify({"count": len(routes), "routes": [r.to_dict() for r in routes]}), 200
+
+
+@MAP_API.route(f"{END_POINT}/graphs", methods=["GET"])
+def api_map_graphs():
+    """
+    Road networks held by the graph cache and its hit / load / eviction counters.
+    """
+    return jsonify(GRAPHS.stats()), 200
+
+
 @MAP_API.route(f"{END_POINT}/lines", methods=["GET"])
 def api_map_lines():
     return jsonify({"lines": list_lines()}), 200
@@ -3,6 +3,8 @@ TODO: Docstring
 """
 from flask import g, request
 from werkzeug.exceptions import BadRequestKeyError
+from backend.assignment import assign_packages
+from backend.package_store import PackageState
 from backend.packages import PackageSize, Package
 from . import json_response, PKG_API
 
@@ -37,8 +39,110 @@ def create_new_pkg():
     except (TypeError, ValueError):
         return json_response({"error": "Invalid Robot ID or package size."}, 400)
 
-    pkg = Package(start=start, destination=destination, size=pkg_size)
+    try:
+        rec = g.sim.packages.add(robot, start=start, destination=destination, size=pkg_size)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    return json_response({"message": f"{pkg_size} Package added to Robot {robot_id}.",
+                          "package_id": rec.package_id,
+                          "robot_count": len(g.sim.robots)}, 200)
+
+
+@PKG_API.route(f"{END_POINT}/assign", methods=["POST"])
+def assign_pkgs():
+    """
+    Assigns a batch of packages to the robots with the least detour.
+    JSON body: {"packages": [{"start": str, "destination": str, "size": 0|1}, ...], "commit": bool}
+    If commit is true, the packages are loaded onto the assigned robots.
+    """
+    if g.sim.robots is None or len(g.sim.robots) == 0:
+        return json_response({"error": "No robots available"}, 404)
+
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("packages")
+    if not isinstance(items, list) or not items:
+        return json_response({"error": "Missing or invalid 'packages' (must be a non-empty list)."}, 400)
+
+    pkgs = []
+    try:
+        for item in items:
+            pkgs.append(Package(start=str(item["start"]),
+                                destination=str(item["destination"]),
+                                size=PackageSize(int(item.get("size", 0)))))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return json_response({"error": "Each package needs 'start', 'destination' and a valid 'size'."}, 400)
 
-    robot.add_package(pkg)
-    g.sim.robots[robot_id] = robot
-    return json_response({"message": f"{pkg_size} Package added to Robot {robot_id}.", "robot_count": len(g.sim.robots)}, 200)
+    robots = list(g.sim.robots)
+    try:
+        result = assign_packages(pkgs, robots)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    if bool(payload.get("commit", False)):
+        by_id = {r.robot_id: r for r in robots}
+        for i, robot_id in result.assignments:
+            g.sim.packages.add(by_id[robot_id], pkgs[i].start, pkgs[i].destination, pkgs[i].size)
+
+    return json_response(result.to_dict(), 200)
+
+
+@PKG_API.route(f"{END_POINT}/read", methods=["GET"])
+def read_pkg():
+    """
+    Returns a single package by its ID.
+    """
+    try:
+        package_id = int(request.args["package_id"])
+    except (KeyError, ValueError):
+        return json_response({"error": "Missing or invalid package_id"}, 400)
+    rec = g.sim.packages.get(package_id)
+    if rec is None:
+        return json_response({"error": "Package not found"}, 404)
+    return json_response(rec.to_dict(), 200)
+
+
+@PKG_API.route(f"{END_POINT}/list", methods=["GET"])
+def list_pkgs():
+    """
+    Lists packages, optionally filtered by destination, origin, robot_id and state.
+    Paginated through offset and limit (max. 1000).
+    """
+    args = request.args
+    try:
+        robot_id = int(args["robot_id"]) if args.get("robot_id") else None
+        state = PackageState[args["state"].upper()] if args.get("state") else None
+        offset = int(args.get("offset", 0))
+        limit = min(int(args.get("limit", 100)), 1000)
+    except (KeyError, ValueError):
+        return json_response({"error": "Invalid robot_id, state, offset or limit."}, 400)
+
+    total, records = g.sim.packages.query(
+        destination=args.get("destination") or None,
+        origin=args.get("origin") or None,
+        robot_id=robot_id,
+        state=state,
+        offset=offset,
+        limit=limit,
+    )
+    return json_response({
+        "total": total,
+        "offset": max(0, offset),
+        "limit": max(0, limit),
+        "packages": [r.to_dict() for r in records],
+    }, 200)
+
+
+@PKG_API.route(f"{END_POINT}/unload", methods=["POST"])
+def unload_pkgs():
+    """
+    Delivers all packages of a robot that are due at the given station.
+    """
+    try:
+        robot_id = int(request.args["robot_id"])
+        station = request.args["station"]
+        delivered = g.sim.unload_at(robot_id, station)
+    except (KeyError, ValueError):
+        return json_response({"error": "Missing or invalid robot_id or station."}, 400)
+    except IndexError:
+        return json_response({"error": "Robot ID out of range"}, 400)
+    return json_response({"delivered": [r.to_dict() for r in delivered]}, 200)
@@ -4,12 +4,18 @@ API for managing robots within the simulation.
 
 from __future__ import annotations
 
-from flask import g, request
+import json
+from typing import Optional
 
+from flask import Response, g, request, stream_with_context
+
+from backend.road_network import RoadNetworkUnavailableError
 from backend.robot import Robot
-from . import json_response, ROBOT_API
+from backend.trajectory import replay
+from . import json_raw_response, json_response, ROBOT_API
 
 END_POINT = "/api/robot"
+HISTORY_PAGE = 1000  # journal messages per read; the cursor continues from the last one
 
 
 @ROBOT_API.route(f"{END_POINT}/create", methods=["POST"])
@@ -44,11 +50,11 @@ def create_new_robot():
         except Exception:
             pass
 
-    # led_rgb as "r,g,b"
+    # led_rgb as "r,g,b" (every component clipped to 0..255)
     v = request.args.get("led_rgb")
     if v is not None and v != "":
         try:
-            parts = [int(x.strip()) for x in v.split(",")]
+            parts = [max(0, min(255, int(x.strip()))) for x in v.split(",")]
             if len(parts) == 3:
                 kwargs["led_rgb"] = (parts[0], parts[1], parts[2])
         except Exception:
@@ -73,7 +79,10 @@ def get_robot_status():
 
     Query:
       - robot_id: required int
-      - since_message_id: optional int (only return newer messages)
+      - since_message_id: optional int (only return newer messages; older than the
+        in-memory window are read back from the journal)
+      - fields: optional "hot" (status only contains progress and position, messages
+        only from memory)
     """
     if len(g.sim.robots) == 0:
         return json_response({"error": "No robots available"}, 404)
@@ -96,15 +105,127 @@ def get_robot_status():
         try:
             since_id = int(since)
         except Exception:
-            since_id = 0
+            since = None
+    hot = request.args.get("fields") == "hot"
 
     last_id, msgs = robot.get_messages_since(since_id)
 
-    return json_response(
-        {
-            "robot_id": robot_id,
-            "status": robot.to_dict(),
-            "last_message_id": last_id,
-            "messages": msgs,
-        }
+    # messages older than the in-memory window come from the on-disk journal, only for
+    # readers that follow a cursor (pollers without one get the in-memory window)
+    oldest_in_memory = msgs[0]["id"] if msgs else last_id + 1
+    if since and not hot and oldest_in_memory > since_id + 1:
+        history = g.sim.message_history(robot_id, since_id, oldest_in_memory, HISTORY_PAGE)
+        if len(history) >= HISTORY_PAGE and history[-1]["id"] < oldest_in_memory - 1:
+            # more history than one page: never skip ids, the next read continues here
+            msgs, last_id = history, history[-1]["id"]
+        else:
+            msgs = history + msgs
+
+    # the status is served from the robot's serialization cache
+    if hot:
+        status = json.dumps(robot.hot_dict(), separators=(",", ":"))
+    else:
+        status = robot.to_json()
+    messages = json.dumps(msgs, separators=(",", ":")) if msgs else "[]"
+    return json_raw_response(
+        f'{{"robot_id":{robot_id},"status":{status},"last_message_id":{last_id},"messages":{messages}}}'
     )
+
+
+def _float_arg(name: str, default: Optional[float]) -> Optional[float]:
+    value = request.args.get(name)
+    if value is None or value == "":
+        return default
+    return float(value)  # ValueError is handled by the caller
+
+
+@ROBOT_API.route(f"{END_POINT}/trajectory", methods=["GET"])
+def get_robot_trajectory():
+    """
+    Recorded positions of a robot.
+
+    Query:
+      - robot_id: required int
+      - start, end: optional unix timestamps (default: everything retained)
+      - max_points: optional int, decimates the result on the server (default 500, 0 = all)
+    """
+    try:
+        robot_id = int(request.args["robot_id"])
+        t0 = _float_arg("start", None)
+        t1 = _float_arg("end", None)
+        max_points = int(request.args.get("max_points", 500))
+    except KeyError:
+        return json_response({"error": "Missing robot_id"}, 400)
+    except ValueError:
+        return json_response({"error": "Invalid parameter; robot_id/max_points must be int, start/end numbers."}, 400)
+
+    samples = g.sim.trajectories.query(robot_id, t0, t1, max_points)
+    return json_response({"robot_id": robot_id, "count": len(samples),
+                          "samples": g.sim.trajectories.to_list(samples)}, 200)
+
+
+@ROBOT_API.route(f"{END_POINT}/trajectory/replay", methods=["GET"])
+def replay_robot_trajectory():
+    """
+    Streams a recorded trajectory as newline-delimited JSON frames.
+
+    Query:
+      - robot_id: required int
+      - start, end: optional unix timestamps
+      - speed: optional playback speed (default 1.0 = real time)
+      - fps: optional frames per second (default 10)
+    """
+    try:
+        robot_id = int(request.args["robot_id"])
+        t0 = _float_arg("start", None)
+        t1 = _float_arg("end", None)
+        speed = _float_arg("speed", 1.0)
+        fps = _float_arg("fps", 10.0)
+    except KeyError:
+        return json_response({"error": "Missing robot_id"}, 400)
+    except ValueError:
+        return json_response({"error": "Invalid parameter; robot_id must be int, the others numbers."}, 400)
+    if speed <= 0 or fps <= 0:
+        return json_response({"error": "speed and fps must be > 0."}, 400)
+
+    samples = g.sim.trajectories.query(robot_id, t0, t1)
+    if len(samples) == 0:
+        return json_response({"error": "No trajectory recorded for this robot/time range."}, 404)
+
+    def frames():
+        for frame in replay(samples, speed=speed, fps=fps):
+            yield json.dumps(frame, separators=(",", ":")) + "\n"
+
+    return Response(stream_with_context(frames()), mimetype="application/x-ndjson")
+
+
+@ROBOT_API.route(f"{END_POINT}/plan", methods=["POST"])
+def plan_delivery_routes():
+    """
+    Plans one multi-stop route per robot over the destinations of its packages and
+    starts it as a route job.
+
+    JSON body (all optional):
+      - robot_ids: list of int (default: all robots)
+      - speed_m_s: float, driving speed (default 5 m/s)
+      - start: bool, false only returns the plans (default true)
+    """
+    payload = request.get_json(silent=True) or {}
+    robot_ids = payload.get("robot_ids")
+    try:
+        if robot_ids is not None:
+            robot_ids = [int(i) for i in robot_ids]
+        speed = payload.get("speed_m_s")
+        speed = None if speed is None else float(speed)
+    except (TypeError, ValueError):
+        return json_response({"error": "robot_ids must be a list of int, speed_m_s a number."}, 400)
+    if speed is not None and speed <= 0:
+        return json_response({"error": "speed_m_s must be > 0."}, 400)
+    if robot_ids is not None and any(i < 0 or i >= len(g.sim.robots) for i in robot_ids):
+        return json_response({"error": "Robot ID out of range"}, 404)
+
+    try:
+        plans = g.sim.plan_deliveries(robot_ids, speed_m_s=speed, start=bool(payload.get("start", True)))
+    except RoadNetworkUnavailableError as e:
+        return json_response({"error": f"Road network unavailable: {e}"}, 503)
+    return json_response({"count": len(plans), "plans": [p.to_dict() for p in plans]}, 200)
@@ -1,8 +1,13 @@
 """
 API for the simulation.
 """
+import os
+
 from flask import g, request
 from backend.simulation import Simulation
+from backend.snapshot import SnapshotError, snapshot_path
+from backend.stations import find_station, station_coords
+from backend.warmup import WARMUP
 from . import json_response, SIM_API
 
 
@@ -58,4 +63,172 @@ def heartbeat():
     """
     Returns the current ticks, date, and time.
     """
-    return json_response({"ticks": g.sim.ticks, "date": g.sim.date, "time": g.sim.time}, 200)
+    return json_response({"ticks": g.sim.ticks, "date": g.sim.date, "time": g.sim.time,
+                          "ready": WARMUP.ready}, 200)
+
+
+@SIM_API.route(f"{END_POINT}/tick_stats", methods=["GET"])
+def tick_stats():
+    """
+    Returns tick engine statistics: overruns and timings per tick system.
+    """
+    return json_response(g.sim.engine.stats(), 200)
+
+
+@SIM_API.route(f"{END_POINT}/chargers", methods=["GET"])
+def chargers():
+    """
+    Returns the charging points, their occupancy and the charging queue.
+    """
+    return json_response(g.sim.energy.scheduler.to_dict(), 200)
+
+
+@SIM_API.route(f"{END_POINT}/snapshot", methods=["POST"])
+def save_snapshot():
+    """
+    Saves the simulation state to backend/snapshots/<name>.snap.
+    """
+    try:
+        path = snapshot_path(request.args.get("name", "default"))
+    except SnapshotError as e:
+        return json_response({"error": str(e)}, 400)
+    meta = g.sim.snapshot(path)
+    return json_response({"message": "Snapshot saved.", "name": os.path.basename(path), "meta": meta}, 200)
+
+
+@SIM_API.route(f"{END_POINT}/restore", methods=["POST"])
+def restore_snapshot():
+    """
+    Replaces the simulation state with a snapshot saved by /api/sim/snapshot.
+    """
+    try:
+        path = snapshot_path(request.args.get("name", "default"))
+    except SnapshotError as e:
+        return json_response({"error": str(e)}, 400)
+    if not os.path.isfile(path):
+        return json_response({"error": "Snapshot not found."}, 404)
+    try:
+        meta = g.sim.restore(path)
+    except SnapshotError as e:
+        return json_response({"error": str(e)}, 400)
+    return json_response({"message": "Snapshot restored.", "name": os.path.basename(path), "meta": meta}, 200)
+
+
+@SIM_API.route(f"{END_POINT}/journal", methods=["GET"])
+def journal_stats():
+    """
+    Returns the state of the on-disk message journal.
+    """
+    if g.sim.journal is None:
+        return json_response({"error": "Message journal is disabled."}, 404)
+    return json_response(g.sim.journal.stats(), 200)
+
+
+@SIM_API.route(f"{END_POINT}/shared_state", methods=["GET"])
+def shared_state_stats():
+    """
+    Returns the state of the shared-memory fleet state read by the worker processes.
+    """
+    if g.sim.publisher is None:
+        return json_response({"error": "Shared fleet state is disabled (set KVV_SHARED_STATE)."}, 404)
+    return json_response(g.sim.publisher.stats(), 200)
+
+
+@SIM_API.route(f"{END_POINT}/store", methods=["GET"])
+def store_stats():
+    """
+    Returns the state of the persistent state backend and its write-behind writer.
+    """
+    if g.sim.store_writer is None:
+        return json_response({"error": "Persistent store is disabled (set KVV_STORE)."}, 404)
+    return json_response(g.sim.store_writer.stats(), 200)
+
+
+@SIM_API.route(f"{END_POINT}/conflicts", methods=["GET"])
+def conflicts():
+    """
+    Returns the robots that are currently closer than the headway distance.
+    """
+    return json_response(g.sim.conflicts.to_dict(), 200)
+
+
+@SIM_API.route(f"{END_POINT}/jobs", methods=["GET"])
+def list_jobs():
+    """
+    Lists the active route jobs and the recently ended ones.
+    """
+    include_ended = request.args.get("include_ended", "true").lower() != "false"
+    return json_response({"jobs": g.sim.jobs.list(include_ended), "stats": g.sim.jobs.stats()}, 200)
+
+
+@SIM_API.route(f"{END_POINT}/jobs/<int:route_id>", methods=["GET"])
+def read_job(route_id: int):
+    info = g.sim.jobs.info(route_id)
+    if info is None:
+        return json_response({"error": "Job not found."}, 404)
+    return json_response(info, 200)
+
+
+def _job_action(route_id: int, action, message: str):
+    if g.sim.jobs.info(route_id) is None:
+        return json_response({"error": "Job not found."}, 404)
+    if not action(route_id):
+        return json_response({"error": "Job is not in a state that allows this.",
+                              "job": g.sim.jobs.info(route_id)}, 409)
+    return json_response({"message": message, "job": g.sim.jobs.info(route_id)}, 200)
+
+
+@SIM_API.route(f"{END_POINT}/jobs/<int:route_id>/cancel", methods=["POST"])
+def cancel_job(route_id: int):
+    return _job_action(route_id, g.sim.cancel_job, "Job cancelled.")
+
+
+@SIM_API.route(f"{END_POINT}/jobs/<int:route_id>/pause", methods=["POST"])
+def pause_job(route_id: int):
+    return _job_action(route_id, g.sim.pause_job, "Job paused.")
+
+
+@SIM_API.route(f"{END_POINT}/jobs/<int:route_id>/resume", methods=["POST"])
+def resume_job(route_id: int):
+    return _job_action(route_id, g.sim.resume_job, "Job resumed.")
+
+
+@SIM_API.route(f"{END_POINT}/jobs/<int:route_id>/reroute", methods=["POST"])
+def reroute_job(route_id: int):
+    """
+    Sends the robot of an active job along a new path, starting from where it is now.
+    JSON body: {"end": station} or {"coords": [[lat, lon], ...]}, optional
+    "destination" and "duration_s".
+    """
+    if g.sim.jobs.info(route_id) is None:
+        return json_response({"error": "Job not found."}, 404)
+    data = request.get_json(silent=True) or {}
+    destination = data.get("destination")
+    if "end" in data:
+        station = find_station(str(data["end"]))
+        if station is None:
+            return json_response({"error": "Unknown station."}, 400)
+        coords = [station_coords(station)]
+        destination = destination or station["name"]
+    else:
+        try:
+            coords = [(float(lat), float(lon)) for lat, lon in data.get("coords", [])]
+        except (TypeError, ValueError):
+            return json_response({"error": "coords must be a list of [lat, lon]."}, 400)
+    if not coords:
+        return json_response({"error": "Either end or coords is required."}, 400)
+    duration_s = data.get("duration_s")
+    if duration_s is not None:
+        try:
+            duration_s = float(duration_s)
+        except (TypeError, ValueError):
+            return json_response({"error": "duration_s must be a number."}, 400)
+        if duration_s <= 0:
+            return json_response({"error": "duration_s must be positive."}, 400)
+    try:
+        new_id = g.sim.reroute_job(route_id, coords, destination=destination, duration_s=duration_s)
+    except KeyError:
+        return json_response({"error": "Job is not active.", "job": g.sim.jobs.info(route_id)}, 409)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    return json_response({"message": "Job rerouted.", "route_id": new_id, "job": g.sim.jobs.info(new_id)}, 200)
@@ -0,0 +1,36 @@
+"""
+API for KVV stations.
+"""
+from flask import g, request
+
+from backend.stations import find_station
+from . import json_response, STATIONS_API
+
+
+END_POINT = "/api/stations"
+
+
+@STATIONS_API.route(f"{END_POINT}/<trias_id>/eta", methods=["GET"])
+def station_eta(trias_id: str):
+    """
+    Upcoming robot arrivals at a station (departure board).
+
+    Query:
+      - limit: optional int (default 10, max 100)
+      - horizon_s: optional float, only arrivals within the next horizon_s seconds
+    """
+    station = find_station(trias_id)
+    if station is None:
+        return json_response({"error": "Unknown station."}, 404)
+    try:
+        limit = min(100, max(0, int(request.args.get("limit", 10))))
+        horizon = request.args.get("horizon_s")
+        horizon_s = float(horizon) if horizon not in (None, "") else None
+    except ValueError:
+        return json_response({"error": "Invalid limit or horizon_s."}, 400)
+
+    arrivals = g.sim.eta.upcoming(str(station["triasID"]), limit=limit, horizon_s=horizon_s)
+    return json_response({
+        "station": {"triasID": station["triasID"], "name": station.get("triasName", station.get("name"))},
+        "arrivals": arrivals,
+    }, 200)
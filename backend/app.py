@@ -3,9 +3,17 @@ The backend.
 Provides API endpoints for the frontend to interact with the robot and map data.
 Includes Flask app configuration and route definitions.
 """
-from flask import Flask, Blueprint, g
+import time
+
+from flask import Flask, Blueprint, g, request
 from flask_cors import CORS
 
+from backend.journal import JOURNAL_DIR
+from backend.metrics import METRICS
+from backend.profiling import PROFILING_ENABLED, release_thread, sync_thread
+from backend.shared_state import SHARED_STATE_NAME
+from backend.storage import STORE_URL, open_store
+from backend.warmup import WARMUP, WARMUP_ENABLED
 from backend.simulation import Simulation
 
 from backend.api.debug import DEBUG_API
@@ -13,14 +21,23 @@ from backend.api.robot import ROBOT_API
 from backend.api.map import MAP_API
 from backend.api.pkg import PKG_API
 from backend.api.sim import SIM_API
+from backend.api.stations import STATIONS_API
 
 
 #######################################################################################
 # Backend Config                                                                      #
 #######################################################################################
 app: Flask = Flask(__name__)
+app.config["PROFILING"] = PROFILING_ENABLED  # /api/debug/profile (KVV_PROFILING=1)
 CORS(app=app)
-sim: Simulation = Simulation()
+sim: Simulation = Simulation(journal_dir=JOURNAL_DIR, shared_state=SHARED_STATE_NAME or None,
+                             store=open_store(STORE_URL))
+
+# heavy modules and the road network are loaded in the background (see warmup.py)
+if WARMUP_ENABLED:
+    WARMUP.start()
+else:
+    WARMUP.skip()
 
 
 @app.before_request
@@ -29,12 +46,35 @@ def inject_singleton():
     This injects any given variable to middleware before requests.
     """
     g.sim = sim
+    g.request_t0 = time.perf_counter()
+    sync_thread()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Latency and count per blueprint and route (see /api/debug/metrics).
+    """
+    t0 = g.get("request_t0")
+    if t0 is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        METRICS.observe_request(request.blueprint or "app", rule, request.method, response.status_code,
+                                time.perf_counter() - t0)
+    return response
+
+
+@app.teardown_request
+def end_request_profile(exc):
+    """
+    Detach the request thread from a cProfile session (see backend/profiling.py).
+    """
+    release_thread()
 
 
 ########################################################################################
 # Middleware                                                                           #
 ########################################################################################
-middleware: list[Blueprint] = [DEBUG_API, ROBOT_API, MAP_API, PKG_API, SIM_API]
+middleware: list[Blueprint] = [DEBUG_API, ROBOT_API, MAP_API, PKG_API, SIM_API, STATIONS_API]
 with app.app_context():
     # Creates the middleware for all applications.
     # Files are stored within api/*.py.
@@ -0,0 +1,305 @@
+"""
+assignment.py
+
+Capacity-aware package-to-robot assignment.
+
+Given a batch of packages and the current fleet, every package is placed on a robot
+so that the limits from robot.py (MAX_NUM_OF_PACKAGES, MAX_NUM_OF_LARGE_PACKAGES,
+MAX_NUM_OF_SMALL_PACKAGES) are respected and the total detour is small.
+
+Detour model:
+    The detour of a package on a robot is the distance from the robot's current
+    position (snapped to the nearest KVV station) to the package's start station.
+    The leg start -> destination is the same for every robot and therefore ignored.
+    Distances come from the precomputed station matrix in stations.py.
+
+Algorithm:
+    1. Robots are grouped by their nearest station. All robots of a group have the same
+       cost for a package, so the cost matrix shrinks from (packages x robots) to
+       (packages x occupied stations).
+    2. Greedy rounds (vectorized): every open package proposes to its cheapest group that
+       still has room for its size; each group accepts the cheapest proposals up to its
+       capacity. Rejected packages propose again in the next round.
+    3. Local search: relocate packages to cheaper groups with spare room and swap
+       same-size packages between groups whenever the total detour decreases.
+    4. The packages of a group are distributed over the robots of that group.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from backend.packages import Package, PackageSize, STD_START
+from backend.robot import Robot
+from backend.stations import nearest_station_indices, station_distance_matrix, station_index
+
+
+_EPS: float = 1e-3  # meters; smaller improvements are ignored
+
+
+@dataclass
+class AssignmentResult:
+    """
+    Result of assign_packages().
+
+    assignments: (package index, robot_id) pairs
+    detours_m: detour per entry of assignments (meters)
+    unassigned: package indices that did not fit on any robot
+    """
+
+    assignments: List[Tuple[int, int]] = field(default_factory=list)
+    detours_m: List[float] = field(default_factory=list)
+    unassigned: List[int] = field(default_factory=list)
+
+    @property
+    def total_detour_m(self) -> float:
+        return float(sum(self.detours_m))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "assignments": [
+                {"package": i, "robot_id": rid, "detour_m": round(d, 1)}
+                for (i, rid), d in zip(self.assignments, self.detours_m)
+            ],
+            "unassigned": list(self.unassigned),
+            "assigned_count": len(self.assignments),
+            "total_detour_m": round(self.total_detour_m, 1),
+        }
+
+
+def _run_ranks(keys: np.ndarray) -> np.ndarray:
+    """
+    For an already sorted key array, return the rank of every element within its run
+    of equal keys, e.g. [3, 3, 5, 7, 7, 7] -> [0, 1, 0, 0, 1, 2].
+    """
+    n = len(keys)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.arange(n)
+    starts = np.r_[True, keys[1:] != keys[:-1]]
+    run_start = np.maximum.accumulate(np.where(starts, idx, 0))
+    return idx - run_start
+
+
+def _greedy(cost: np.ndarray, size: np.ndarray, cap_size: np.ndarray, cap_total: np.ndarray) -> np.ndarray:
+    """
+    Vectorized proposal rounds. Updates cap_size / cap_total in place.
+
+    Returns:
+        group index per package (-1 = unassigned).
+    """
+    n_pkg = cost.shape[0]
+    group = np.full(n_pkg, -1, dtype=np.int64)
+    work = cost.copy()  # rejected (package, group) pairs are set to inf here
+    pending = np.arange(n_pkg)
+
+    while len(pending):
+        rows = work[pending]
+        for k in (0, 1):
+            full = (cap_size[:, k] <= 0) | (cap_total <= 0)
+            if full.any():
+                rows[np.ix_(size[pending] == k, full)] = np.inf
+
+        choice = np.argmin(rows, axis=1)
+        best = rows[np.arange(len(pending)), choice]
+        ok = np.isfinite(best)
+        pending, choice, best = pending[ok], choice[ok], best[ok]
+        if not len(pending):
+            break
+        sz = size[pending]
+
+        # 1) per size: each group keeps its cheapest proposals up to capacity
+        order = np.lexsort((best, sz, choice))
+        ranks = np.empty_like(order)
+        ranks[order] = _run_ranks(choice[order] * 2 + sz[order])
+        accept = ranks < cap_size[choice, sz]
+
+        # 2) total capacity over both sizes
+        acc = np.flatnonzero(accept)
+        order = acc[np.lexsort((best[acc], choice[acc]))]
+        over = _run_ranks(choice[order]) >= cap_total[choice[order]]
+        accept[order[over]] = False
+
+        a = np.flatnonzero(accept)
+        group[pending[a]] = choice[a]
+        np.subtract.at(cap_size, (choice[a], sz[a]), 1)
+        np.subtract.at(cap_total, choice[a], 1)
+
+        # the rejecting groups are full now; never propose to them again
+        r = np.flatnonzero(~accept)
+        work[pending[r], choice[r]] = np.inf
+        pending = pending[r]
+
+    return group
+
+
+def _local_search(
+    cost: np.ndarray,
+    size: np.ndarray,
+    group: np.ndarray,
+    cap_size: np.ndarray,
+    cap_total: np.ndarray,
+    passes: int,
+) -> None:
+    """
+    Improve a group assignment in place with relocate and swap moves.
+    """
+    for _ in range(max(0, int(passes))):
+        assigned = np.flatnonzero(group >= 0)
+        if not len(assigned):
+            return
+        rows = cost[assigned]
+        current = rows[np.arange(len(assigned)), group[assigned]]
+        target = np.argmin(rows, axis=1)
+        gain = current - rows[np.arange(len(assigned)), target]
+        cand = np.flatnonzero(gain > _EPS)
+        if not len(cand):
+            return
+        cand = cand[np.argsort(-gain[cand], kind="stable")]
+
+        # members per (group, size), built once per pass
+        key = group[assigned] * 2 + size[assigned]
+        order = np.argsort(key, kind="stable")
+        keys_sorted = key[order]
+        bounds = np.flatnonzero(np.r_[True, keys_sorted[1:] != keys_sorted[:-1], True])
+        members: Dict[int, np.ndarray] = {
+            int(keys_sorted[bounds[j]]): assigned[order[bounds[j]:bounds[j + 1]]]
+            for j in range(len(bounds) - 1)
+        }
+
+        touched = np.zeros(len(group), dtype=bool)
+        improved = 0
+        for c in cand:
+            i = assigned[c]
+            if touched[i]:
+                continue
+            a, b, k = int(group[i]), int(target[c]), int(size[i])
+
+            # relocate into spare room
+            if cap_size[b, k] > 0 and cap_total[b] > 0:
+                group[i] = b
+                cap_size[b, k] -= 1
+                cap_total[b] -= 1
+                cap_size[a, k] += 1
+                cap_total[a] += 1
+                touched[i] = True
+                improved += 1
+                continue
+
+            # swap with the same-size package in b that loses least by moving to a
+            js = members.get(b * 2 + k)
+            if js is None:
+                continue
+            js = js[~touched[js]]
+            if not len(js):
+                continue
+            loss = cost[js, a] - cost[js, b]
+            m = int(np.argmin(loss))
+            if gain[c] - loss[m] > _EPS:
+                j = js[m]
+                group[i], group[j] = b, a
+                touched[i] = touched[j] = True
+                improved += 1
+
+        if not improved:
+            return
+
+
+def _robot_anchors(robots: Sequence[Robot]) -> np.ndarray:
+    """
+    Nearest station index per robot; robots without position count as parked at STD_START.
+    """
+    default = station_index(STD_START) or 0
+    anchors = np.full(len(robots), default, dtype=np.int64)
+    with_pos = [i for i, r in enumerate(robots) if r.position is not None]
+    if with_pos:
+        lats = [robots[i].position[0] for i in with_pos]
+        lons = [robots[i].position[1] for i in with_pos]
+        anchors[with_pos] = nearest_station_indices(lats, lons)
+    return anchors
+
+
+def assign_packages(
+    packages: Sequence[Package],
+    robots: Sequence[Robot],
+    local_search_passes: int = 2,
+) -> AssignmentResult:
+    """
+    Assign a batch of packages to the fleet.
+
+    Args:
+        packages: Packages to place; start/destination must be known KVV stations.
+        robots: Current fleet. Packages already loaded reduce a robot's capacity.
+        local_search_passes: Number of relocate/swap passes after the greedy phase.
+
+    Returns:
+        AssignmentResult. Nothing is loaded onto the robots; the caller decides.
+
+    Raises:
+        ValueError: if a start or destination station is unknown.
+    """
+    result = AssignmentResult()
+    if not packages:
+        return result
+    if not robots:
+        result.unassigned = list(range(len(packages)))
+        return result
+
+    start_idx = np.empty(len(packages), dtype=np.int64)
+    size = np.empty(len(packages), dtype=np.int64)
+    for i, p in enumerate(packages):
+        s = station_index(p.start)
+        if s is None:
+            raise ValueError(f"Unknown start station for package {i}: {p.start!r}")
+        if station_index(p.destination) is None:
+            raise ValueError(f"Unknown destination station for package {i}: {p.destination!r}")
+        start_idx[i] = s
+        size[i] = PackageSize(p.size).value
+
+    # robot capacity per size column (SMALL = 0, LARGE = 1)
+    caps = [r.free_capacity() for r in robots]
+    r_total = np.array([c[0] for c in caps], dtype=np.int64)
+    r_size = np.array([[c[2], c[1]] for c in caps], dtype=np.int64).reshape(-1, 2)
+
+    group_station, r_group = np.unique(_robot_anchors(robots), return_inverse=True)
+    cap_size = np.zeros((len(group_station), 2), dtype=np.int64)
+    cap_total = np.zeros(len(group_station), dtype=np.int64)
+    np.add.at(cap_size, r_group, r_size)
+    np.add.at(cap_total, r_group, r_total)
+
+    cost = station_distance_matrix()[np.ix_(start_idx, group_station)]
+
+    group = _greedy(cost, size, cap_size, cap_total)
+    _local_search(cost, size, group, cap_size, cap_total, local_search_passes)
+
+    # distribute on robots: large packages first, they are the tighter constraint
+    robots_of_group: Dict[int, List[int]] = {}
+    for r, gi in enumerate(r_group):
+        robots_of_group.setdefault(int(gi), []).append(r)
+    cursor: Dict[Tuple[int, int], int] = {}
+
+    for i in np.lexsort((-size, group)):
+        gi = int(group[i])
+        if gi < 0:
+            result.unassigned.append(int(i))
+            continue
+        k = int(size[i])
+        members = robots_of_group[gi]
+        pos = cursor.get((gi, k), 0)
+        while pos < len(members) and (r_size[members[pos], k] <= 0 or r_total[members[pos]] <= 0):
+            pos += 1
+        cursor[(gi, k)] = pos
+        if pos == len(members):
+            result.unassigned.append(int(i))
+            continue
+        r = members[pos]
+        r_size[r, k] -= 1
+        r_total[r] -= 1
+        result.assignments.append((int(i), robots[r].robot_id))
+        result.detours_m.append(float(cost[i, gi]))
+
+    result.unassigned.sort()
+    return result
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the backend.
+Run a benchmark from the repository root, e.g. `python -m backend.benchmarks.bench_assignment`.
+"""
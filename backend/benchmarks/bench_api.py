@@ -0,0 +1,185 @@
+"""
+In-process benchmark of the API endpoints (Flask test client, no server or network).
+
+backend/test.py needs a running server and measures the network stack as well. This
+suite drives backend.app.app through app.test_client() instead. For every fleet size
+the simulation is reset and filled with robots, then every scenario sends a fixed
+number of requests and the latency of each request is recorded.
+
+Route planning runs on the synthetic street grid from bench_distance_matrix, which
+replaces the OSMnx download (load_road_network is patched), so the suite works offline.
+
+Results (throughput, p50 / p95 / p99 latency, errors per endpoint and fleet size) are
+written as JSON; --compare prints the change against an earlier result file.
+
+Run: `python -m backend.benchmarks.bench_api --fleet 10 1000 100000 --compare old.json`
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+import numpy as np
+
+# keep the message journal of this run out of backend/journal; no warmup (the road
+# network is replaced below)
+os.environ.setdefault("KVV_JOURNAL_DIR", tempfile.mkdtemp(prefix="kvv-bench-journal-"))
+os.environ.setdefault("KVV_WARMUP", "0")
+
+from backend import app as backend_app  # noqa: E402
+from backend.benchmarks.bench_distance_matrix import street_grid  # noqa: E402
+from backend.road_network import RoadNetwork  # noqa: E402
+from backend.robot import MAX_NUM_OF_SMALL_PACKAGES, Robot  # noqa: E402
+from backend.stations import list_stations, station_coords  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(__file__), timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def measure(name: str, fleet: int, count: int, send: Callable[[int], Any]) -> Dict[str, Any]:
+    """
+    Send `count` requests (send(i) returns the response) and summarize the latencies.
+    """
+    latencies = np.empty(count)
+    errors = 0
+    t_start = time.perf_counter()
+    for i in range(count):
+        t0 = time.perf_counter()
+        response = send(i)
+        latencies[i] = time.perf_counter() - t0
+        if response.status_code >= 400:
+            errors += 1
+    total = time.perf_counter() - t_start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000.0 if count else (0.0, 0.0, 0.0)
+    result = {
+        "endpoint": name,
+        "fleet": fleet,
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / total, 1) if total > 0 else 0.0,
+        "mean_ms": round(float(latencies.mean()) * 1000.0, 3) if count else 0.0,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+    print(f"  {name:<16} {result['throughput_rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.3f} ms  "
+          f"p95 {result['p95_ms']:>8.3f} ms  p99 {result['p99_ms']:>8.3f} ms  errors {errors}")
+    return result
+
+
+def run_fleet(client, sim, fleet: int, requests: int, seed: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    stations = [s for s in list_stations() if s["triasName"].startswith("Karlsruhe")]
+    names = [s["name"] for s in stations]
+    ids = [s["triasID"] for s in stations]
+
+    client.post("/api/sim/reset")
+    robots = []
+    for i in range(fleet):
+        robot = Robot(robot_id=i)
+        robot.position = station_coords(stations[i % len(stations)])
+        robots.append(robot)
+    sim.robots.extend(robots)
+
+    pick = rng.integers(0, fleet, size=requests).tolist()
+    results = [
+        measure("robot_read", fleet, requests,
+                lambda i: client.get("/api/robot/read", query_string={"robot_id": pick[i]})),
+        measure("robot_read_hot", fleet, requests,
+                lambda i: client.get("/api/robot/read", query_string={"robot_id": pick[i], "fields": "hot"})),
+        measure("heartbeat", fleet, requests, lambda i: client.get("/api/sim/heartbeat")),
+        measure("map_lines", fleet, requests, lambda i: client.get("/api/map/lines")),
+    ]
+
+    # every robot takes at most MAX_NUM_OF_SMALL_PACKAGES small packages
+    n_pkg = min(requests, fleet * MAX_NUM_OF_SMALL_PACKAGES)
+    results.append(measure("pkg_create", fleet, n_pkg, lambda i: client.post("/api/pkg/create", query_string={
+        "robot_id": i % fleet, "pkg_size": 0, "start": "Karlsruhe Hauptbahnhof",
+        "destination": names[int(rng.integers(len(names)))]})))
+
+    # route planning on the stub graph: 10 robots per request
+    batch = min(10, fleet)
+    n_route = max(1, requests // 10)
+    results.append(measure("route_plan", fleet, n_route, lambda i: client.post("/api/robot/plan", json={
+        "robot_ids": [(i * batch + k) % fleet for k in range(batch)], "start": False})))
+    results.append(measure("distance_matrix", fleet, n_route, lambda i: client.post("/api/map/matrix", json={
+        "origins": rng.choice(ids, size=20, replace=False).tolist()})))
+    results.append(measure("dispatch", fleet, n_route, lambda i: client.post("/api/map/dispatch", json={
+        "routes": [{"robot_id": (i * batch + k) % fleet, "start": names[int(rng.integers(len(names)))],
+                    "end": names[int(rng.integers(len(names)))], "duration_s": 600} for k in range(batch)]})))
+    sim.jobs.cancel_all()
+
+    # creating robots grows the fleet, so it runs last
+    results.append(measure("robot_create", fleet, requests, lambda i: client.post("/api/robot/create")))
+    return results
+
+
+def compare(current: Dict[str, Any], path: str) -> None:
+    with open(path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    before = {(r["endpoint"], r["fleet"]): r for r in old["results"]}
+    print(f"\nchange against {path} (commit {old['meta'].get('commit')}):")
+    for r in current["results"]:
+        b = before.get((r["endpoint"], r["fleet"]))
+        if b is None or not b["p50_ms"] or not b["throughput_rps"]:
+            continue
+        print(f"  {r['endpoint']:<16} fleet={r['fleet']:>6}  p50 {r['p50_ms'] / b['p50_ms'] - 1:>+7.1%}  "
+              f"throughput {r['throughput_rps'] / b['throughput_rps'] - 1:>+7.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fleet", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=300, help="requests per endpoint and fleet size")
+    parser.add_argument("--grid", type=int, default=110, help="size of the stub street grid")
+    parser.add_argument("--out", default=None, help="result file (default: results/bench_api-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare with")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    network = RoadNetwork.from_graph(street_grid(args.grid))
+    commit = git_commit()
+    report: Dict[str, Any] = {
+        "meta": {"commit": commit, "created": time.time(), "python": platform.python_version(),
+                 "machine": platform.machine(), "requests": args.requests, "grid_nodes": network.n_nodes},
+        "results": [],
+    }
+
+    client = backend_app.app.test_client()
+    with mock.patch("backend.road_network.load_road_network", return_value=network), \
+            mock.patch("backend.api.map.load_road_network", return_value=network):
+        for fleet in args.fleet:
+            print(f"fleet={fleet}")
+            report["results"].extend(run_fleet(client, backend_app.sim, fleet, args.requests, args.seed))
+    client.post("/api/sim/reset")
+    backend_app.sim.engine.stop()
+
+    out: Optional[str] = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"bench_api-{commit}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nwritten to {out}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
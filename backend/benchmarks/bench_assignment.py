@@ -0,0 +1,69 @@
+"""
+Benchmark for the package-to-robot assignment (backend/assignment.py).
+
+Builds a synthetic fleet parked at random KVV stations and a batch of random packages,
+then measures the assignment time and reports the resulting detour.
+
+Run: `python -m backend.benchmarks.bench_assignment --robots 1000 --packages 20000`
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from backend.assignment import assign_packages
+from backend.packages import Package, PackageSize
+from backend.robot import Robot
+from backend.stations import list_stations, station_coords
+
+
+def build_scenario(n_robots: int, n_packages: int, seed: int = 42):
+    """
+    Create robots at random stations (with a few meters of jitter) and random packages.
+    """
+    rng = random.Random(seed)
+    stations = list_stations()
+
+    robots = []
+    for i in range(n_robots):
+        lat, lon = station_coords(rng.choice(stations))
+        robot = Robot(robot_id=i)
+        robot.position = (lat + rng.uniform(-5e-4, 5e-4), lon + rng.uniform(-5e-4, 5e-4))
+        robots.append(robot)
+
+    packages = []
+    for _ in range(n_packages):
+        a, b = rng.sample(stations, 2)
+        size = PackageSize.LARGE if rng.random() < 0.25 else PackageSize.SMALL
+        packages.append(Package(start=a["triasID"], destination=b["triasID"], size=size))
+
+    return robots, packages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=1000)
+    parser.add_argument("--packages", type=int, default=20000)
+    parser.add_argument("--passes", type=int, default=2, help="local search passes")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    robots, packages = build_scenario(args.robots, args.packages, args.seed)
+
+    for passes in sorted({0, args.passes}):
+        t0 = time.perf_counter()
+        result = assign_packages(packages, robots, local_search_passes=passes)
+        elapsed = time.perf_counter() - t0
+        assigned = len(result.assignments)
+        mean = result.total_detour_m / assigned if assigned else 0.0
+        print(
+            f"robots={args.robots} packages={args.packages} passes={passes}: "
+            f"{elapsed * 1000:.0f} ms, assigned={assigned}, unassigned={len(result.unassigned)}, "
+            f"total_detour={result.total_detour_m / 1000:.1f} km, mean_detour={mean:.0f} m"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark for the headway / conflict detection (backend/conflicts.py).
+
+Places robots randomly around Karlsruhe (all moving), half of them on a few shared
+route tracks, and reports the time of one detection pass. For small fleets the
+spatial hash result is checked against the O(n^2) all-pairs distance matrix.
+
+Run: `python -m backend.benchmarks.bench_conflicts --sizes 1000 10000 100000`
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.conflicts import HEADWAY_M, ConflictDetector, close_pairs
+from backend.robot import Robot
+
+
+def brute_force_pairs(lat: np.ndarray, lon: np.ndarray, radius_m: float) -> set:
+    lat0 = float(np.mean(lat))
+    x = (lon - float(np.mean(lon))) * np.cos(np.radians(lat0)) * 111320.0
+    y = (lat - lat0) * 110540.0
+    d = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+    i, j = np.nonzero(np.triu(d < radius_m, k=1))
+    return set(zip(i.tolist(), j.tolist()))
+
+
+def run(n_robots: int, repeat: int, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    lat = 49.0 + rng.uniform(-0.03, 0.03, n_robots)
+    lon = 8.4 + rng.uniform(-0.05, 0.05, n_robots)
+
+    robots = []
+    for i in range(n_robots):
+        robot = Robot(robot_id=i, is_parked=False, progress=float(rng.uniform()))
+        robot.position = (float(lat[i]), float(lon[i]))
+        robots.append(robot)
+    # half of the fleet drives on 50 shared tracks of 10 km
+    jobs = [{"robot_id": i, "track": i % 50, "total_m": 10_000.0} for i in range(0, n_robots, 2)]
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        i, j, _ = close_pairs(lat, lon, HEADWAY_M)
+    t_hash = (time.perf_counter() - t0) / repeat
+
+    detector = ConflictDetector()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        conflicts = detector.detect(robots, jobs)
+    t_detect = (time.perf_counter() - t0) / repeat
+
+    check = ""
+    if n_robots <= 5000:
+        expected = brute_force_pairs(lat, lon, HEADWAY_M)
+        found = {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+        check = ", matches all-pairs" if found == expected else ", MISMATCH with all-pairs"
+
+    print(f"robots={n_robots:>6}: spatial hash {t_hash * 1000:.2f} ms ({len(i)} pairs{check}), "
+          f"full detection {t_detect * 1000:.2f} ms ({len(conflicts['leader'])} conflicts)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark for batch dispatch (backend/dispatch.py).
+
+Routes a fleet from a few depot stations to random stations in Karlsruhe on the
+synthetic street grid from bench_distance_matrix (no download needed), and compares
+the batch (one search per distinct origin) with one search per robot, which is what
+a /api/map/route call per robot does before it even renders the map. Finally all
+route jobs are started in one Simulation.start_route_jobs() call.
+
+Run: `python -m backend.benchmarks.bench_dispatch --robots 1000 --depots 30`
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.benchmarks.bench_distance_matrix import street_grid
+from backend.dispatch import parse_requests, route_batch
+from backend.road_network import RoadNetwork
+from backend.robot import Robot
+from backend.simulation import Simulation
+from backend.stations import list_stations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=1000)
+    parser.add_argument("--depots", type=int, default=30)
+    parser.add_argument("--grid", type=int, default=110)
+    parser.add_argument("--sample", type=int, default=50, help="single searches timed for comparison")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    net = RoadNetwork.from_graph(street_grid(args.grid))
+    stations = [s["triasID"] for s in list_stations() if s["triasName"].startswith("Karlsruhe")]
+    depots = rng.choice(stations, size=args.depots, replace=False)
+    items = [{"robot_id": i, "start": str(rng.choice(depots)), "end": str(rng.choice(stations))}
+             for i in range(args.robots)]
+
+    t0 = time.perf_counter()
+    parsed = parse_requests(items, args.robots)
+    routes = route_batch(parsed, net)
+    t_batch = time.perf_counter() - t0
+    origins = len(set(tuple(r["start"][1:]) for r in parsed))
+    km = sum(r.length_m for r in routes) / 1000.0
+    print(f"batch: {args.robots} routes from {origins} origins in {t_batch:.2f} s "
+          f"({km / args.robots:.1f} km per route)")
+
+    src, _ = net.nearest_nodes([r["start"][1] for r in parsed[:args.sample]],
+                               [r["start"][2] for r in parsed[:args.sample]])
+    t0 = time.perf_counter()
+    for node in src.tolist():
+        net.shortest_from([node], predecessors=True)
+    per_route = (time.perf_counter() - t0) / len(src)
+    print(f"one search per robot: {per_route * 1000:.1f} ms/route -> {per_route * args.robots:.2f} s "
+          f"for the fleet (without graph loading and map rendering)")
+
+    sim = Simulation()
+    sim.engine.stop()
+    sim.robots.extend(Robot(robot_id=i) for i in range(args.robots))
+    t0 = time.perf_counter()
+    sim.start_route_jobs([{"robot_id": r.robot_id, "coords": r.coords, "duration_s": 600.0} for r in routes])
+    print(f"start_route_jobs: {time.perf_counter() - t0:.2f} s for {sim.jobs.stats()['active']} jobs")
+    sim.jobs.cancel_all()
+
+
+if __name__ == "__main__":
+    main()
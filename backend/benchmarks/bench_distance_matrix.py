@@ -0,0 +1,90 @@
+"""
+Benchmark for many-to-many road distances (backend/road_network.py).
+
+Builds a synthetic street grid over the Karlsruhe area with about the size of the
+OSMnx drive network (no download needed), then computes the full KVV station x
+station matrix with batched Dijkstra searches. For comparison, a sample of pairs is
+routed one by one with networkx (what one ox.shortest_path call per pair costs) and
+extrapolated to the full matrix; the sampled distances are checked against the matrix.
+
+Run: `python -m backend.benchmarks.bench_distance_matrix --grid 110 --pairs 50`
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import networkx as nx
+import numpy as np
+
+from backend.road_network import RoadNetwork, distance_matrix
+from backend.stations import list_stations, station_latlon
+
+
+def street_grid(size: int, seed: int = 42) -> nx.MultiDiGraph:
+    """
+    size x size jittered grid covering the stations, 10% of the streets one-way.
+    """
+    rng = np.random.default_rng(seed)
+    lat, lon = station_latlon()
+    lats = np.linspace(lat.min() - 0.01, lat.max() + 0.01, size)
+    lons = np.linspace(lon.min() - 0.01, lon.max() + 0.01, size)
+    G = nx.MultiDiGraph()
+    for r in range(size):
+        for c in range(size):
+            G.add_node(r * size + c, y=lats[r] + rng.normal(0, 1e-4), x=lons[c] + rng.normal(0, 1e-4))
+    m_lat = (lats[1] - lats[0]) * 110540.0
+    m_lon = (lons[1] - lons[0]) * 111320.0 * np.cos(np.radians(lats.mean()))
+    for r in range(size):
+        for c in range(size):
+            a = r * size + c
+            for b, length in ((a + 1, m_lon) if c + 1 < size else (None, 0),
+                              (a + size, m_lat) if r + 1 < size else (None, 0)):
+                if b is None:
+                    continue
+                length *= rng.uniform(1.0, 1.3)
+                G.add_edge(a, b, length=length)
+                if rng.uniform() > 0.1:
+                    G.add_edge(b, a, length=length)
+    return G
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grid", type=int, default=110, help="grid size (110 -> ~12k nodes)")
+    parser.add_argument("--pairs", type=int, default=50, help="pairs routed one by one for comparison")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    G = street_grid(args.grid)
+    t0 = time.perf_counter()
+    net = RoadNetwork.from_graph(G)
+    print(f"graph: {net.n_nodes} nodes, {net.n_edges} edges, {net.nbytes / 1e6:.1f} MB, "
+          f"export {time.perf_counter() - t0:.2f} s")
+
+    stations = [s["triasID"] for s in list_stations()]
+    n = len(stations)
+    t0 = time.perf_counter()
+    result = distance_matrix(stations, network=net)
+    t_matrix = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    distance_matrix(stations, network=net)
+    t_cached = time.perf_counter() - t0
+    print(f"{n} x {n} station matrix: {t_matrix:.2f} s, cached {t_cached * 1000:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    nodes, snap = net.nearest_nodes(*station_latlon())
+    sample = rng.integers(0, n, size=(args.pairs, 2))
+    t0 = time.perf_counter()
+    worst = 0.0
+    for i, j in sample.tolist():
+        d = nx.shortest_path_length(G, int(net.node_ids[nodes[i]]), int(net.node_ids[nodes[j]]), weight="length")
+        worst = max(worst, abs(d + snap[i] + snap[j] - result.distances_m[i, j]))
+    per_pair = (time.perf_counter() - t0) / args.pairs
+    print(f"one search per pair: {per_pair * 1000:.1f} ms/pair -> {per_pair * n * n / 60:.0f} min "
+          f"for the full matrix; max deviation {worst:.3f} m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark for the energy model and charger scheduling (backend/energy.py).
+
+Builds fleets with random battery levels around Karlsruhe, runs ticks synchronously
+(without the real-time loop) and reports the time per tick of the battery and
+charging systems.
+
+Run: `python -m backend.benchmarks.bench_energy --sizes 1000 10000 --ticks 50`
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from backend.robot import Robot
+from backend.simulation import Simulation
+
+
+def run(n_robots: int, ticks: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    sim = Simulation()
+    sim.engine.stop()
+    sim.reset()
+    for i in range(n_robots):
+        robot = Robot(robot_id=i, battery_status=rng.uniform(1.0, 100.0))
+        robot.position = (49.0 + rng.uniform(-0.03, 0.03), 8.4 + rng.uniform(-0.05, 0.05))
+        sim.robots.append(robot)
+
+    for _ in range(ticks):
+        sim.engine.run_tick()
+
+    systems = sim.engine.stats()["systems"]
+    sched = sim.energy.scheduler
+    print(
+        f"robots={n_robots:>6}: battery_drain avg {systems['battery_drain']['avg_ms']:.2f} ms, "
+        f"charging avg {systems['charging']['avg_ms']:.2f} ms (max {systems['charging']['max_ms']:.2f} ms), "
+        f"queued={sched.queue_length}, at chargers={len(sched.jobs)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--ticks", type=int, default=50)
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n, args.ticks)
+
+
+if __name__ == "__main__":
+    main()
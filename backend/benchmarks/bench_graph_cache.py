@@ -0,0 +1,121 @@
+"""
+Graph cache (road_network.GraphCache): several city networks under a byte budget.
+
+Cities are synthetic street grids of different sizes (bench_distance_matrix.street_grid);
+building one (networkx graph + CSR export) stands in for the OSMnx download, which
+takes much longer in practice.
+
+1. Per city: build, reload of the on-disk form, and a cache hit.
+2. Mixed traffic: --requests lookups over --cities cities (Zipf-distributed, a few
+   cities are hot) with a budget of --budget of the total footprint. Hit ratio, disk
+   reloads, evictions and mean / max time per lookup.
+3. Coalescing: --threads threads ask for the same uncached city at once.
+
+Run: `python -m backend.benchmarks.bench_graph_cache --cities 6 --budget 0.5`
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from backend.benchmarks.bench_distance_matrix import street_grid
+from backend.road_network import GraphCache, RoadNetwork
+
+
+def _sizes(cities: int, smallest: int, largest: int) -> Dict[str, int]:
+    grid = np.linspace(smallest, largest, cities).astype(int).tolist()
+    return {f"city-{i}": size for i, size in enumerate(grid)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=6)
+    parser.add_argument("--smallest", type=int, default=60, help="grid size of the smallest city")
+    parser.add_argument("--largest", type=int, default=160, help="grid size of the largest city")
+    parser.add_argument("--budget", type=float, default=0.5, help="budget as a share of all networks")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    sizes = _sizes(args.cities, args.smallest, args.largest)
+    builds: List[str] = []
+
+    def build(city: str) -> RoadNetwork:
+        builds.append(city)
+        return RoadNetwork.from_graph(street_grid(sizes[city], seed=len(city)))
+
+    directory = tempfile.mkdtemp(prefix="kvv-bench-graphs-")
+    try:
+        # 1. build / disk / hit per city
+        cache = GraphCache(budget_bytes=1 << 40, directory=directory, loader=build)
+        print("per city:                     nodes     MB   build ms   disk ms   hit us")
+        total = 0
+        for city in sizes:
+            t0 = time.perf_counter()
+            network = cache.get(city)
+            t_build = time.perf_counter() - t0
+            cache.clear()
+            t0 = time.perf_counter()
+            cache.get(city)
+            t_disk = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for _ in range(1000):
+                cache.get(city)
+            t_hit = (time.perf_counter() - t0) / 1000
+            total += network.nbytes
+            print(f"  {city:<22} {network.n_nodes:>11} {network.nbytes / 1e6:>6.1f} {t_build * 1000:>10.0f} "
+                  f"{t_disk * 1000:>9.1f} {t_hit * 1e6:>8.2f}")
+
+        # 2. mixed traffic under a budget (files exist: misses are disk reloads)
+        budget = int(total * args.budget)
+        cache = GraphCache(budget_bytes=budget, directory=directory, loader=build)
+        rng = np.random.default_rng(7)
+        names = list(sizes)
+        weights = 1.0 / np.arange(1, len(names) + 1)
+        picks = rng.choice(len(names), size=args.requests, p=weights / weights.sum())
+        times = []
+        for i in picks.tolist():
+            t0 = time.perf_counter()
+            cache.get(names[i])
+            times.append(time.perf_counter() - t0)
+        st = cache.stats()
+        print(f"\nmixed traffic: {args.requests} lookups over {len(names)} cities, budget {budget / 1e6:.1f} MB "
+              f"of {total / 1e6:.1f} MB")
+        print(f"  hit ratio {st['hits'] / args.requests:.1%}, disk reloads {st['disk_loads']}, "
+              f"downloads {st['downloads']}, evictions {st['evictions']}, in memory {len(st['cities'])} cities "
+              f"({st['bytes'] / 1e6:.1f} MB)")
+        print(f"  per lookup: mean {statistics.mean(times) * 1000:.2f} ms, max {max(times) * 1000:.1f} ms")
+
+        # 3. coalescing of concurrent loads
+        builds.clear()
+        cache = GraphCache(budget_bytes=1 << 40, directory=None, loader=build)
+        barrier = threading.Barrier(args.threads)
+        results: List[RoadNetwork] = []
+
+        def request():
+            barrier.wait()
+            results.append(cache.get(names[-1]))
+
+        threads = [threading.Thread(target=request) for _ in range(args.threads)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        print(f"\ncoalescing: {args.threads} concurrent requests for {names[-1]}: {len(builds)} build(s), "
+              f"{len({id(r) for r in results})} network object(s), {elapsed * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Micro-benchmarks and regression check for the simulation kernels.
+
+Covers the functions that run in every route frame or API poll:
+    geodesy.haversine_m, simulation._resample_by_distance, _cumdist, _interp_on_cum,
+    Robot.set_progress_position, Robot.add_message, Robot.get_messages_since, Robot.to_dict
+
+Inputs come from seeded generators (random-walk routes around Karlsruhe, fleets with
+messages and packages), so two runs measure the same work. Every kernel runs at a few
+size scales; the result per (kernel, scale) is the best of --repeat rounds in
+calls per second, plus the memory allocated by one call (tracemalloc, measured
+separately so it does not slow down the timing).
+
+--save-baseline stores the results; later runs compare against the baseline and exit
+with status 1 if a kernel got slower than --threshold (default 25%). Runs offline in
+well under a minute.
+
+Run: `python -m backend.benchmarks.bench_kernels [--save-baseline] [--threshold 0.25]`
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from backend.geodesy import haversine_m
+from backend.packages import Package, PackageSize
+from backend.robot import Robot
+from backend.simulation import _cumdist, _interp_on_cum, _resample_by_distance
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BASELINE = os.path.join(RESULTS_DIR, "kernels_baseline.json")
+
+Coords = List[Tuple[float, float]]
+
+
+# -------------------------
+# Seeded generators
+# -------------------------
+def synthetic_route(n_points: int, seed: int = 0, step_m: Tuple[float, float] = (20.0, 200.0)) -> Coords:
+    """
+    Random walk of n_points around Karlsruhe with segments of step_m meters.
+    """
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0.0, 0.4, n_points))
+    step = rng.uniform(step_m[0], step_m[1], n_points)
+    dlat = np.cos(heading) * step / 110540.0
+    dlon = np.sin(heading) * step / (111320.0 * np.cos(np.radians(49.0)))
+    lat = 49.0 + np.cumsum(dlat) - dlat[0]
+    lon = 8.4 + np.cumsum(dlon) - dlon[0]
+    return list(zip(lat.tolist(), lon.tolist()))
+
+
+def synthetic_fleet(n_robots: int, seed: int = 0, messages: int = 0, packages: int = 0) -> List[Robot]:
+    """
+    Robots at random positions, each with `messages` log entries and `packages` small packages.
+    """
+    rng = np.random.default_rng(seed)
+    robots = []
+    for i in range(n_robots):
+        robot = Robot(robot_id=i, is_parked=False, progress=float(rng.uniform()))
+        robot.position = (49.0 + float(rng.uniform(-0.03, 0.03)), 8.4 + float(rng.uniform(-0.05, 0.05)))
+        if packages:
+            robot.packages = [Package("Karlsruhe Hauptbahnhof", "Durlach Bahnhof", PackageSize.SMALL, k)
+                              for k in range(packages)]
+        for k in range(messages):
+            robot.add_message("ROUTE_TICK", f"Route tick: t={k}s", robot.progress)
+        robots.append(robot)
+    return robots
+
+
+# -------------------------
+# Kernels: name -> scales -> setup(scale) returning a zero-argument call
+# -------------------------
+def _haversine(scale: int) -> Callable[[], Any]:
+    pts = synthetic_route(scale + 1)
+    pairs = list(zip(pts, pts[1:]))
+
+    def call():
+        for a, b in pairs:
+            haversine_m(a, b)
+    return call
+
+
+def _resample(scale: int) -> Callable[[], Any]:
+    route = synthetic_route(scale)
+    return lambda: _resample_by_distance(route, 12.0)
+
+
+def _cum(scale: int) -> Callable[[], Any]:
+    route = synthetic_route(scale)
+    return lambda: _cumdist(route)
+
+
+def _interp(scale: int) -> Callable[[], Any]:
+    route = synthetic_route(scale)
+    cum = _cumdist(route)
+    targets = np.random.default_rng(1).uniform(0.0, cum[-1], 1000).tolist()
+    state = [0]
+
+    def call():
+        state[0] = (state[0] + 1) % len(targets)
+        return _interp_on_cum(route, cum, targets[state[0]])
+    return call
+
+
+def _set_progress(scale: int) -> Callable[[], Any]:
+    robots = synthetic_fleet(scale)
+    state = [0]
+
+    def call():
+        i = state[0] = (state[0] + 1) % len(robots)
+        robots[i].set_progress_position(0.5, 49.0, 8.4)
+    return call
+
+
+def _add_message(scale: int) -> Callable[[], Any]:
+    robot = synthetic_fleet(1, messages=scale)[0]
+
+    def call():
+        robot.add_message("ROUTE_TICK", "Route tick.", 0.5)
+        robot.trim_messages(scale)  # keep the log at the measured size
+    return call
+
+
+def _get_messages(scale: int) -> Callable[[], Any]:
+    robot = synthetic_fleet(1, messages=scale)[0]
+    since = scale // 2  # the newer half
+    return lambda: robot.get_messages_since(since)
+
+
+def _to_dict(scale: int) -> Callable[[], Any]:
+    robots = synthetic_fleet(100, packages=scale)
+    state = [0]
+
+    def call():
+        i = state[0] = (state[0] + 1) % len(robots)
+        robots[i].battery_status = 50.0 + i % 7  # changes the cold section, so it is rebuilt
+        return robots[i].to_dict()
+    return call
+
+
+KERNELS: Dict[str, Tuple[Callable[[int], Callable[[], Any]], List[int], str]] = {
+    "haversine_m": (_haversine, [1000], "point pairs per call"),
+    "resample_by_distance": (_resample, [10, 100, 1000], "route points"),
+    "cumdist": (_cum, [100, 1000, 10000], "route points"),
+    "interp_on_cum": (_interp, [100, 1000, 10000], "route points"),
+    "set_progress_position": (_set_progress, [100, 10000], "fleet size"),
+    "add_message": (_add_message, [10, 500], "messages kept"),
+    "get_messages_since": (_get_messages, [10, 100, 500], "messages in the log"),
+    "to_dict": (_to_dict, [0, 6], "packages per robot"),
+}
+
+
+# -------------------------
+# Measurement
+# -------------------------
+def time_call(call: Callable[[], Any], min_time: float, repeat: int) -> float:
+    """
+    Best calls per second over `repeat` rounds of at least min_time seconds
+    (garbage collection is off while timing, like timeit).
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _time_call(call, min_time, repeat)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _time_call(call: Callable[[], Any], min_time: float, repeat: int) -> float:
+    # calibrate the number of calls per round
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            call()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time / 10 or n >= 1 << 24:
+            break
+        n *= 4
+    per_round = max(1, int(n * min_time / max(elapsed, 1e-9)))
+
+    best = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(per_round):
+            call()
+        best = max(best, per_round / (time.perf_counter() - t0))
+    return best
+
+
+def allocations(call: Callable[[], Any], calls: int = 20) -> Tuple[float, float]:
+    """
+    (peak bytes, net retained bytes) per call, traced with tracemalloc.
+    """
+    call()  # warm caches
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(calls):
+            call()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - before) / calls, (after - before) / calls
+
+
+def run(selected: List[str], min_time: float, repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for name in selected:
+        setup, scales, unit = KERNELS[name]
+        for scale in scales:
+            ops = time_call(setup(scale), min_time, repeat)
+            peak, net = allocations(setup(scale))
+            results.append({"kernel": name, "scale": scale, "unit": unit, "ops_per_s": round(ops, 1),
+                            "alloc_peak_bytes": round(peak, 1), "alloc_net_bytes": round(net, 1)})
+            print(f"{name:<22} {unit:<22} {scale:>6}: {ops:>13,.0f} ops/s  "
+                  f"alloc peak {peak:>10,.0f} B  net {net:>9,.0f} B")
+    return results
+
+
+def check(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> int:
+    """
+    Print the change against the baseline; returns the number of regressions.
+    """
+    before = {(r["kernel"], r["scale"]): r for r in baseline["results"]}
+    regressions = 0
+    print(f"\nagainst baseline from {time.ctime(baseline['meta']['created'])} (threshold {threshold:.0%}):")
+    for r in results:
+        b = before.get((r["kernel"], r["scale"]))
+        if b is None or not b["ops_per_s"]:
+            print(f"  {r['kernel']:<22} {r['scale']:>6}: no baseline")
+            continue
+        change = r["ops_per_s"] / b["ops_per_s"] - 1.0
+        status = "ok"
+        if change < -threshold:
+            status = "REGRESSION"
+            regressions += 1
+        print(f"  {r['kernel']:<22} {r['scale']:>6}: {change:>+7.1%}  {status}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kernels", nargs="+", choices=sorted(KERNELS), default=list(KERNELS))
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run(args.kernels, args.min_time, args.repeat)
+    report = {"meta": {"created": time.time(), "python": platform.python_version(),
+                       "machine": platform.machine()}, "results": results}
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"\nbaseline written to {args.baseline}")
+        return
+    if not os.path.isfile(args.baseline):
+        print(f"\nno baseline at {args.baseline}; run with --save-baseline first")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if check(results, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
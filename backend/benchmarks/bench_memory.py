@@ -0,0 +1,115 @@
+"""
+Memory benchmark for Robot and Package (backend/robot.py, backend/packages.py).
+
+Builds a fleet with tracemalloc running and reports the allocated bytes per robot
+and per package. "before" uses a copy of the previous layout (plain dataclass with a
+lock per robot and eagerly allocated lists, Package with an instance __dict__);
+"after" uses the current classes.
+
+Run: `python -m backend.benchmarks.bench_memory --robots 100000 --packages-per-robot 2`
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import threading
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.packages import Package, PackageSize
+from backend.robot import Robot
+
+
+STATIONS = ["Karlsruhe Hauptbahnhof", "Durlach Bahnhof", "Marktplatz", "Europaplatz"]
+
+
+class LegacyPackage:
+    """Previous Package layout (instance __dict__)."""
+
+    def __init__(self, start: str, destination: str, size: PackageSize):
+        self._start = start
+        self._destination = destination
+        self._size = size
+
+
+@dataclass
+class LegacyRobot:
+    """Previous Robot layout (instance __dict__, own lock, eager lists)."""
+
+    robot_id: int
+    is_parked: bool = True
+    is_door_opened: bool = False
+    is_reversing: bool = False
+    is_charging: bool = False
+    battery_status: float = 100.0
+    message: str = ""
+    led_rgb: Tuple[int, int, int] = (0, 255, 0)
+    progress: float = 0.0
+    position: Optional[Tuple[float, float]] = None
+    _packages: List[Any] = field(default_factory=list, repr=False)
+    _messages: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+    _last_message_id: int = field(default=0, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+def _copy(name: str) -> str:
+    # station names from HTTP requests are fresh string objects, not literals
+    return "".join(list(name))
+
+
+def _build_legacy(n_robots: int, n_pkgs: int) -> List[LegacyRobot]:
+    robots = []
+    for i in range(n_robots):
+        r = LegacyRobot(robot_id=i)
+        for k in range(n_pkgs):
+            r._packages.append(LegacyPackage(_copy(STATIONS[k % 4]), _copy(STATIONS[(k + 1) % 4]), PackageSize.SMALL))
+        robots.append(r)
+    return robots
+
+
+def _build_current(n_robots: int, n_pkgs: int) -> List[Robot]:
+    robots = []
+    for i in range(n_robots):
+        r = Robot(robot_id=i)
+        for k in range(n_pkgs):
+            r.add_package(Package(_copy(STATIONS[k % 4]), _copy(STATIONS[(k + 1) % 4]), PackageSize.SMALL))
+        robots.append(r)
+    return robots
+
+
+def measure(builder, n_robots: int, n_pkgs: int) -> int:
+    """
+    Return the bytes still allocated after building the fleet.
+    """
+    gc.collect()
+    tracemalloc.start()
+    fleet = builder(n_robots, n_pkgs)
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del fleet
+    gc.collect()
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=100_000)
+    parser.add_argument("--packages-per-robot", type=int, default=2)
+    args = parser.parse_args()
+    n, k = args.robots, args.packages_per_robot
+
+    for label, builder in (("before", _build_legacy), ("after", _build_current)):
+        empty = measure(builder, n, 0)
+        loaded = measure(builder, n, k)
+        per_pkg = (loaded - empty) / (n * k) if k else 0.0
+        print(
+            f"{label:>6}: {empty / n:7.1f} bytes/robot (empty), "
+            f"{loaded / n:7.1f} bytes/robot with {k} packages, {per_pkg:6.1f} bytes/package, "
+            f"total {loaded / 2 ** 20:.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
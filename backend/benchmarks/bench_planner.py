@@ -0,0 +1,79 @@
+"""
+Benchmark for the multi-stop delivery planner (backend/planner.py).
+
+Fleets of robots, each fully loaded (two large and six small packages) to random
+stations in Karlsruhe, are planned on the synthetic street grid from bench_distance_matrix (no
+download needed). Reports robots planned per second; the TSP heuristic is checked
+against the optimum (all permutations) for random small instances.
+
+Run: `python -m backend.benchmarks.bench_planner --sizes 100 500`
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from backend.benchmarks.bench_distance_matrix import street_grid
+from backend.packages import Package, PackageSize
+from backend.planner import path_cost, plan_routes, solve_open_tsp
+from backend.road_network import RoadNetwork
+from backend.robot import MAX_NUM_OF_LARGE_PACKAGES, MAX_NUM_OF_PACKAGES, MAX_NUM_OF_SMALL_PACKAGES, Robot
+from backend.stations import list_stations, station_coords
+
+
+def tsp_quality(instances: int, seed: int = 1) -> None:
+    rng = np.random.default_rng(seed)
+    gaps = []
+    for _ in range(instances):
+        n = int(rng.integers(3, MAX_NUM_OF_PACKAGES + 2))
+        pts = rng.random((n, 2))
+        # directed distances: euclidean with a random detour per direction
+        dist = (np.hypot(*(pts[:, None] - pts[None]).transpose(2, 0, 1)) * rng.uniform(1.0, 1.3, (n, n))).tolist()
+        cost = path_cost(dist, solve_open_tsp(dist))
+        best = min(path_cost(dist, (0,) + p) for p in itertools.permutations(range(1, n)))
+        gaps.append(cost / best - 1.0)
+    gaps = np.array(gaps) * 100
+    print(f"TSP heuristic vs optimum ({instances} instances): mean gap {gaps.mean():.2f}%, "
+          f"optimal in {np.mean(gaps < 1e-6) * 100:.0f}%, worst {gaps.max():.1f}%")
+
+
+def run(net: RoadNetwork, n_robots: int, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    stations = [s for s in list_stations() if s["triasName"].startswith("Karlsruhe")] or list_stations()
+    robots = []
+    for i in range(n_robots):
+        robot = Robot(robot_id=i)
+        robot.position = station_coords(stations[int(rng.integers(len(stations)))])
+        sizes = [PackageSize.LARGE] * MAX_NUM_OF_LARGE_PACKAGES + [PackageSize.SMALL] * MAX_NUM_OF_SMALL_PACKAGES
+        robot.packages = [Package("Karlsruhe Hauptbahnhof", stations[int(k)]["name"], size)
+                          for k, size in zip(rng.integers(len(stations), size=len(sizes)), sizes)]
+        robots.append(robot)
+
+    t0 = time.perf_counter()
+    plans = plan_routes(robots, net)
+    t = time.perf_counter() - t0
+    stops = sum(len(p.stops) for p in plans)
+    km = sum(p.total_m for p in plans) / 1000.0
+    print(f"robots={n_robots:>5}: {t:.2f} s ({n_robots / t:.0f} robots/s), {stops} stops, "
+          f"{km / n_robots:.1f} km per route")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--grid", type=int, default=110)
+    parser.add_argument("--instances", type=int, default=200)
+    args = parser.parse_args()
+
+    tsp_quality(args.instances)
+    net = RoadNetwork.from_graph(street_grid(args.grid))
+    for n in args.sizes:
+        run(net, n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+"""
+Load generator for many map displays polling one backend process.
+
+Every open map (Mode B script of Map.to_html in geography.py) polls
+/api/robot/read?fields=hot every 250 ms: the next poll is scheduled 250 ms after the
+previous response. The Angular RobotService reads the full status and message log.
+This benchmark models those clients with asyncio, one coroutine and one keep-alive
+connection per display, each with its own since_message_id cursor:
+    - map displays: fields=hot, since_message_id=<last_message_id seen>, every --interval
+    - dashboards (--dashboards share of the displays): full read every --dashboard-interval
+    - route traffic: POST /api/map/dispatch with --route-batch robots, --route-rate per second
+    - package traffic: POST /api/pkg/create (and /api/pkg/unload once a robot is full),
+      --pkg-rate per second
+
+By default the backend is started in a child process (threaded Werkzeug server, the
+OSMnx download replaced by the synthetic street grid of bench_distance_matrix, so it
+runs offline); --url targets a backend that is already running instead.
+
+The display count is ramped through --clients. Per step the report shows the latency
+histogram of the polls, p50 / p95 / p99, the achieved poll rate, dropped polls (errors
+and timeouts) and the CPU used by the server process (Linux /proc). A step is
+saturated when the p95 poll latency exceeds --slo-ms (default: the poll interval, then
+a display misses updates), more than 1% of the polls are dropped or the displays get
+less than half of their poll rate.
+
+The load generator shares the machine with the server; its own CPU time is reported
+as well, so a client-bound run can be told apart.
+
+Run: `python -m backend.benchmarks.bench_polling --clients 100 500 1000 2000 --duration 20`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from backend.robot import MAX_NUM_OF_SMALL_PACKAGES
+from backend.stations import list_stations
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+HISTOGRAM_MS: List[float] = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+# -------------------------
+# Minimal keep-alive HTTP/1.1 client
+# -------------------------
+class HttpConnection:
+    """
+    One persistent connection, like a browser tab; reconnects after errors.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        data = b"" if body is None else json.dumps(body).encode()
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Length: {len(data)}\r\n"
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        self._writer.write(head.encode() + b"\r\n" + data)
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by the server")
+        status = int(status_line.split()[1])
+        length, close = None, status_line.startswith(b"HTTP/1.0")
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection":
+                close = value.strip().lower() == "close"
+        payload = await self._reader.readexactly(length) if length is not None else await self._reader.read()
+        if close or length is None:
+            self.close()
+        return status, payload
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+# -------------------------
+# Statistics
+# -------------------------
+@dataclass
+class Stats:
+    """
+    Latencies (seconds) and counters of one step, per request kind.
+    """
+
+    measure_from: float = 0.0  # polls before this time (warmup) are not recorded
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    dropped: Dict[str, int] = field(default_factory=dict)
+    rejected: Dict[str, int] = field(default_factory=dict)
+    new_messages: int = 0
+
+    def record(self, kind: str, t0: float, latency: Optional[float], status: int = 0) -> None:
+        if t0 < self.measure_from:
+            return
+        if latency is None or status >= 500:
+            self.dropped[kind] = self.dropped.get(kind, 0) + 1
+        elif status >= 400:
+            self.rejected[kind] = self.rejected.get(kind, 0) + 1
+        else:
+            self.latencies.setdefault(kind, []).append(latency)
+
+    def summary(self, kind: str, seconds: float) -> Dict[str, Any]:
+        lat = np.asarray(self.latencies.get(kind, [])) * 1000.0
+        dropped = self.dropped.get(kind, 0)
+        total = len(lat) + dropped + self.rejected.get(kind, 0)
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if len(lat) else (0.0, 0.0, 0.0)
+        counts, _ = np.histogram(lat, bins=[0.0] + HISTOGRAM_MS + [np.inf])
+        return {
+            "requests": total,
+            "per_s": round(total / seconds, 1),
+            "dropped": dropped,
+            "rejected": self.rejected.get(kind, 0),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(lat.max()), 2) if len(lat) else 0.0,
+            "histogram": counts.tolist(),
+        }
+
+
+def print_histogram(counts: List[int], width: int = 40) -> None:
+    top = max(counts) or 1
+    labels = [f"<{b:g}" for b in HISTOGRAM_MS] + [f">={HISTOGRAM_MS[-1]:g}"]
+    for label, n in zip(labels, counts):
+        if n:
+            print(f"      {label:>7} ms {n:>8}  {'#' * max(1, round(width * n / top))}")
+
+
+# -------------------------
+# Virtual clients
+# -------------------------
+async def display(conn: HttpConnection, robot_id: int, stats: Stats, stop_at: float,
+                  interval: float, timeout: float, hot: bool) -> None:
+    """
+    One map display: poll, then schedule the next poll `interval` after the response.
+    """
+    kind = "poll_hot" if hot else "poll_full"
+    cursor = 0
+    await asyncio.sleep(random.uniform(0.0, interval))  # tabs were not opened at the same time
+    while time.perf_counter() < stop_at:
+        query = {"robot_id": robot_id, "since_message_id": cursor}
+        if hot:
+            query["fields"] = "hot"
+        t0 = time.perf_counter()
+        try:
+            status, body = await asyncio.wait_for(conn.request("GET", "/api/robot/read?" + urlencode(query)), timeout)
+            latency = time.perf_counter() - t0
+            if status == 200:
+                data = json.loads(body)
+                stats.new_messages += len(data["messages"])
+                cursor = data["last_message_id"]
+            stats.record(kind, t0, latency, status)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            conn.close()
+            stats.record(kind, t0, None)
+        await asyncio.sleep(interval)
+
+
+async def traffic(conn: HttpConnection, kind: str, rate: float, stats: Stats, stop_at: float,
+                  timeout: float, make_request) -> None:
+    """
+    Send make_request() -> (method, path, body) `rate` times per second (open loop).
+    """
+    if rate <= 0:
+        return
+    next_at = time.perf_counter() + random.expovariate(rate)
+    while next_at < stop_at:
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        next_at += random.expovariate(rate)
+        method, path, body = make_request()
+        t0 = time.perf_counter()
+        try:
+            status, _ = await asyncio.wait_for(conn.request(method, path, body), timeout)
+            stats.record(kind, t0, time.perf_counter() - t0, status)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            conn.close()
+            stats.record(kind, t0, None)
+
+
+class Workload:
+    """
+    Random route and package requests for a fleet of `robots`.
+    """
+
+    def __init__(self, robots: int, route_batch: int, seed: int):
+        self.rng = random.Random(seed)
+        self.robots = robots
+        self.route_batch = min(route_batch, robots)
+        self.names = [s["name"] for s in list_stations() if s["triasName"].startswith("Karlsruhe")]
+        self.loaded: Dict[int, List[str]] = {}  # robot_id -> destinations of the packages sent to it
+
+    def route(self) -> Tuple[str, str, Dict[str, Any]]:
+        ids = self.rng.sample(range(self.robots), self.route_batch)
+        routes = [{"robot_id": i, "start": self.rng.choice(self.names), "end": self.rng.choice(self.names),
+                   "duration_s": 60} for i in ids]
+        return "POST", "/api/map/dispatch", {"routes": routes}
+
+    def package(self) -> Tuple[str, str, None]:
+        robot_id = self.rng.randrange(self.robots)
+        loaded = self.loaded.setdefault(robot_id, [])
+        if len(loaded) >= MAX_NUM_OF_SMALL_PACKAGES:
+            # full: deliver at one of the destinations
+            station = loaded.pop(self.rng.randrange(len(loaded)))
+            loaded[:] = [d for d in loaded if d != station]
+            return "POST", "/api/pkg/unload?" + urlencode({"robot_id": robot_id, "station": station}), None
+        destination = self.rng.choice(self.names)
+        loaded.append(destination)
+        query = {"robot_id": robot_id, "pkg_size": 0, "start": "Karlsruhe Hauptbahnhof", "destination": destination}
+        return "POST", "/api/pkg/create?" + urlencode(query), None
+
+
+# -------------------------
+# Server process
+# -------------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cpu_seconds(pid: Optional[int]) -> Optional[float]:
+    """
+    User + system CPU time of a process (Linux /proc), None if not available.
+    """
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="ascii") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def proc_status(pid: Optional[int]) -> Dict[str, int]:
+    """
+    Resident memory (bytes) and thread count of a process (Linux /proc).
+    """
+    out: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    out["rss_bytes"] = int(line.split()[1]) * 1024
+                elif line.startswith("Threads:"):
+                    out["threads"] = int(line.split()[1])
+    except (OSError, TypeError):
+        pass
+    return out
+
+
+def serve(port: int, grid: int, osm: bool) -> None:
+    """
+    Run backend.app on 127.0.0.1:port with the threaded Werkzeug server (child process).
+    """
+    os.environ.setdefault("KVV_JOURNAL_DIR", tempfile.mkdtemp(prefix="kvv-bench-journal-"))
+    if not osm:
+        os.environ.setdefault("KVV_WARMUP", "0")  # the road network is replaced below
+    from unittest import mock
+
+    from backend import app as backend_app
+    from backend.benchmarks.bench_distance_matrix import street_grid
+    from backend.road_network import RoadNetwork
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log line per poll
+    if osm:
+        backend_app.app.run(host="127.0.0.1", port=port, threaded=True)
+        return
+    network = RoadNetwork.from_graph(street_grid(grid))
+    with mock.patch("backend.road_network.load_road_network", return_value=network), \
+            mock.patch("backend.api.map.load_road_network", return_value=network):
+        backend_app.app.run(host="127.0.0.1", port=port, threaded=True)
+
+
+def start_server(grid: int, osm: bool) -> Tuple[subprocess.Popen, int]:
+    port = free_port()
+    cmd = [sys.executable, "-m", "backend.benchmarks.bench_polling", "--serve", str(port), "--grid", str(grid)]
+    if osm:
+        cmd.append("--osm")
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    proc = subprocess.Popen(cmd, cwd=root)
+    return proc, port
+
+
+async def wait_ready(host: str, port: int, timeout: float = 120.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while True:
+        conn = HttpConnection(host, port)
+        try:
+            status, _ = await conn.request("GET", "/api/hello")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"backend on {host}:{port} did not start")
+        await asyncio.sleep(0.5)
+
+
+async def setup_fleet(host: str, port: int, robots: int) -> None:
+    conn = HttpConnection(host, port)
+    try:
+        await conn.request("POST", "/api/sim/reset")
+        for _ in range(robots):
+            await conn.request("POST", "/api/robot/create")
+    finally:
+        conn.close()
+
+
+# -------------------------
+# Steps
+# -------------------------
+async def run_step(host: str, port: int, pid: Optional[int], clients: int, args) -> Dict[str, Any]:
+    stats = Stats()
+    workload = Workload(args.robots, args.route_batch, args.seed + clients)
+    rng = random.Random(args.seed)
+    n_dash = int(round(clients * args.dashboards))
+    start = time.perf_counter()
+    stats.measure_from = start + args.warmup
+    stop_at = stats.measure_from + args.duration
+
+    conns = [HttpConnection(host, port) for _ in range(clients + 2)]
+    tasks = [display(conns[k], rng.randrange(args.robots), stats, stop_at, args.interval, args.timeout, True)
+             for k in range(clients - n_dash)]
+    tasks += [display(conns[k], rng.randrange(args.robots), stats, stop_at, args.dashboard_interval,
+                      args.timeout, False) for k in range(clients - n_dash, clients)]
+    tasks.append(traffic(conns[-2], "route_start", args.route_rate, stats, stop_at, args.timeout, workload.route))
+    tasks.append(traffic(conns[-1], "package", args.pkg_rate, stats, stop_at, args.timeout, workload.package))
+
+    async def measure_cpu():
+        await asyncio.sleep(max(0.0, stats.measure_from - time.perf_counter()))
+        return cpu_seconds(pid), time.process_time(), time.perf_counter()
+
+    cpu_task = asyncio.ensure_future(measure_cpu())
+    await asyncio.gather(*tasks)
+    server_cpu0, client_cpu0, t0 = await cpu_task
+    server_cpu1, client_cpu1, t1 = cpu_seconds(pid), time.process_time(), time.perf_counter()
+    for conn in conns:
+        conn.close()
+
+    wall = max(1e-9, t1 - t0)  # includes the requests still running at stop_at
+    result: Dict[str, Any] = {
+        "clients": clients,
+        "dashboards": n_dash,
+        "seconds": round(wall, 2),
+        "server_cpu_pct": None if server_cpu0 is None or server_cpu1 is None
+        else round(100.0 * (server_cpu1 - server_cpu0) / wall, 1),
+        "client_cpu_pct": round(100.0 * (client_cpu1 - client_cpu0) / wall, 1),
+        "new_messages": stats.new_messages,
+        "kinds": {kind: stats.summary(kind, args.duration)
+                  for kind in ("poll_hot", "poll_full", "route_start", "package")
+                  if kind in stats.latencies or kind in stats.dropped or kind in stats.rejected},
+    }
+    result.update(proc_status(pid))
+    polls = result["kinds"].get("poll_hot", {"requests": 0, "dropped": 0, "p95_ms": 0.0})
+    # every display would poll about 1 / interval times per second with an instant server
+    result["ideal_polls_per_s"] = round((clients - n_dash) / args.interval, 1)
+    result["saturated"] = bool(polls["p95_ms"] > args.slo_ms
+                               or polls["dropped"] > 0.01 * max(1, polls["requests"])
+                               or polls["requests"] < 0.5 * result["ideal_polls_per_s"] * args.duration)
+    return result
+
+
+def print_step(result: Dict[str, Any]) -> None:
+    cpu = "n/a" if result["server_cpu_pct"] is None else f"{result['server_cpu_pct']:.0f}%"
+    print(f"clients={result['clients']} ({result['dashboards']} dashboards)  server CPU {cpu}  "
+          f"client CPU {result['client_cpu_pct']:.0f}%  threads {result.get('threads', 'n/a')}  "
+          f"{'SATURATED' if result['saturated'] else 'ok'}")
+    for kind, s in result["kinds"].items():
+        extra = f" (ideal {result['ideal_polls_per_s']:.0f}/s)" if kind == "poll_hot" else ""
+        print(f"  {kind:<12} {s['per_s']:>8.1f}/s{extra}  p50 {s['p50_ms']:>8.2f} ms  p95 {s['p95_ms']:>8.2f} ms  "
+              f"p99 {s['p99_ms']:>8.2f} ms  dropped {s['dropped']}  rejected {s['rejected']}")
+    if "poll_hot" in result["kinds"]:
+        print_histogram(result["kinds"]["poll_hot"]["histogram"])
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(__file__), timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+async def run(args) -> Dict[str, Any]:
+    proc = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port, pid = parts.hostname or "127.0.0.1", parts.port or 80, args.server_pid
+    else:
+        proc, port = start_server(args.grid, args.osm)
+        host, pid = "127.0.0.1", proc.pid
+    try:
+        await wait_ready(host, port)
+        await setup_fleet(host, port, args.robots)
+        report: Dict[str, Any] = {
+            "meta": {"commit": git_commit(), "created": time.time(), "python": platform.python_version(),
+                     "machine": platform.machine(), "cpus": os.cpu_count(), "interval_s": args.interval,
+                     "robots": args.robots, "route_rate": args.route_rate, "pkg_rate": args.pkg_rate},
+            "steps": [],
+        }
+        for clients in args.clients:
+            result = await run_step(host, port, pid, clients, args)
+            print_step(result)
+            report["steps"].append(result)
+        return report
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 500, 1000, 2000],
+                        help="number of displays per step")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds per step that are not measured")
+    parser.add_argument("--interval", type=float, default=0.25, help="poll interval of a map display")
+    parser.add_argument("--dashboards", type=float, default=0.05, help="share of full-status readers")
+    parser.add_argument("--dashboard-interval", type=float, default=2.0)
+    parser.add_argument("--robots", type=int, default=200, help="fleet size created before the run")
+    parser.add_argument("--route-rate", type=float, default=2.0, help="dispatch requests per second")
+    parser.add_argument("--route-batch", type=int, default=5, help="robots per dispatch request")
+    parser.add_argument("--pkg-rate", type=float, default=10.0, help="package requests per second")
+    parser.add_argument("--timeout", type=float, default=5.0, help="a slower request counts as dropped")
+    parser.add_argument("--slo-ms", type=float, default=None, help="p95 poll latency limit (default: interval)")
+    parser.add_argument("--grid", type=int, default=110, help="size of the stub street grid")
+    parser.add_argument("--osm", action="store_true", help="use the real OSMnx network (needs network access)")
+    parser.add_argument("--url", default=None, help="running backend, e.g. http://127.0.0.1:5000")
+    parser.add_argument("--server-pid", type=int, default=None, help="pid of the --url backend (for CPU)")
+    parser.add_argument("--out", default=None, help="result file (default: results/bench_polling-<commit>.json)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--serve", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args.serve, args.grid, args.osm)
+        return
+    if args.slo_ms is None:
+        args.slo_ms = args.interval * 1000.0
+    random.seed(args.seed)
+
+    report = asyncio.run(run(args))
+    ok = [s["clients"] for s in report["steps"] if not s["saturated"]]
+    first_bad = next((s["clients"] for s in report["steps"] if s["saturated"]), None)
+    print(f"\nlargest step that was not saturated (p95 <= {args.slo_ms:.0f} ms): "
+          f"{max(ok) if ok else 'none'} displays" + (f"; saturated at {first_bad}" if first_bad else ""))
+
+    out: Optional[str] = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"bench_polling-{report['meta']['commit']}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"written to {out}")
+
+
+if __name__ == "__main__":
+    main()
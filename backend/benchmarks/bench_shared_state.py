@@ -0,0 +1,261 @@
+"""
+Shared fleet state (shared_state.py): publish cost in the owner and read throughput
+over read worker processes.
+
+1. In process, --robots robots: one publish round with every robot changed and with 1%
+   changed, and the cost of one read from the shared block (seqlock copy +
+   SharedRobot.to_json / hot_dict) next to Robot.to_json in the owner.
+2. Over HTTP: an owner process (Simulation publishing to a shared block; a mover thread
+   updates --move-rate robot positions per second and adds a message to every 20th)
+   and, per step of --workers, that many read worker processes (read_worker.py, one
+   shared port). --load-procs load generator processes keep --connections keep-alive
+   connections busy with GET /api/robot/read?fields=hot, each with its own
+   since_message_id cursor. Per step: requests/s, p50 / p99 latency and the speed-up
+   over the first step. Reads only scale while workers + load processes fit the CPUs.
+
+Run: `python -m backend.benchmarks.bench_shared_state --workers 1 2 4 --duration 10`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List
+
+import numpy as np
+
+from backend.benchmarks.bench_polling import HttpConnection, cpu_seconds, free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+KARLSRUHE = (49.0094, 8.4044)
+
+
+# -------------------------
+# In-process costs
+# -------------------------
+def _per_call_us(fn, ids: List[int]) -> float:
+    t0 = time.perf_counter()
+    for i in ids:
+        fn(i)
+    return (time.perf_counter() - t0) / len(ids) * 1e6
+
+
+def kernels(robots: int) -> None:
+    from backend.robot import Robot
+    from backend.shared_state import FleetPublisher, SharedSimulation
+    from backend.simulation import Simulation
+
+    name = f"kvv-bench-{os.getpid()}"
+    sim = Simulation()
+    sim.engine.stop()
+    rng = random.Random(1)
+    for i in range(robots):
+        robot = Robot(i)
+        robot.reset_progress(KARLSRUHE[0] + rng.uniform(-0.05, 0.05), KARLSRUHE[1] + rng.uniform(-0.05, 0.05))
+        sim.robots.append(robot)
+    publisher = FleetPublisher(sim, name, capacity=robots)  # published by hand, no thread
+    try:
+        t0 = time.perf_counter()
+        publisher.publish()
+        full = time.perf_counter() - t0
+
+        def move(share: float) -> float:
+            for robot in rng.sample(sim.robots, max(1, int(robots * share))):
+                lat, lon = robot.position
+                robot.set_progress_position(robot.progress + 0.001, lat + 1e-5, lon + 1e-5)
+            t0 = time.perf_counter()
+            publisher.publish()
+            return time.perf_counter() - t0
+
+        all_moved, some_moved = move(1.0), move(0.01)
+        print(f"publish, {robots} robots: first round {full * 1000:.1f} ms, all moved {all_moved * 1000:.1f} ms "
+              f"({all_moved / robots * 1e6:.2f} us/robot), 1% moved {some_moved * 1000:.2f} ms")
+
+        view = SharedSimulation(name)
+        ids = [rng.randrange(robots) for _ in range(20000)]
+        owner_us = _per_call_us(lambda i: sim.robots[i].to_json(), ids)
+        shared_us = _per_call_us(lambda i: view.robots[i].to_json(), ids)
+        hot_us = _per_call_us(lambda i: json.dumps(view.robots[i].hot_dict()), ids)
+        print(f"read: Robot.to_json {owner_us:.2f} us, shared to_json {shared_us:.2f} us, "
+              f"shared hot_dict + json {hot_us:.2f} us")
+        view.close()
+    finally:
+        publisher.close()
+
+
+# -------------------------
+# Owner and workers (child processes)
+# -------------------------
+def owner(name: str, journal_dir: str, robots: int, move_rate: float) -> None:
+    """
+    Owner process: fleet in shared memory, a mover changing positions (hidden --owner).
+    """
+    from backend.robot import Robot
+    from backend.simulation import Simulation
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # atexit unlinks the block
+    sim = Simulation(journal_dir=journal_dir, shared_state=name)
+    rng = random.Random(2)
+    for i in range(robots):
+        robot = Robot(i)
+        robot.reset_progress(*KARLSRUHE)
+        sim.robots.append(robot)
+    step = 0.01
+    per_step = max(1, int(move_rate * step))
+    n = 0
+    while True:
+        for robot in rng.sample(sim.robots, min(per_step, robots)):
+            lat, lon = robot.position
+            robot.set_progress_position(robot.progress + 0.0005, lat + 1e-5, lon + 1e-5)
+            n += 1
+            if n % 20 == 0:
+                robot.add_message("ROUTE_TICK", "moved", robot.progress)
+        time.sleep(step)
+
+
+def _get_status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=2) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def _wait(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if _get_status(url) == 200:
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+# -------------------------
+# Load generator (child processes)
+# -------------------------
+async def _connection(port: int, robots: int, stop_at: float, measure_from: float, out: List[float],
+                      seed: int) -> None:
+    conn = HttpConnection("127.0.0.1", port)
+    rng = random.Random(seed)
+    robot_id = rng.randrange(robots)
+    cursor = 0
+    while True:
+        t0 = time.perf_counter()
+        if t0 >= stop_at:
+            break
+        try:
+            status, body = await conn.request(
+                "GET", f"/api/robot/read?robot_id={robot_id}&fields=hot&since_message_id={cursor}")
+        except (OSError, ConnectionError, asyncio.IncompleteReadError):
+            conn.close()
+            continue
+        if status == 200:
+            cursor = json.loads(body)["last_message_id"]
+            if t0 >= measure_from:
+                out.append(time.perf_counter() - t0)
+    conn.close()
+
+
+def load(port: int, robots: int, connections: int, seconds: float, warmup: float, seed: int, queue) -> None:
+    out: List[float] = []
+    now = time.perf_counter()
+
+    async def main():
+        await asyncio.gather(*(_connection(port, robots, now + warmup + seconds, now + warmup, out, seed * 1000 + c)
+                               for c in range(connections)))
+
+    asyncio.run(main())
+    queue.put(np.asarray(out, dtype=np.float64).tobytes())
+
+
+def run_step(port: int, workers: int, args) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    per_proc = max(1, args.connections // args.load_procs)
+    procs = [ctx.Process(target=load, args=(port, args.robots, per_proc, args.duration, args.warmup, p, queue))
+             for p in range(args.load_procs)]
+    for p in procs:
+        p.start()
+    latencies = np.concatenate([np.frombuffer(queue.get(), dtype=np.float64) for _ in procs])
+    for p in procs:
+        p.join()
+    ms = latencies * 1000.0
+    return {
+        "workers": workers,
+        "requests": len(ms),
+        "rps": len(ms) / args.duration,
+        "p50_ms": float(np.percentile(ms, 50)) if len(ms) else None,
+        "p99_ms": float(np.percentile(ms, 99)) if len(ms) else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="read worker processes per step")
+    parser.add_argument("--connections", type=int, default=64, help="keep-alive connections (all load processes)")
+    parser.add_argument("--load-procs", type=int, default=2, help="load generator processes")
+    parser.add_argument("--move-rate", type=float, default=2000.0, help="position updates per second in the owner")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--skip-http", action="store_true", help="only the in-process costs")
+    parser.add_argument("--owner", nargs=2, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.owner:
+        owner(args.owner[0], args.owner[1], args.robots, args.move_rate)
+        return
+
+    kernels(args.robots)
+    if args.skip_http:
+        return
+
+    name = f"kvv-bench-fleet-{os.getpid()}"
+    journal_dir = tempfile.mkdtemp(prefix="kvv-bench-journal-")
+    env = dict(os.environ, KVV_WARMUP="0")
+    owner_proc = subprocess.Popen([sys.executable, "-m", "backend.benchmarks.bench_shared_state", "--owner", name,
+                                   journal_dir, "--robots", str(args.robots), "--move-rate", str(args.move_rate)],
+                                  cwd=ROOT, env=env)
+    print(f"\nHTTP reads (/api/robot/read?fields=hot), {args.robots} robots, {args.move_rate:g} moves/s, "
+          f"{args.connections} connections from {args.load_procs} processes, {os.cpu_count()} CPUs:")
+    first = None
+    try:
+        for workers in args.workers:
+            port = free_port()
+            proc = subprocess.Popen([sys.executable, "-m", "backend.read_worker", "--name", name, "--workers",
+                                     str(workers), "--port", str(port), "--journal-dir", journal_dir],
+                                    cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                _wait(f"http://127.0.0.1:{port}/ready")
+                time.sleep(1.0)  # the remaining workers start listening
+                cpu0 = cpu_seconds(owner_proc.pid)
+                result = run_step(port, workers, args)
+                cpu1 = cpu_seconds(owner_proc.pid)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            first = first or result["rps"]
+            owner_cpu = "" if cpu0 is None else \
+                f"  owner CPU {(cpu1 - cpu0) / (args.duration + args.warmup) * 100:.0f}%"
+            print(f"  {workers:>3} workers: {result['rps']:>9.0f} req/s ({result['rps'] / first:.2f}x)  "
+                  f"p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms{owner_cpu}")
+    finally:
+        owner_proc.terminate()
+        owner_proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Startup benchmark: import cost of backend.app and time until the server answers.
+
+1. `import backend.app` in fresh interpreters (--runs times): wall time, the modules
+   with the largest cumulative import time (python -X importtime) and whether the heavy
+   geo stack (osmnx, folium, geopandas, scipy) stayed unloaded.
+2. A backend is started in a child process (threaded Werkzeug server, warmup on) and
+   polled every 10 ms: time until /api/sim/heartbeat first answers, heartbeat latency
+   while the warmup runs in the background, and time until /ready reports ready with
+   the duration of every warmup stage. Without internet access the road_network stage
+   fails quickly; the process is ready anyway.
+
+Run: `python -m backend.benchmarks.bench_startup --runs 5`
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HEAVY_MODULES = ["osmnx", "folium", "geopandas", "pandas", "shapely", "sklearn", "scipy", "matplotlib"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+import backend.app
+seconds = time.perf_counter() - t0
+backend.app.sim.engine.stop()
+print(json.dumps({"seconds": seconds, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _env(**extra: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("KVV_JOURNAL_DIR", tempfile.mkdtemp(prefix="kvv-bench-journal-"))
+    env.update(extra)
+    return env
+
+
+def import_times(runs: int) -> Tuple[List[float], List[str]]:
+    seconds, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=_env(KVV_WARMUP="0"),
+                             capture_output=True, text=True, check=True)
+        data = json.loads(out.stdout.strip().splitlines()[-1])
+        seconds.append(data["seconds"])
+        loaded = data["loaded"]
+    return seconds, loaded
+
+
+def import_profile(top: int) -> List[Tuple[float, str]]:
+    """
+    (cumulative seconds, module) of the slowest imports under backend.app.
+    """
+    code = "import backend.app; backend.app.sim.engine.stop()"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=_env(KVV_WARMUP="0"),
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def _get(url: str, timeout: float = 5.0) -> Tuple[Optional[int], Optional[Dict[str, Any]], float]:
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            status, body = resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    except OSError:
+        return None, None, time.perf_counter() - t0
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    return status, data, time.perf_counter() - t0
+
+
+def server_start(timeout: float) -> Dict[str, Any]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    code = f"from backend.app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"
+    t_spawn = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, env=_env(KVV_WARMUP="1"),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    result: Dict[str, Any] = {"first_answer_s": None, "ready_s": None, "heartbeat_during_warmup_ms": []}
+    try:
+        deadline = t_spawn + timeout
+        while time.perf_counter() < deadline:
+            status, data, latency = _get(base + "/api/sim/heartbeat")
+            if status == 200:
+                if result["first_answer_s"] is None:
+                    result["first_answer_s"] = time.perf_counter() - t_spawn
+                if data.get("ready"):
+                    break
+                result["heartbeat_during_warmup_ms"].append(latency * 1000.0)
+            time.sleep(0.01)
+        status, data, _ = _get(base + "/ready")
+        if status == 200:
+            result["ready_s"] = time.perf_counter() - t_spawn
+            result["stages"] = data["stages"]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters for the import time")
+    parser.add_argument("--top", type=int, default=12, help="slowest imports to show")
+    parser.add_argument("--timeout", type=float, default=180.0, help="seconds to wait for readiness")
+    args = parser.parse_args()
+
+    seconds, loaded = import_times(args.runs)
+    print(f"import backend.app: min {min(seconds) * 1000:.0f} ms, median {statistics.median(seconds) * 1000:.0f} ms "
+          f"({args.runs} runs)")
+    print(f"heavy modules loaded by the import: {', '.join(loaded) if loaded else 'none'}")
+    print("\nslowest imports (cumulative):")
+    for cumulative, name in import_profile(args.top):
+        print(f"  {cumulative * 1000:>8.1f} ms  {name}")
+
+    print("\nserver start (warmup in the background):")
+    result = server_start(args.timeout)
+    if result["first_answer_s"] is None:
+        print("  no answer from the server")
+        return
+    print(f"  first /api/sim/heartbeat answer after {result['first_answer_s']:.2f} s")
+    lat = result["heartbeat_during_warmup_ms"]
+    if lat:
+        print(f"  heartbeat during warmup: {len(lat)} polls, median {statistics.median(lat):.1f} ms, "
+              f"max {max(lat):.1f} ms")
+    if result["ready_s"] is None:
+        print(f"  not ready after {args.timeout:g} s")
+        return
+    print(f"  /ready after {result['ready_s']:.2f} s")
+    for name, st in result["stages"].items():
+        error = f"  ({st['error'][:80]})" if st.get("error") else ""
+        print(f"    {name:<14} {st['state']:<8} {st['seconds'] or 0:.3f} s{error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Persistent store (storage.py): write-behind throughput, cost on the update path,
+queries and restart, for MemoryStore and SQLiteStore (WAL).
+
+1. Batches: --robots robots with 2 packages each; per round every robot moves and
+   every 10th gets a message, then StoreWriter.flush() writes one batch. Rows per second
+   per backend (SQLite with synchronous NORMAL and FULL).
+2. Sustained: a mover thread applies --rate position updates per second (plus a message
+   per 20 updates) for --duration seconds while the writer thread runs. Reported: the
+   update rate reached, time per update with and without the store, the mean batch
+   duration and the largest backlog of changed robots.
+3. Queries on the SQLite store: robot by id, packages by destination, message cursor.
+4. Restart: Simulation(store=...) on the written database (robots, packages, messages).
+
+Run: `python -m backend.benchmarks.bench_storage --robots 10000 --rate 50000 --duration 5`
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+KARLSRUHE = (49.0094, 8.4044)
+
+
+def _fleet(robots: int, store=None):
+    from backend.packages import PackageSize
+    from backend.robot import Robot
+    from backend.simulation import Simulation
+    from backend.stations import list_stations
+
+    sim = Simulation(store=store)
+    sim.engine.stop()
+    names = [s["name"] for s in list_stations()[:40]]
+    rng = random.Random(1)
+    for i in range(robots):
+        robot = Robot(i)
+        robot.reset_progress(KARLSRUHE[0] + rng.uniform(-0.05, 0.05), KARLSRUHE[1] + rng.uniform(-0.05, 0.05))
+        sim.robots.append(robot)
+        for _ in range(2):
+            sim.packages.add(robot, rng.choice(names), rng.choice(names), PackageSize.SMALL)
+    return sim
+
+
+def _move(robot, n: int) -> None:
+    lat, lon = robot.position
+    robot.set_progress_position(robot.progress + 1e-4, lat + 1e-6, lon + 1e-6)
+    if n % 20 == 0:
+        robot.add_message("ROUTE_TICK", "moved", robot.progress)
+
+
+def _store(kind: str, path: str):
+    from backend.storage import MemoryStore, SQLiteStore
+
+    if kind == "memory":
+        return MemoryStore()
+    return SQLiteStore(path, synchronous=kind.split("-")[1].upper())
+
+
+def batches(robots: int, rounds: int, directory: str) -> None:
+    from backend.storage import StoreWriter
+
+    print(f"write-behind batches, {robots} robots (all moved, 10% with a message):")
+    for kind in ("memory", "sqlite-normal", "sqlite-full"):
+        store = _store(kind, os.path.join(directory, f"batches-{kind}.db"))
+        sim = _fleet(robots)
+        writer = StoreWriter(sim, store)  # flushed by hand, no thread
+        writer.flush()  # first batch: every robot and package
+        times, rows = [], 0
+        for r in range(rounds):
+            for n, robot in enumerate(sim.robots):
+                _move(robot, n * 2)
+            t0 = time.perf_counter()
+            rows += writer.flush()
+            times.append(time.perf_counter() - t0)
+        writer.close()
+        print(f"  {kind:<14} {statistics.median(times) * 1000:8.1f} ms/batch  "
+              f"{rows / sum(times):>10,.0f} rows/s")
+
+
+def sustained(robots: int, rate: float, seconds: float, directory: str) -> Dict[str, Any]:
+    from backend.metrics import METRICS
+    from backend.storage import FLUSH_INTERVAL_S, SQLiteStore
+
+    def run(store) -> Dict[str, Any]:
+        sim = _fleet(robots, store)
+        writer = sim.store_writer
+        stop = threading.Event()
+        backlog: List[int] = []
+
+        def watch():
+            while not stop.wait(0.01):
+                if writer is not None:
+                    backlog.append(len(writer._robot_changes))
+
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+        rng = random.Random(3)
+        fleet = sim.robots
+        chunk = max(1, int(rate * 0.01))
+        n, busy = 0, 0.0
+        t_start = time.perf_counter()
+        while time.perf_counter() - t_start < seconds:
+            t0 = time.perf_counter()
+            for _ in range(chunk):
+                _move(fleet[rng.randrange(robots)], n)
+                n += 1
+            t1 = time.perf_counter()
+            busy += t1 - t0
+            time.sleep(max(0.0, 0.01 - (t1 - t0)))
+        elapsed = time.perf_counter() - t_start
+        stop.set()
+        watcher.join()
+        out = {"rate": n / elapsed, "update_us": busy / n * 1e6, "max_backlog": max(backlog, default=0)}
+        if writer is not None:
+            writer.close()
+            out.update(batches=writer.batches, rows=writer.rows_written, errors=writer.errors)
+        return out
+
+    print(f"\nsustained updates, {robots} robots, target {rate:,.0f} updates/s for {seconds:g} s:")
+    base = run(None)
+    print(f"  no store       {base['rate']:>10,.0f} updates/s  {base['update_us']:.2f} us/update")
+    METRICS.reset()
+    result = run(SQLiteStore(os.path.join(directory, "sustained.db")))
+    _, count, total = METRICS.histogram("kvv_store_batch_seconds").snapshot()
+    print(f"  sqlite (WAL)   {result['rate']:>10,.0f} updates/s  {result['update_us']:.2f} us/update  "
+          f"{result['batches']} batches, {result['rows']:,} rows, largest backlog {result['max_backlog']} robots, "
+          f"errors {result['errors']}")
+    if count:
+        print(f"  mean batch {total / count * 1000:.1f} ms every {FLUSH_INTERVAL_S * 1000:.0f} ms")
+    return result
+
+
+def _per_query_us(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def queries_and_restart(robots: int, directory: str) -> None:
+    from backend.package_store import PackageState
+    from backend.simulation import Simulation
+    from backend.storage import SQLiteStore
+
+    path = os.path.join(directory, "restart.db")
+    sim = _fleet(robots, SQLiteStore(path))
+    for n, robot in enumerate(sim.robots):
+        for k in range(5):
+            _move(robot, 20 * k)
+    sim.store_writer.close()
+
+    store = SQLiteStore(path)
+    keys = sorted({rec.destination_key for rec in sim.packages.records()})
+    rng = random.Random(4)
+    print(f"\nqueries (SQLite, {robots} robots, {len(sim.packages)} packages):")
+    print(f"  robot by id                 {_per_query_us(lambda i: store.robot(rng.randrange(robots)), 5000):8.1f} us")
+    dest_us = _per_query_us(lambda i: store.packages_to(rng.choice(keys), PackageState.LOADED, 50), 2000)
+    print(f"  packages by destination     {dest_us:8.1f} us  (LIMIT 50)")
+    cursor_us = _per_query_us(lambda i: store.messages(rng.randrange(robots), 2), 5000)
+    print(f"  message cursor              {cursor_us:8.1f} us")
+    store.close()
+
+    t0 = time.perf_counter()
+    restored = Simulation(store=SQLiteStore(path))
+    seconds = time.perf_counter() - t0
+    restored.engine.stop()
+    print(f"\nrestart: {len(restored.robots)} robots, {len(restored.packages)} packages loaded in "
+          f"{seconds * 1000:.0f} ms ({os.path.getsize(path) / 1e6:.1f} MB database)")
+    restored.store_writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5, help="batches per backend")
+    parser.add_argument("--rate", type=float, default=50000.0, help="position updates per second (sustained)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of sustained updates")
+    parser.add_argument("--dir", default=None, help="directory for the databases (default: temporary)")
+    args = parser.parse_args()
+
+    directory: Optional[str] = args.dir or tempfile.mkdtemp(prefix="kvv-bench-store-")
+    try:
+        batches(args.robots, args.rounds, directory)
+        sustained(args.robots, args.rate, args.duration, directory)
+        queries_and_restart(args.robots, directory)
+    finally:
+        if args.dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
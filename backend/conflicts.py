@@ -0,0 +1,266 @@
+"""
+conflicts.py
+
+Headway / conflict detection between robots.
+
+Checking every pair of robots is O(n^2). Instead, once per tick:
+- Robots driving a route job are grouped by track and sorted by distance along it;
+  only neighbours in this order can be too close, and the robot behind is the follower.
+  Between two stations the track is the station pair, so routes that share a leg share
+  the track; before the first and after the last station it is the route geometry.
+- All other moving robots are bucketed into a uniform spatial hash with cells of
+  `headway_m` meters; only robots in the same or an adjacent cell are compared.
+Both steps are O(n log n) and run vectorized with numpy.
+
+New conflicts are reported as CONFLICT messages to both robots. With throttling
+enabled, followers on the same track are held (their route progress pauses) until the
+gap is larger than the headway again.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Sequence, Tuple
+
+import numpy as np
+
+from backend.geodesy import M_PER_DEG_LAT, M_PER_DEG_LON
+from backend.robot import Robot
+
+
+HEADWAY_M: float = 30.0
+
+# the cell itself and half of its neighbours; the other half is covered from the other side
+_NEIGHBOURS = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+@dataclass
+class Conflict:
+    """
+    Two robots closer than the headway.
+
+    kind: "track" (same route, follower is behind leader) or "spatial"
+    """
+
+    leader: int
+    follower: int
+    distance_m: float
+    kind: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "leader": self.leader,
+            "follower": self.follower,
+            "distance_m": round(self.distance_m, 2),
+            "kind": self.kind,
+        }
+
+
+def close_pairs(lat: np.ndarray, lon: np.ndarray, radius_m: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All index pairs (i < j not guaranteed) of points closer than radius_m, using a
+    uniform grid with cell size radius_m.
+
+    Returns:
+        (i, j, distance in meters)
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+    n = len(lat)
+    if n < 2 or radius_m <= 0:
+        return empty
+
+    # local flat projection in meters
+    lat0 = float(np.mean(lat))
+    x = (lon - float(np.mean(lon))) * math.cos(math.radians(lat0)) * M_PER_DEG_LON
+    y = (lat - lat0) * M_PER_DEG_LAT
+    cx = np.floor(x / radius_m).astype(np.int64)
+    cy = np.floor(y / radius_m).astype(np.int64)
+    cx -= cx.min() - 1
+    cy -= cy.min() - 1
+    width = int(cy.max()) + 2
+    key = cx * width + cy
+
+    order = np.argsort(key, kind="stable")
+    cells, start, count = np.unique(key[order], return_index=True, return_counts=True)
+
+    out_i, out_j = [], []
+    for dx, dy in _NEIGHBOURS:
+        target = cells + dx * width + dy
+        pos = np.searchsorted(cells, target)
+        pos[pos == len(cells)] = 0
+        found = cells[pos] == target
+        ca = np.flatnonzero(found)
+        cb = pos[found]
+        if not len(ca):
+            continue
+        na, nb = count[ca], count[cb]
+        total = na * nb
+        pair_cell = np.repeat(np.arange(len(ca)), total)
+        k = np.arange(int(total.sum())) - np.repeat(np.cumsum(total) - total, total)
+        ia = k // nb[pair_cell]
+        ib = k % nb[pair_cell]
+        if (dx, dy) == (0, 0):
+            keep = ia < ib  # each pair inside a cell once, no self pairs
+            pair_cell, ia, ib = pair_cell[keep], ia[keep], ib[keep]
+        out_i.append(order[start[ca][pair_cell] + ia])
+        out_j.append(order[start[cb][pair_cell] + ib])
+
+    if not out_i:
+        return empty
+    i = np.concatenate(out_i)
+    j = np.concatenate(out_j)
+    d = np.hypot(x[i] - x[j], y[i] - y[j])
+    close = d < radius_m
+    return i[close], j[close], d[close]
+
+
+def track_segment(job: Dict[str, Any], along_m: float) -> Tuple[Any, float]:
+    """
+    Track key and distance along the track of a robot at along_m on a route job
+    (a route_jobs() descriptor).
+    """
+    stops = job.get("stops") or ()
+    k = bisect.bisect_right([s["along_m"] for s in stops], along_m)
+    if 0 < k < len(stops) and stops[k - 1]["triasID"] != stops[k]["triasID"]:
+        a, b = stops[k - 1], stops[k]
+        return (a["triasID"], b["triasID"]), along_m - a["along_m"]
+    return (job["track"], k), along_m
+
+
+def track_pairs(route_keys: Sequence[Any], along_m: np.ndarray, headway_m: float
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Consecutive robots on the same track with a gap below headway_m.
+
+    Args:
+        route_keys: Track id per robot.
+        along_m: Distance along the track per robot.
+
+    Returns:
+        (leader index, follower index, gap in meters)
+    """
+    n = len(route_keys)
+    if n < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    ids: Dict[Any, int] = {}
+    group = np.fromiter((ids.setdefault(k, len(ids)) for k in route_keys), dtype=np.int64, count=n)
+    order = np.lexsort((along_m, group))
+    g, a = group[order], along_m[order]
+    gap = np.diff(a)
+    close = (g[1:] == g[:-1]) & (gap < headway_m)
+    idx = np.flatnonzero(close)
+    return order[idx + 1], order[idx], gap[idx]
+
+
+class ConflictDetector:
+    """
+    Per-tick conflict detection (see conflicts_system in systems.py).
+
+    Args:
+        headway_m: Minimum distance between two robots.
+        throttle: Hold followers on the same track until the gap is large enough.
+    """
+
+    def __init__(self, headway_m: float = HEADWAY_M, throttle: bool = True):
+        self.headway_m = float(headway_m)
+        self.throttle = throttle
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._active = _empty_conflicts()
+            self.total = 0
+
+    def detect(self, robots: Sequence[Robot], route_jobs: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        All current conflicts between moving robots as arrays
+        {"leader", "follower", "distance_m", "track"} (track: True for same-track conflicts).
+        """
+        parts = [_empty_conflicts()]
+
+        # 1) robots on route jobs: by (track, distance along the track)
+        track_of: Dict[int, int] = {}
+        if route_jobs:
+            groups: Dict[Any, int] = {}
+            ids = np.array([j["robot_id"] for j in route_jobs], dtype=np.int64)
+            segments = [track_segment(j, robots[j["robot_id"]].progress * j["total_m"]) for j in route_jobs]
+            keys = [groups.setdefault(key, len(groups)) for key, _ in segments]
+            along = np.array([a for _, a in segments], dtype=np.float64)
+            track_of.update(zip(ids.tolist(), keys))
+            lead, follow, gap = track_pairs(keys, along, self.headway_m)
+            parts.append({"leader": ids[lead], "follower": ids[follow], "distance_m": gap,
+                          "track": np.ones(len(gap), dtype=bool)})
+
+        # 2) all other moving robots: spatial hash
+        moving = [r for r in robots if not r.is_parked and r.position is not None]
+        if len(moving) >= 2:
+            m = len(moving)
+            lat = np.fromiter((r.position[0] for r in moving), dtype=np.float64, count=m)
+            lon = np.fromiter((r.position[1] for r in moving), dtype=np.float64, count=m)
+            rid = np.fromiter((r.robot_id for r in moving), dtype=np.int64, count=m)
+            trk = np.fromiter((track_of.get(r, -1) for r in rid.tolist()), dtype=np.int64, count=m)
+            i, j, d = close_pairs(lat, lon, self.headway_m)
+            other = (trk[i] < 0) | (trk[i] != trk[j])  # same-track pairs are handled above
+            i, j, d = i[other], j[other], d[other]
+            parts.append({"leader": np.minimum(rid[i], rid[j]), "follower": np.maximum(rid[i], rid[j]),
+                          "distance_m": d, "track": np.zeros(len(d), dtype=bool)})
+
+        return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+    def step(self, sim) -> FrozenSet[int]:
+        """
+        Detect conflicts, report new ones and return the robots to hold.
+        """
+        robots = list(sim.robots)
+        found = self.detect(robots, sim.route_jobs())
+        keys = _pair_keys(found)
+        with self._lock:
+            new = np.flatnonzero(~np.isin(keys, _pair_keys(self._active)))
+            self._active = found
+            self.total += len(new)
+
+        for k in new.tolist():
+            leader, follower = int(found["leader"][k]), int(found["follower"][k])
+            dist = float(found["distance_m"][k])
+            if found["track"][k]:
+                text = f"Robot {follower} is {dist:.0f} m behind robot {leader} (headway {self.headway_m:.0f} m)."
+            else:
+                text = f"Robots {leader} and {follower} are {dist:.0f} m apart (headway {self.headway_m:.0f} m)."
+            for rid in (leader, follower):
+                if 0 <= rid < len(robots):
+                    robots[rid].add_message("CONFLICT", text, robots[rid].progress)
+
+        if not self.throttle:
+            return frozenset()
+        return frozenset(found["follower"][found["track"]].tolist())
+
+    def active(self, limit: int = 1000) -> List[Conflict]:
+        with self._lock:
+            a = self._active
+        return [
+            Conflict(int(l), int(f), float(d), "track" if t else "spatial")
+            for l, f, d, t in zip(a["leader"][:limit], a["follower"][:limit],
+                                  a["distance_m"][:limit], a["track"][:limit])
+        ]
+
+    def to_dict(self, limit: int = 1000) -> Dict[str, Any]:
+        return {
+            "headway_m": self.headway_m,
+            "throttle": self.throttle,
+            "total": self.total,
+            "active_count": len(self._active["leader"]),
+            "active": [c.to_dict() for c in self.active(limit)],
+        }
+
+
+def _empty_conflicts() -> Dict[str, np.ndarray]:
+    return {"leader": np.empty(0, dtype=np.int64), "follower": np.empty(0, dtype=np.int64),
+            "distance_m": np.empty(0), "track": np.empty(0, dtype=bool)}
+
+
+def _pair_keys(conflicts: Dict[str, np.ndarray]) -> np.ndarray:
+    return (conflicts["leader"] << 32) | conflicts["follower"]
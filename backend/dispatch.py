@@ -0,0 +1,143 @@
+"""
+dispatch.py
+
+Batch dispatch: routes for many (robot, start, end) requests at once.
+
+/api/map/route loads the graph, geocodes, searches and renders a folium map for every
+single robot. For a fleet this module instead:
+    1. resolves start / end as KVV stations or [lat, lon] (no geocoding),
+    2. snaps them to the road network and groups the requests by start node,
+    3. runs one Dijkstra search per distinct start node; all requests from the same
+       origin read their path from the same predecessor tree,
+    4. returns coordinates and lengths, ready for Simulation.start_route_jobs().
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.road_network import ROBOT_SPEED_M_S, RoadNetwork, polyline_length_m, resolve_points
+
+SEARCH_CHUNK: int = 256  # origins per Dijkstra call (bounds the temporary memory)
+
+
+class DispatchError(ValueError):
+    """
+    Some requests of a batch are invalid; nothing was dispatched.
+
+    errors: (request index, message) pairs
+    """
+
+    def __init__(self, errors: List[Tuple[int, str]]):
+        super().__init__(f"{len(errors)} invalid route request(s)")
+        self.errors = errors
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [{"index": i, "error": msg} for i, msg in self.errors]
+
+
+@dataclass
+class DispatchRoute:
+    """
+    Route of one dispatch request.
+    """
+
+    robot_id: int
+    start: str
+    end: str
+    coords: List[Tuple[float, float]] = field(default_factory=list)
+    length_m: float = 0.0
+    duration_s: float = 0.0
+    dwell_s: float = 0.0
+    destination: Optional[str] = None  # station name given in the request
+    route_id: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "robot_id": self.robot_id,
+            "route_id": self.route_id,
+            "start": self.start,
+            "end": self.end,
+            "length_m": round(self.length_m, 1),
+            "duration_s": round(self.duration_s, 1),
+        }
+
+
+def parse_requests(items: Sequence[Dict[str, Any]], robot_count: int) -> List[Dict[str, Any]]:
+    """
+    Validate the JSON route requests ({robot_id, start, end, duration_s?, dwell_s?}).
+
+    Raises:
+        DispatchError: with one message per invalid request.
+    """
+    errors: List[Tuple[int, str]] = []
+    seen = set()
+    out = []
+    for k, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("expected an object")
+            robot_id = int(item["robot_id"])
+            if not 0 <= robot_id < robot_count:
+                raise ValueError("robot_id out of range")
+            if robot_id in seen:
+                raise ValueError("robot_id appears twice in the batch")
+            seen.add(robot_id)
+            start, end = resolve_points([item["start"], item["end"]])
+            duration = item.get("duration_s")
+            duration = None if duration is None else float(duration)
+            if duration is not None and duration <= 0:
+                raise ValueError("duration_s must be > 0")
+            dwell = max(0.0, min(float(item.get("dwell_s", 0.0)), 120.0))
+        except KeyError as e:
+            errors.append((k, f"missing {e.args[0]}"))
+            continue
+        except (TypeError, ValueError) as e:
+            errors.append((k, str(e)))
+            continue
+        out.append({"robot_id": robot_id, "start": start, "end": end, "duration_s": duration, "dwell_s": dwell,
+                    "destination": item["end"] if isinstance(item["end"], str) else None})
+    if errors:
+        raise DispatchError(errors)
+    return out
+
+
+def route_batch(requests: List[Dict[str, Any]], network: RoadNetwork,
+                speed_m_s: float = ROBOT_SPEED_M_S) -> List[DispatchRoute]:
+    """
+    Shortest road routes for parsed requests (see parse_requests), one search per
+    distinct start node.
+
+    Raises:
+        DispatchError: an end is not reachable from its start.
+    """
+    if not requests:
+        return []
+    starts = [r["start"] for r in requests]
+    ends = [r["end"] for r in requests]
+    src, _ = network.nearest_nodes([p[1] for p in starts], [p[2] for p in starts])
+    dst, _ = network.nearest_nodes([p[1] for p in ends], [p[2] for p in ends])
+
+    # group the requests by origin node
+    origins, group = np.unique(src, return_inverse=True)
+    routes: List[Optional[DispatchRoute]] = [None] * len(requests)
+    errors: List[Tuple[int, str]] = []
+    for a in range(0, len(origins), SEARCH_CHUNK):
+        _, pred = network.shortest_from(origins[a:a + SEARCH_CHUNK], predecessors=True)
+        for k in np.flatnonzero((group >= a) & (group < a + SEARCH_CHUNK)).tolist():
+            req = requests[k]
+            path = network.path(pred[group[k] - a], int(src[k]), int(dst[k]))
+            if not path:
+                errors.append((k, "end is not reachable from start"))
+                continue
+            coords = [(req["start"][1], req["start"][2])] + network.coords(path) + [(req["end"][1], req["end"][2])]
+            length = polyline_length_m(coords)
+            duration = req["duration_s"] or max(3.0, length / speed_m_s)
+            routes[k] = DispatchRoute(req["robot_id"], req["start"][0], req["end"][0], coords,
+                                      length, duration, req["dwell_s"], req["destination"])
+    if errors:
+        raise DispatchError(sorted(errors))
+    return routes
@@ -0,0 +1,340 @@
+"""
+energy.py
+
+Battery model and charger scheduling.
+
+EnergyModel.drain() runs once per tick over the whole fleet (vectorized with numpy):
+- driving drains per meter (distance comes from the robot odometer, which route jobs advance)
+- parked robots drain a small amount per simulated minute
+- robots with is_charging set gain charge per simulated minute
+The exact levels are kept here; Robot.battery_status is only written when it changes by
+a whole percent, so idle robots keep their cached status (a value set by a client is
+taken over). Battery level changes emit BATTERY_LOW / BATTERY_CRITICAL / BATTERY_EMPTY
+messages.
+
+ChargerScheduler.step() sends parked low-battery robots to charging points.
+Waiting robots are kept in a heap keyed by (urgency, ETA to the nearest charger), so
+every scheduling decision is O(log n) even with 10k robots. A robot that was assigned
+moves to the charger in a straight line at a constant speed, one step per tick, charges
+until full and frees the slot. It is not on a route job and stays parked; starting a
+route job for it gives up the charger.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from backend.geodesy import haversine_matrix_m
+from backend.packages import STD_START
+from backend.robot import Robot
+from backend.stations import find_station, station_coords
+from backend.tick_engine import TickContext
+
+
+DRAIN_PCT_PER_KM: float = 1.0
+IDLE_DRAIN_PCT_PER_MIN: float = 0.05
+CHARGE_PCT_PER_MIN: float = 2.0
+
+LOW_BATTERY_PCT: float = 20.0
+CRITICAL_BATTERY_PCT: float = 5.0
+FULL_BATTERY_PCT: float = 99.5
+
+CHARGER_SPEED_M_S: float = 5.0  # speed when driving to a charger
+
+# (station triasID, number of slots)
+DEFAULT_CHARGERS: Tuple[Tuple[str, int], ...] = (
+    ("de:08212:90", 4),   # Karlsruhe Hauptbahnhof
+    ("de:08212:802", 2),  # Durlach Bahnhof
+    ("de:08212:80", 2),   # Karlsruhe Kronenplatz
+    ("de:08212:51", 2),   # Karlsruhe Entenfang
+)
+
+# battery level per robot: 0 ok, 1 low, 2 critical, 3 empty
+_LEVEL_EVENTS = {
+    1: ("BATTERY_LOW", "Battery low"),
+    2: ("BATTERY_CRITICAL", "Battery critical"),
+    3: ("BATTERY_EMPTY", "Battery empty"),
+}
+
+
+def _default_position() -> Tuple[float, float]:
+    station = find_station(STD_START)
+    return station_coords(station) if station else (0.0, 0.0)
+
+
+@dataclass
+class Charger:
+    """
+    A charging point at a station.
+    """
+
+    station_id: str
+    name: str
+    lat: float
+    lon: float
+    slots: int
+    used: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "station_id": self.station_id,
+            "name": self.name,
+            "position": (self.lat, self.lon),
+            "slots": self.slots,
+            "used": self.used,
+        }
+
+
+@dataclass
+class ChargeJob:
+    """
+    A robot that was sent to a charger.
+    """
+
+    robot_id: int
+    charger: int
+    start_tick: int
+    arrive_tick: int
+    origin: Tuple[float, float]
+    distance_m: float
+    covered: float = 0.0  # share of the way driven so far
+    charging: bool = False
+
+
+class ChargerScheduler:
+    """
+    Assigns parked low-battery robots to chargers through a priority queue.
+    """
+
+    def __init__(self, chargers: Sequence[Tuple[str, int]] = DEFAULT_CHARGERS):
+        self.chargers: List[Charger] = []
+        for station_id, slots in chargers:
+            station = find_station(station_id)
+            if station is None:
+                continue
+            lat, lon = station_coords(station)
+            self.chargers.append(Charger(station_id, station.get("triasName", station_id), lat, lon, int(slots)))
+        self._lat = np.array([c.lat for c in self.chargers], dtype=np.float64)
+        self._lon = np.array([c.lon for c in self.chargers], dtype=np.float64)
+        self.reset()
+
+    def reset(self) -> None:
+        self._heap: List[Tuple[int, float, int, int]] = []  # (urgency, eta_s, seq, robot_id)
+        self._queued: Set[int] = set()
+        self.jobs: Dict[int, ChargeJob] = {}
+        self._seq = 0
+        for c in self.chargers:
+            c.used = 0
+
+    @property
+    def queue_length(self) -> int:
+        return len(self._queued)
+
+    def _enqueue(self, robots: Sequence[Robot], idx: np.ndarray, batt: np.ndarray) -> None:
+        """
+        Push robots into the heap; ETA is the distance to the nearest charger.
+        """
+        default = _default_position()
+        pos = [robots[i].position or default for i in idx]
+        dist = haversine_matrix_m([p[0] for p in pos], [p[1] for p in pos], self._lat, self._lon).min(axis=1)
+        for i, d in zip(idx, dist):
+            rid = robots[i].robot_id
+            urgency = 0 if batt[i] < CRITICAL_BATTERY_PCT else 1
+            self._seq += 1
+            heapq.heappush(self._heap, (urgency, float(d) / CHARGER_SPEED_M_S, self._seq, rid))
+            self._queued.add(rid)
+
+    def step(self, robots: Sequence[Robot], ctx: TickContext, batt: np.ndarray,
+             parked: np.ndarray, charging: np.ndarray) -> None:
+        """
+        One scheduling round. batt/parked/charging are the fleet arrays of this tick.
+        """
+        if not self.chargers:
+            return
+        by_id = {r.robot_id: i for i, r in enumerate(robots)}
+
+        # 1) new candidates (vectorized filter, only the few matches are touched)
+        low = np.flatnonzero((batt < LOW_BATTERY_PCT) & parked & ~charging)
+        if len(low):
+            new = [i for i in low if robots[i].robot_id not in self._queued and robots[i].robot_id not in self.jobs]
+            if new:
+                self._enqueue(robots, np.asarray(new), batt)
+
+        # 2) arrivals and finished charges
+        for rid, job in list(self.jobs.items()):
+            i = by_id.get(rid)
+            charger = self.chargers[job.charger]
+            if i is None:  # robot gone
+                charger.used -= 1
+                del self.jobs[rid]
+                continue
+            robot = robots[i]
+            if not job.charging and not robot.is_parked:  # a route job took the robot over
+                charger.used -= 1
+                del self.jobs[rid]
+                continue
+            if not job.charging:
+                share = min(1.0, (ctx.tick - job.start_tick) / max(job.arrive_tick - job.start_tick, 1))
+                robot.add_distance(job.distance_m * (share - job.covered))
+                job.covered = share
+                (lat0, lon0) = job.origin
+                robot.set_progress_position(robot.progress, lat0 + (charger.lat - lat0) * share,
+                                            lon0 + (charger.lon - lon0) * share)
+                if share >= 1.0:
+                    robot.is_charging = True
+                    job.charging = True
+                    robot.add_message("CHARGING_STARTED", f"Charging at {charger.name}.", robot.progress)
+            elif job.charging and (robot.battery_status >= FULL_BATTERY_PCT or not robot.is_charging):
+                robot.is_charging = False
+                charger.used -= 1
+                del self.jobs[rid]
+                robot.add_message("CHARGING_FINISHED", "Battery full.", robot.progress)
+
+        # 3) assign waiting robots to free slots, most urgent first
+        while self._heap and any(c.used < c.slots for c in self.chargers):
+            _, _, _, rid = heapq.heappop(self._heap)
+            self._queued.discard(rid)
+            i = by_id.get(rid)
+            if i is None or rid in self.jobs:
+                continue
+            robot = robots[i]
+            if robot.is_charging or robot.battery_status >= LOW_BATTERY_PCT or not robot.is_parked:
+                continue  # stale entry; step 1 queues the robot again once it is parked
+
+            lat, lon = robot.position or _default_position()
+            free = [k for k, c in enumerate(self.chargers) if c.used < c.slots]
+            dist = haversine_matrix_m([lat], [lon], self._lat[free], self._lon[free])[0]
+            k = free[int(np.argmin(dist))]
+            eta_s = float(dist.min()) / CHARGER_SPEED_M_S
+            ticks = max(1, math.ceil(eta_s / max(ctx.sim_seconds, 1e-9)))
+
+            charger = self.chargers[k]
+            charger.used += 1
+            self.jobs[rid] = ChargeJob(robot_id=rid, charger=k, start_tick=ctx.tick, arrive_tick=ctx.tick + ticks,
+                                       origin=(lat, lon), distance_m=float(dist.min()))
+            robot.add_message(
+                "CHARGER_ASSIGNED",
+                f"Driving to charger {charger.name} (ETA {eta_s / 60.0:.1f} min).",
+                robot.progress,
+            )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chargers": [c.to_dict() for c in self.chargers],
+            "queue_length": self.queue_length,
+            "jobs": [
+                {"robot_id": j.robot_id, "charger": self.chargers[j.charger].station_id,
+                 "arrive_tick": j.arrive_tick, "charging": j.charging}
+                for j in self.jobs.values()
+            ],
+        }
+
+
+class EnergyModel:
+    """
+    Per-fleet energy state (last odometer reading, exact and last written battery
+    level, last reported battery level event).
+    """
+
+    def __init__(self, scheduler: Optional[ChargerScheduler] = None):
+        self.scheduler = scheduler if scheduler is not None else ChargerScheduler()
+        self.reset()
+
+    def reset(self) -> None:
+        self._ids = np.empty(0, dtype=np.int64)
+        self._last_odo = np.empty(0, dtype=np.float64)
+        self._exact = np.empty(0, dtype=np.float64)
+        self._written = np.empty(0, dtype=np.float64)
+        self._level = np.empty(0, dtype=np.int8)
+        self.scheduler.reset()
+
+    def _align(self, robots: Sequence[Robot]) -> np.ndarray:
+        """
+        Return the robot ids of this tick; state of robots that are new (or whose slot now
+        holds another robot) starts fresh.
+        """
+        ids = np.fromiter((r.robot_id for r in robots), dtype=np.int64, count=len(robots))
+        n_old = len(self._ids)
+        if len(ids) != n_old or not np.array_equal(ids, self._ids):
+            keep = min(n_old, len(ids))
+            same = np.zeros(len(ids), dtype=bool)
+            same[:keep] = ids[:keep] == self._ids[:keep]
+            kept = same[:keep]
+            last_odo, exact, written = np.zeros(len(ids)), np.zeros(len(ids)), np.zeros(len(ids))
+            level = np.zeros(len(ids), dtype=np.int8)
+            last_odo[:keep][kept] = self._last_odo[:keep][kept]
+            exact[:keep][kept] = self._exact[:keep][kept]
+            written[:keep][kept] = self._written[:keep][kept]
+            level[:keep][kept] = self._level[:keep][kept]
+            fresh = np.flatnonzero(~same)
+            last_odo[fresh] = [robots[i].odometer_m for i in fresh]
+            exact[fresh] = written[fresh] = [robots[i].battery_status for i in fresh]
+            self._ids, self._last_odo, self._level = ids, last_odo, level
+            self._exact, self._written = exact, written
+        return ids
+
+    def drain(self, robots: Sequence[Robot], ctx: TickContext) -> None:
+        """
+        Update all batteries for one tick.
+        """
+        robots = list(robots)
+        n = len(robots)
+        if n == 0:
+            return
+        self._align(robots)
+
+        odo = np.fromiter((r.odometer_m for r in robots), dtype=np.float64, count=n)
+        batt = np.fromiter((r.battery_status for r in robots), dtype=np.float64, count=n)
+        charging = np.fromiter((r.is_charging for r in robots), dtype=bool, count=n)
+        parked = np.fromiter((r.is_parked for r in robots), dtype=bool, count=n)
+
+        minutes = ctx.sim_seconds / 60.0
+        driven_km = np.maximum(odo - self._last_odo, 0.0) / 1000.0
+        self._last_odo = odo
+
+        # a level that differs from the last written one was set by a client
+        exact = np.where(batt != self._written, batt, self._exact)
+        new = exact - driven_km * DRAIN_PCT_PER_KM
+        new -= np.where(parked & ~charging, IDLE_DRAIN_PCT_PER_MIN * minutes, 0.0)
+        new += np.where(charging, CHARGE_PCT_PER_MIN * minutes, 0.0)
+        np.clip(new, 0.0, 100.0, out=new)
+        self._exact = new
+
+        # write whole-percent steps only (and the ends of the range)
+        step = (np.floor(new) != np.floor(batt)) | (((new == 0.0) | (new == 100.0)) & (new != batt))
+        written = batt.copy()
+        for i in np.flatnonzero(step):
+            robots[i].battery_status = written[i] = float(new[i])
+        self._written = written
+
+        # robots that were set to charging by a client stop when full
+        jobs = self.scheduler.jobs
+        for i in np.flatnonzero(charging & (new >= 100.0)):
+            if robots[i].robot_id not in jobs:
+                robots[i].is_charging = False
+                robots[i].add_message("CHARGING_FINISHED", "Battery full.", robots[i].progress)
+
+        # level events only when the level gets worse; charging resets it
+        level = np.select([new <= 0.0, new < CRITICAL_BATTERY_PCT, new < LOW_BATTERY_PCT], [3, 2, 1], 0).astype(np.int8)
+        for i in np.flatnonzero(level > self._level):
+            event, text = _LEVEL_EVENTS[int(level[i])]
+            robots[i].add_message(event, f"{text}: {new[i]:.1f}%.", robots[i].progress)
+        self._level = level
+
+    def schedule(self, robots: Sequence[Robot], ctx: TickContext) -> None:
+        """
+        Run the charger scheduler for one tick.
+        """
+        robots = list(robots)
+        n = len(robots)
+        if n == 0:
+            return
+        batt = np.fromiter((r.battery_status for r in robots), dtype=np.float64, count=n)
+        parked = np.fromiter((r.is_parked for r in robots), dtype=bool, count=n)
+        charging = np.fromiter((r.is_charging for r in robots), dtype=bool, count=n)
+        self.scheduler.step(robots, ctx, batt, parked, charging)
@@ -0,0 +1,112 @@
+"""
+eta.py
+
+Station ETA board: expected arrivals of robots at KVV stations.
+
+Route jobs publish the expected arrival time at every station still ahead of them
+when they start and whenever their speed changes (e.g. after a headway hold); a
+station is removed from the index as soon as the robot arrives there, and all
+entries of a route are removed when the job ends.
+
+Per station the arrivals are kept in a list sorted by ETA, so reading a board is a
+binary search plus a slice and never touches the robots or their routes.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# (eta_ts, route_id, robot_id, destination)
+Arrival = Tuple[float, int, int, Optional[str]]
+
+
+class EtaIndex:
+    """
+    Thread-safe index station triasID -> arrivals sorted by ETA.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_station: Dict[str, List[Arrival]] = {}
+            # route_id -> {station triasID: entry}, to remove entries without searching
+            self._by_route: Dict[int, Dict[str, Arrival]] = {}
+
+    def _remove(self, station_id: str, entry: Arrival) -> None:
+        arrivals = self._by_station.get(station_id)
+        if not arrivals:
+            return
+        i = bisect.bisect_left(arrivals, entry)
+        if i < len(arrivals) and arrivals[i] == entry:
+            del arrivals[i]
+        if not arrivals:
+            del self._by_station[station_id]
+
+    def set_route(self, route_id: int, robot_id: int, etas: List[Tuple[str, float]],
+                  destination: Optional[str] = None) -> None:
+        """
+        Replace the ETAs of a route with (station triasID, eta_ts) pairs.
+        """
+        with self._lock:
+            for station_id, entry in self._by_route.pop(route_id, {}).items():
+                self._remove(station_id, entry)
+            entries: Dict[str, Arrival] = {}
+            for station_id, eta in etas:
+                if station_id in entries:
+                    continue  # a route passing a station twice shows the first pass
+                entry = (float(eta), route_id, robot_id, destination)
+                bisect.insort(self._by_station.setdefault(station_id, []), entry)
+                entries[station_id] = entry
+            if entries:
+                self._by_route[route_id] = entries
+
+    def arrived(self, route_id: int, station_id: str) -> None:
+        """
+        The robot of a route reached a station: drop that entry.
+        """
+        with self._lock:
+            entries = self._by_route.get(route_id)
+            if entries is None:
+                return
+            entry = entries.pop(station_id, None)
+            if entry is not None:
+                self._remove(station_id, entry)
+            if not entries:
+                del self._by_route[route_id]
+
+    def remove_route(self, route_id: int) -> None:
+        """
+        A route finished or was cancelled.
+        """
+        self.set_route(route_id, -1, [])
+
+    def upcoming(self, station_id: str, limit: int = 10,
+                 horizon_s: Optional[float] = None, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Next arrivals at a station, soonest first (ETAs in the past mean "due").
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            arrivals = self._by_station.get(station_id)
+            if not arrivals:
+                return []
+            end = len(arrivals)
+            if horizon_s is not None:
+                end = bisect.bisect_right(arrivals, (now + horizon_s, float("inf")))
+            page = arrivals[:min(end, max(0, int(limit)))]
+        return [
+            {"robot_id": robot_id, "route_id": route_id, "eta_ts": eta,
+             "eta_in_s": round(max(0.0, eta - now), 1), "destination": destination}
+            for eta, route_id, robot_id, destination in page
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"stations": len(self._by_station), "routes": len(self._by_route),
+                    "arrivals": sum(len(a) for a in self._by_station.values())}
@@ -0,0 +1,75 @@
+"""
+geodesy.py
+
+Distances between (lat, lon) coordinates in degrees, shared by the simulation,
+stations, route planning, energy, trajectory and conflict modules.
+
+- haversine_m / haversine_matrix_m / segment_lengths_m: great-circle distances
+- M_PER_DEG_LAT / M_PER_DEG_LON: local flat approximation (equirectangular); multiply
+  longitude differences by cos(latitude) as well. Accurate to well below a meter over
+  the few kilometers the spatial lookups work on.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+EARTH_RADIUS_M: float = 6371000.0
+
+M_PER_DEG_LAT: float = 110540.0
+M_PER_DEG_LON: float = 111320.0  # at the equator
+
+
+def haversine_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """
+    Distance in meters between (lat,lon) points.
+    """
+    lat1, lon1 = a
+    lat2, lon2 = b
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dl = math.radians(lon2 - lon1)
+
+    s = math.sin(dphi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dl / 2.0) ** 2
+    c = 2.0 * math.atan2(math.sqrt(s), math.sqrt(1.0 - s))
+    return EARTH_RADIUS_M * c
+
+
+def haversine_matrix_m(lat_a, lon_a, lat_b, lon_b) -> np.ndarray:
+    """
+    Vectorized great-circle distances in meters between two point sets.
+
+    Args:
+        lat_a, lon_a: Arrays of shape (n,) in degrees.
+        lat_b, lon_b: Arrays of shape (m,) in degrees.
+
+    Returns:
+        Array of shape (n, m).
+    """
+    phi_a = np.radians(np.asarray(lat_a, dtype=np.float64))[:, None]
+    phi_b = np.radians(np.asarray(lat_b, dtype=np.float64))[None, :]
+    dphi = phi_b - phi_a
+    dl = np.radians(np.asarray(lon_b, dtype=np.float64))[None, :] - np.radians(
+        np.asarray(lon_a, dtype=np.float64)
+    )[:, None]
+    s = np.sin(dphi / 2.0) ** 2 + np.cos(phi_a) * np.cos(phi_b) * np.sin(dl / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(s, 0.0, 1.0)))
+
+
+def segment_lengths_m(coords: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """
+    Great-circle length in meters of every segment of a (lat, lon) polyline
+    (len(coords) - 1 values).
+    """
+    if len(coords) < 2:
+        return np.zeros(0)
+    p = np.radians(np.asarray(coords, dtype=np.float64))
+    dphi = np.diff(p[:, 0])
+    dl = np.diff(p[:, 1])
+    s = np.sin(dphi / 2.0) ** 2 + np.cos(p[:-1, 0]) * np.cos(p[1:, 0]) * np.sin(dl / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(s, 1.0)))
@@ -1,7 +1,7 @@
 """
 geography.py
 
-Route map generation using OSMnx + Folium.
+Route map generation using OSMnx + Folium (imported on first use, see warmup.py).
 
 Two modes:
 A) robot_id is None -> classic client-side animation (distance-based, smooth)
@@ -9,6 +9,9 @@ B) robot_id is given -> "Backend-master": robot position is simulated in backend
    map polls /api/robot/read and interpolates smoothly to avoid jumps/ruckeln.
 
 lok.png / vehicle icon is REMOVED (always red dot).
+
+The road network of the city comes from the graph cache (road_network.GraphCache),
+so only the first map of a city pays for the download.
 """
 
 from __future__ import annotations
@@ -17,10 +20,6 @@ import json
 import os
 from typing import Optional
 
-import folium
-import osmnx as ox
-from branca.element import Element
-
 
 class Map:
     CITY_DEFAULT = "Karlsruhe, Baden-Württemberg, Germany"
@@ -49,31 +48,23 @@ class Map:
     def _icons_dir() -> str:
         return os.path.join(os.path.dirname(__file__), "icons")
 
-    @staticmethod
-    def _route_length_km(G, route) -> float:
-        try:
-            route_gdf = ox.routing.route_to_gdf(G, route, weight="length")
-            total_m = float(route_gdf["length"].sum())
-            return total_m / 1000.0
-        except Exception:
-            return 0.0
-
     def to_html(self) -> str:
-        # 1) Load network
-        G = ox.graph_from_place(self.city, network_type="drive")
+        # the geo stack takes about a second to import: load it on the first map only
+        import folium
+        from branca.element import Element
 
-        # 2) Geocode
-        start_lat, start_lon = ox.geocode(self.start)
-        end_lat, end_lon = ox.geocode(self.end)
+        from backend.road_network import geocode, load_road_network
+
+        # 1) Load network (cached per city)
+        network = load_road_network(self.city)
 
-        # 3) Nearest nodes
-        start_node = ox.distance.nearest_nodes(G, start_lon, start_lat)
-        end_node = ox.distance.nearest_nodes(G, end_lon, end_lat)
+        # 2) Geocode
+        start_lat, start_lon = geocode(self.start)
+        end_lat, end_lon = geocode(self.end)
 
-        # 4) Shortest path
-        route = ox.shortest_path(G, start_node, end_node, weight="length")
-        coords = [(G.nodes[n]["y"], G.nodes[n]["x"]) for n in route]
-        total_km = self._route_length_km(G, route)
+        # 3) Shortest path between the nearest road nodes
+        coords, length_m = network.route((start_lat, start_lon), (end_lat, end_lon))
+        total_km = length_m / 1000.0
 
         # 5) Build map
         m = folium.Map(location=coords[0], zoom_start=13, tiles="CartoDB positron")
@@ -313,6 +304,7 @@ class Map:
             var targetProgress = 0.0;
             var shownProgress = 0.0;
             var lastPollTs = performance.now();
+            var lastMessageId = 0;
 
             // Avoid backward jumps
             function setTarget(p) {{
@@ -324,9 +316,13 @@ class Map:
             // Poll backend frequently (smooth), but backend messages remain 1s/5%
             async function poll() {{
               try {{
-                var resp = await fetch("/api/robot/read?robot_id={robot_id}", {{ cache: "no-store" }});
+                var resp = await fetch("/api/robot/read?robot_id={robot_id}&fields=hot&since_message_id=" + lastMessageId,
+                                       {{ cache: "no-store" }});
                 if (!resp.ok) throw new Error("poll failed");
                 var data = await resp.json();
+                if (data && typeof data.last_message_id === "number") {{
+                  lastMessageId = data.last_message_id;
+                }}
                 var st = data && data.status ? data.status : null;
                 if (st && typeof st.progress === "number") {{
                   setTarget(st.progress);
@@ -0,0 +1,442 @@
+"""
+journal.py
+
+Append-only on-disk journal of robot messages.
+
+Robot.add_message() hands every message to a sink (see robot.set_message_sink). The
+sink only appends the dict to a deque, so the route update threads never wait for the
+disk. A background writer drains the deque in batches (group commit: one write call,
+and optionally one fsync, per batch).
+
+On disk the journal is a directory of segments:
+    events.json          string table of event names (index -> name)
+    seg-<first seq>.rec  fixed-width binary records (RECORD_DTYPE)
+    seg-<first seq>.txt  UTF-8 message texts, referenced by offset/length
+
+A segment is rotated once it holds `segment_records` records; only the newest
+`max_segments` segments are kept. Readers memory-map the segments and binary-search them
+by sequence number or timestamp, so old history can be served without keeping it in
+memory. Per-robot lookups use an index of each segment sorted by robot id.
+
+Other processes open the directory with read_only=True (no writer thread) and call
+refresh() to pick up new segments and event names (read workers, see shared_state.py).
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"),          # journal-wide sequence number (starts at 1)
+    ("ts", "<f8"),           # message timestamp (time.time())
+    ("robot_id", "<i8"),
+    ("message_id", "<i8"),   # per-robot message id
+    ("text_offset", "<u8"),  # byte offset in the segment's .txt file
+    ("text_len", "<u4"),
+    ("event", "<u2"),        # index into events.json
+    ("epoch", "<u2"),        # simulation epoch (bumped by reset / restore)
+    ("progress", "<f4"),
+    ("_pad", "<u4"),
+])
+
+SEGMENT_RECORDS: int = 1 << 20  # ~56 MiB of records per segment
+MAX_SEGMENTS: int = int(os.environ.get("KVV_JOURNAL_MAX_SEGMENTS", "16"))  # 0 = keep everything
+REINDEX_TAIL: int = 1 << 16  # unindexed records of the open segment before its index is rebuilt
+
+JOURNAL_DIR: str = os.environ.get("KVV_JOURNAL_DIR", os.path.join(os.path.dirname(__file__), "journal"))
+
+
+class _Segment:
+    """
+    One segment on disk. Sealed segments keep their memory map open.
+    """
+
+    def __init__(self, directory: str, first_seq: int):
+        self.first_seq = first_seq
+        base = os.path.join(directory, f"seg-{first_seq:012d}")
+        self.rec_path = base + ".rec"
+        self.txt_path = base + ".txt"
+        self.sealed = False
+        self._records: Optional[np.ndarray] = None
+        self._text: Optional[np.ndarray] = None
+        self._index: Optional[Tuple[np.ndarray, np.ndarray, int]] = None  # (sorted robot ids, rows, count)
+
+    def count(self) -> int:
+        try:
+            return os.path.getsize(self.rec_path) // RECORD_DTYPE.itemsize
+        except OSError:
+            return 0
+
+    def records(self) -> np.ndarray:
+        if self._records is not None:
+            return self._records
+        n = self.count()
+        if n == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        recs = np.memmap(self.rec_path, dtype=RECORD_DTYPE, mode="r", shape=(n,))
+        if self.sealed:
+            self._records = recs
+        return recs
+
+    def robot_rows(self, recs: np.ndarray, robot_id: int) -> np.ndarray:
+        """
+        Row numbers of one robot's records in recs (this segment's records), ascending.
+        Records appended to the open segment after the index was built are scanned.
+        """
+        n = len(recs)
+        index = self._index
+        if index is None or n - index[2] > REINDEX_TAIL:
+            ids = np.asarray(recs["robot_id"])
+            order = np.argsort(ids, kind="stable").astype(np.uint32)
+            index = self._index = (ids[order], order, n)
+        keys, order, indexed = index
+        rows = order[np.searchsorted(keys, robot_id, "left"):np.searchsorted(keys, robot_id, "right")]
+        if n > indexed:
+            tail = np.flatnonzero(recs["robot_id"][indexed:] == robot_id) + indexed
+            rows = np.concatenate([rows, tail])
+        return rows
+
+    def text(self, offset: int, length: int) -> str:
+        if self._text is None or offset + length > len(self._text):
+            try:
+                if os.path.getsize(self.txt_path) == 0:
+                    return ""
+                self._text = np.memmap(self.txt_path, dtype=np.uint8, mode="r")
+            except OSError:
+                return ""  # removed by the writer's retention
+        return self._text[offset:offset + length].tobytes().decode("utf-8")
+
+    def unlink(self) -> None:
+        for path in (self.rec_path, self.txt_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class EventJournal:
+    """
+    Writes robot messages to segment files and reads them back.
+
+    Args:
+        directory: Journal directory (created if missing; existing segments are appended to).
+        segment_records: Records per segment before a new segment is started.
+        max_segments: Segments kept on disk; the oldest is deleted on rotation (0 = no limit).
+        flush_interval_s: How often the writer commits the queued messages.
+        fsync: fsync every batch (durable, but slower).
+        read_only: Only read a journal that another process writes (no writer thread).
+    """
+
+    def __init__(self, directory: str, segment_records: int = SEGMENT_RECORDS,
+                 max_segments: int = MAX_SEGMENTS, flush_interval_s: float = 0.1,
+                 fsync: bool = False, read_only: bool = False):
+        self.directory = directory
+        self.segment_records = int(segment_records)
+        self.max_segments = int(max_segments)
+        self.flush_interval_s = float(flush_interval_s)
+        self.fsync = fsync
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self.epoch = 0
+        self.batches = 0
+
+        self._events_path = os.path.join(directory, "events.json")
+        self._events: List[str] = []
+        self._event_index: Dict[str, int] = {}
+        self._events_mtime = 0.0
+        self._load_events()
+
+        self._segments: List[_Segment] = []
+        for first_seq in self._segment_names():
+            seg = _Segment(directory, first_seq)
+            seg.sealed = True
+            self._segments.append(seg)
+        self._next_seq = 1
+        if self._segments:
+            last = self._segments[-1]
+            last.sealed = False
+            recs = last.records()
+            if len(recs):
+                self._next_seq = int(recs["seq"][-1]) + 1
+                self.epoch = int(recs["epoch"][-1])
+        self._rec_file = None
+        self._txt_file = None
+
+        self.thread: Optional[threading.Thread] = None
+        if not read_only:
+            self.thread = threading.Thread(target=self._loop, name="event-journal", daemon=True)
+            self.thread.start()
+
+    def _segment_names(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[4:-4]) for name in os.listdir(self.directory)
+                      if name.startswith("seg-") and name.endswith(".rec"))
+
+    def _load_events(self) -> None:
+        try:
+            mtime = os.path.getmtime(self._events_path)
+        except OSError:
+            return
+        if mtime == self._events_mtime:
+            return
+        with open(self._events_path, "r", encoding="utf-8") as f:
+            self._events = json.load(f)
+        self._events_mtime = mtime
+        self._event_index = {name: i for i, name in enumerate(self._events)}
+
+    def refresh(self) -> None:
+        """
+        Pick up the segments and event names that the writing process added since the
+        journal was opened (read-only journals).
+        """
+        self._load_events()
+        names = self._segment_names()
+        on_disk = set(names)
+        self._segments = [seg for seg in self._segments if seg.first_seq in on_disk]  # retention
+        known = {seg.first_seq for seg in self._segments}
+        for first_seq in names:
+            if first_seq not in known:
+                if self._segments:
+                    self._segments[-1].sealed = True  # the writer only rotates full segments
+                self._segments.append(_Segment(self.directory, first_seq))
+
+    # -------------------------
+    # Writing
+    # -------------------------
+    def append(self, msg: Dict[str, Any]) -> None:
+        """
+        Queue one message (the hot path: a single deque append).
+        """
+        self._queue.append(msg)
+
+    def new_epoch(self) -> int:
+        """
+        Commit everything queued so far and start a new epoch (the simulation was reset).
+        """
+        with self._write_lock:
+            self._commit()
+            self.epoch = (self.epoch + 1) & 0xFFFF
+            return self.epoch
+
+    def flush(self) -> int:
+        """
+        Commit the queued messages now. Returns the number of written records.
+        """
+        with self._write_lock:
+            return self._commit()
+
+    def close(self) -> None:
+        if self.thread is None:
+            return
+        self._stop = True
+        self._wake.set()
+        self.thread.join()
+        with self._write_lock:
+            self._commit()
+            self._close_files()
+
+    def _loop(self) -> None:
+        while not self._stop:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            if self._queue:
+                self.flush()
+
+    def _close_files(self) -> None:
+        for f in (self._rec_file, self._txt_file):
+            if f is not None:
+                f.close()
+        self._rec_file = self._txt_file = None
+
+    def _open_segment(self) -> _Segment:
+        if not self._segments or self._segments[-1].count() >= self.segment_records:
+            self._close_files()
+            if self._segments:
+                self._segments[-1].sealed = True
+            self._segments.append(_Segment(self.directory, self._next_seq))
+            if self.max_segments > 0 and len(self._segments) > self.max_segments:
+                dropped = self._segments[:-self.max_segments]
+                self._segments = self._segments[-self.max_segments:]  # readers keep their copy
+                for old in dropped:
+                    old.unlink()
+        seg = self._segments[-1]
+        if self._rec_file is None:
+            self._rec_file = open(seg.rec_path, "ab")
+            self._txt_file = open(seg.txt_path, "ab")
+        return seg
+
+    def _event_id(self, name: str) -> int:
+        i = self._event_index.get(name)
+        if i is None:
+            i = self._event_index[name] = len(self._events)
+            self._events.append(name)
+            tmp = self._events_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._events, f)
+            os.replace(tmp, self._events_path)
+        return i
+
+    def _commit(self) -> int:
+        """
+        Write queued messages, one batch per segment (write lock must be held).
+        """
+        written = 0
+        while self._queue:
+            seg = self._open_segment()
+            room = self.segment_records - seg.count()
+            batch = []
+            while self._queue and len(batch) < room:
+                batch.append(self._queue.popleft())
+
+            recs = np.zeros(len(batch), dtype=RECORD_DTYPE)
+            texts = [str(m.get("text", "")).encode("utf-8") for m in batch]
+            lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+            text_start = self._txt_file.tell()
+            recs["seq"] = np.arange(self._next_seq, self._next_seq + len(batch), dtype=np.uint64)
+            recs["ts"] = [m["ts"] for m in batch]
+            recs["robot_id"] = [m["robot_id"] for m in batch]
+            recs["message_id"] = [m["id"] for m in batch]
+            recs["text_offset"] = text_start + np.cumsum(lengths) - lengths
+            recs["text_len"] = lengths
+            recs["event"] = [self._event_id(m["event"]) for m in batch]
+            recs["epoch"] = self.epoch
+            recs["progress"] = [m["progress"] for m in batch]
+
+            # texts first: a record never points at text that is not on disk yet
+            self._txt_file.write(b"".join(texts))
+            self._txt_file.flush()
+            self._rec_file.write(recs.tobytes())
+            self._rec_file.flush()
+            if self.fsync:
+                os.fsync(self._txt_file.fileno())
+                os.fsync(self._rec_file.fileno())
+
+            self._next_seq += len(batch)
+            written += len(batch)
+            self.batches += 1
+        return written
+
+    # -------------------------
+    # Reading
+    # -------------------------
+    @property
+    def position(self) -> Tuple[int, int]:
+        """
+        (first seq of the newest segment, number of event names). A read-only journal
+        needs a refresh() when this differs from the writer's position.
+        """
+        return (self._segments[-1].first_seq if self._segments else 0), len(self._events)
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest committed record."""
+        return self._next_seq - 1
+
+    def _to_dicts(self, seg: _Segment, recs: np.ndarray) -> List[Dict[str, Any]]:
+        events = self._events
+        return [
+            {
+                "id": int(r["message_id"]),
+                "robot_id": int(r["robot_id"]),
+                "event": events[int(r["event"])],
+                "text": seg.text(int(r["text_offset"]), int(r["text_len"])),
+                "progress": float(r["progress"]),
+                "ts": float(r["ts"]),
+                "seq": int(r["seq"]),
+            }
+            for r in recs
+        ]
+
+    def read(self, since_seq: int = 0, since_ts: Optional[float] = None,
+             robot_id: Optional[int] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Records with seq > since_seq (and ts >= since_ts), oldest first.
+        The start position is found by binary search over segments and records.
+        """
+        out: List[Dict[str, Any]] = []
+        segments = list(self._segments)
+        first = max(0, bisect.bisect_right([s.first_seq for s in segments], since_seq) - 1)
+        for seg in segments[first:]:
+            recs = seg.records()
+            if not len(recs):
+                continue
+            start = int(np.searchsorted(recs["seq"], since_seq, side="right"))
+            if since_ts is not None:
+                if float(recs["ts"][-1]) < since_ts and seg.sealed:
+                    continue
+                # batches keep ts almost sorted; the running maximum is sorted
+                running = np.maximum.accumulate(recs["ts"][start:])
+                start += int(np.searchsorted(running, since_ts, side="left"))
+            recs = recs[start:]
+            mask = np.ones(len(recs), dtype=bool)
+            if since_ts is not None:
+                mask &= recs["ts"] >= since_ts
+            if robot_id is not None:
+                mask &= recs["robot_id"] == robot_id
+            out.extend(self._to_dicts(seg, recs[mask][:limit - len(out)]))
+            if len(out) >= limit:
+                break
+        return out
+
+    def robot_messages(self, robot_id: int, since_message_id: int,
+                       before_message_id: Optional[int] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Messages of one robot (current epoch) with since_message_id < id < before_message_id,
+        oldest first. Segments are scanned from the newest backwards (through their robot
+        index) and the scan stops at the first segment that reaches back to since_message_id.
+        Messages in segments removed by retention are not returned.
+        """
+        found: List[Tuple[_Segment, np.ndarray]] = []
+        epoch = self.epoch
+        for seg in reversed(list(self._segments)):
+            recs = seg.records()
+            if not len(recs):
+                continue
+            if int(recs["epoch"][-1]) != epoch and seg.sealed:
+                break  # older epochs only from here on
+            mine = recs[seg.robot_rows(recs, robot_id)]
+            mine = mine[mine["epoch"] == epoch]
+            if not len(mine):
+                continue
+            ids = mine["message_id"]
+            sel = ids > since_message_id
+            if before_message_id is not None:
+                sel &= ids < before_message_id
+            if sel.any():
+                found.append((seg, mine[sel]))
+            if int(ids.min()) <= since_message_id + 1:
+                break
+
+        out: List[Dict[str, Any]] = []
+        for seg, recs in reversed(found):
+            out.extend(self._to_dicts(seg, recs[:limit - len(out)]))
+            if len(out) >= limit:
+                break
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "segments": len(self._segments),
+            "last_seq": self.last_seq,
+            "queued": len(self._queue),
+            "batches": self.batches,
+            "epoch": self.epoch,
+            "bytes": sum(os.path.getsize(p) for s in self._segments
+                         for p in (s.rec_path, s.txt_path) if os.path.exists(p)),
+        }
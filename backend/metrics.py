@@ -0,0 +1,232 @@
+"""
+metrics.py
+
+In-process metrics in the Prometheus text format (served at /api/debug/metrics).
+
+Histograms use HDR-style log buckets: the bucket of a value is its binary exponent
+(math.frexp), so recording is O(1) with no search, and every bucket covers a factor of
+two (upper bounds 2^-17 s ~ 7.6 us ... 2^5 s = 32 s). Every series has its own lock,
+so a record is one uncontended lock acquire plus a few additions; the request hot path
+stays in the microsecond range.
+
+Usage:
+    METRICS.observe("kvv_geocode_seconds", seconds)
+    with METRICS.timer("kvv_routing_seconds", kind="dijkstra"):
+        ...
+    METRICS.inc("kvv_route_jobs_started_total")
+
+Gauges of the simulation (robots, active jobs, message logs, ...) are computed when
+the metrics are scraped, see simulation_gauges().
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MIN_EXP: int = -17  # first bucket: <= 2^-17 s
+MAX_EXP: int = 5  # last finite bucket: <= 2^5 s
+BUCKET_BOUNDS: List[float] = [2.0 ** e for e in range(MIN_EXP, MAX_EXP + 1)]
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# HELP text per metric name
+DESCRIPTIONS: Dict[str, str] = {
+    "kvv_http_request_duration_seconds": "Request latency per blueprint and route.",
+    "kvv_http_requests_total": "Requests per blueprint, route, method and status.",
+    "kvv_route_job_update_delay_seconds": "Delay of route job updates behind their 50 ms schedule.",
+    "kvv_route_jobs_started_total": "Route jobs started.",
+    "kvv_graph_load_seconds": "Time to load the OSMnx drive network.",
+    "kvv_geocode_seconds": "Time per geocoding call.",
+    "kvv_routing_seconds": "Time per shortest path search (batch).",
+    "kvv_warmup_stage_seconds": "Time of the startup warmup stages.",
+    "kvv_shared_publish_seconds": "Time per publish round of the shared fleet state.",
+    "kvv_store_batch_seconds": "Time per write-behind batch of the persistent store.",
+}
+
+
+class Histogram:
+    """
+    Log-bucketed histogram of durations in seconds.
+    """
+    __slots__ = ("counts", "count", "sum", "_lock")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # last bucket: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        if seconds > 0.0:
+            exp = math.frexp(seconds)[1]  # seconds <= 2^exp
+            i = min(max(exp - MIN_EXP, 0), len(BUCKET_BOUNDS))
+        else:
+            i = 0
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """
+    Histograms and counters keyed by (name, labels).
+    """
+
+    def __init__(self) -> None:
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], Counter] = {}
+        self._requests: Dict[Tuple[str, str, str, int], Tuple[Histogram, Counter]] = {}
+        self._lock = threading.Lock()  # only taken when a new series is created
+
+    def histogram(self, name: str, **labels: Any) -> Histogram:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        h = self._histograms.get(key)
+        if h is None:
+            with self._lock:
+                h = self._histograms.setdefault(key, Histogram())
+        return h
+
+    def counter(self, name: str, **labels: Any) -> Counter:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        c = self._counters.get(key)
+        if c is None:
+            with self._lock:
+                c = self._counters.setdefault(key, Counter())
+        return c
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        self.histogram(name, **labels).observe(seconds)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: Any) -> None:
+        self.counter(name, **labels).inc(amount)
+
+    def observe_request(self, blueprint: str, route: str, method: str, status: int, seconds: float) -> None:
+        """
+        HTTP request hot path: the series of a (blueprint, route, method, status) are
+        looked up once and then found with a single dictionary access.
+        """
+        key = (blueprint, route, method, status)
+        series = self._requests.get(key)
+        if series is None:
+            series = (self.histogram("kvv_http_request_duration_seconds", blueprint=blueprint, route=route,
+                                     method=method),
+                      self.counter("kvv_http_requests_total", blueprint=blueprint, route=route, method=method,
+                                   status=status))
+            self._requests[key] = series
+        series[0].observe(seconds)
+        series[1].inc()
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """
+        Observe the duration of the with-block (also if it raises).
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._requests.clear()
+
+    def render(self, gauges: Optional[List[Tuple[str, str, Labels, float]]] = None) -> str:
+        """
+        All series in the Prometheus text format (version 0.0.4).
+
+        gauges: extra (name, help, labels, value) samples, e.g. simulation_gauges(sim)
+        """
+        lines: List[str] = []
+        described = set()
+
+        def header(name: str, kind: str, help_text: str) -> None:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), h in sorted(list(self._histograms.items())):
+            header(name, "histogram", DESCRIPTIONS.get(name, name))
+            counts, count, total = h.snapshot()
+            cumulative = 0
+            for bound, n in zip(BUCKET_BOUNDS + [math.inf], counts):
+                cumulative += n
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for (name, labels), c in sorted(list(self._counters.items())):
+            header(name, "counter", DESCRIPTIONS.get(name, name))
+            lines.append(f"{name}{_labels(labels)} {_number(c.value)}")
+
+        for name, help_text, labels, value in gauges or []:
+            header(name, "gauge", help_text)
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def simulation_gauges(sim) -> List[Tuple[str, str, Labels, float]]:
+    """
+    Current state of the simulation as gauge samples (computed at scrape time).
+    """
+    robots = list(sim.robots)
+    sizes = [r.message_count for r in robots]
+    jobs = sim.jobs.stats()
+    engine = sim.engine.stats()
+    out: List[Tuple[str, str, Labels, float]] = [
+        ("kvv_robots", "Robots in the simulation.", (), len(robots)),
+        ("kvv_route_jobs_active", "Route jobs that are running or paused.", (), jobs["active"]),
+        ("kvv_route_job_threads", "Threads of the active route jobs.", (), jobs["threads"]),
+        ("kvv_message_log_entries", "Messages kept in memory, summed over all robots.", (), sum(sizes)),
+        ("kvv_message_log_max_entries", "Largest message log of a robot.", (), max(sizes, default=0)),
+        ("kvv_held_robots", "Robots holding for headway.", (), len(sim.held_robots)),
+        ("kvv_tick_overruns", "Ticks that took longer than the tick interval.", (), engine["overruns"]),
+        ("kvv_tick_skipped", "Tick deadlines skipped after overruns.", (), engine["skipped_ticks"]),
+    ]
+    for name, st in engine["systems"].items():
+        out.append(("kvv_tick_system_avg_seconds", "Average time per tick of a tick system.",
+                    (("system", name),), st["avg_ms"] / 1000.0))
+    return out
+
+
+METRICS = MetricsRegistry()
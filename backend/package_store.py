@@ -0,0 +1,321 @@
+"""
+package_store.py
+
+Central store for all packages of the simulation.
+
+Every package gets an id and a lifecycle state (CREATED -> LOADED -> DELIVERED).
+The store keeps secondary indexes so that lookups never have to visit every robot:
+- by destination station
+- by origin station
+- by robot
+- by state
+- by (robot, destination), used when a robot unloads at a stop
+
+Stations are indexed by their KVV triasID when the name is a known station
+(see stations.py), otherwise by the lower-cased name. This way
+"Karlsruhe Durlach Bahnhof, Germany" and "Durlach Bahnhof" end up in the same bucket.
+
+Consumers that mirror the packages elsewhere (the persistent store, storage.py) call
+track_changes() and only rewrite the packages whose ids it collects.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from enum import Enum
+from typing import Dict, List, Optional, Set, Tuple
+
+from backend.packages import Package, PackageSize
+from backend.robot import ChangeSet, Robot
+from backend.stations import list_stations, station_index
+
+
+class PackageState(Enum):
+    """
+    Lifecycle state of a package.
+    """
+    CREATED = 0
+    LOADED = 1
+    DELIVERED = 2
+
+
+def station_key(name: str) -> str:
+    """
+    Normalized index key for a station name or id.
+    """
+    i = station_index(name)
+    if i is not None:
+        return str(list_stations()[i]["triasID"])
+    return str(name).strip().lower()
+
+
+class PackageRecord:
+    """
+    Compact package record as stored in PackageStore.
+    """
+    __slots__ = (
+        "package_id", "start", "destination", "size", "state", "robot_id",
+        "origin_key", "destination_key", "created_ts", "delivered_ts",
+    )
+
+    def __init__(self, package_id: int, start: str, destination: str, size: PackageSize):
+        self.package_id = package_id
+        self.start = start
+        self.destination = destination
+        self.size = size
+        self.state = PackageState.CREATED
+        self.robot_id: Optional[int] = None
+        self.origin_key = station_key(start)
+        self.destination_key = station_key(destination)
+        self.created_ts = time.time()
+        self.delivered_ts: Optional[float] = None
+
+    def to_package(self) -> Package:
+        return Package(start=self.start, destination=self.destination, size=self.size,
+                       package_id=self.package_id)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "package_id": self.package_id,
+            "start": self.start,
+            "destination": self.destination,
+            "size": self.size.name,
+            "state": self.state.name,
+            "robot_id": self.robot_id,
+            "created_ts": self.created_ts,
+            "delivered_ts": self.delivered_ts,
+        }
+
+
+class PackageStore:
+    """
+    Thread-safe package store with secondary indexes and per-robot size counters.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # id sets of the active change sets (see track_changes)
+        self._trackers: Tuple[Set[int], ...] = ()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._next_id = 0
+            self._records: Dict[int, PackageRecord] = {}
+            self._by_destination: Dict[str, Set[int]] = {}
+            self._by_origin: Dict[str, Set[int]] = {}
+            self._by_robot: Dict[int, Set[int]] = {}
+            self._by_state: Dict[PackageState, Set[int]] = {s: set() for s in PackageState}
+            self._by_robot_destination: Dict[Tuple[int, str], Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def next_id(self) -> int:
+        """Id counter; the next created package gets next_id + 1."""
+        return self._next_id
+
+    # -------------------------
+    # Change tracking
+    # -------------------------
+    def track_changes(self) -> ChangeSet:
+        """
+        Start collecting the ids of created, loaded, delivered and removed packages.
+        """
+        changes = ChangeSet()
+        self._trackers = self._trackers + (changes.ids,)
+        return changes
+
+    def untrack_changes(self, changes: ChangeSet) -> None:
+        self._trackers = tuple(ids for ids in self._trackers if ids is not changes.ids)
+
+    def _changed(self, package_id: int) -> None:
+        for ids in self._trackers:
+            ids.add(package_id)
+
+    # -------------------------
+    # Index helpers (lock must be held)
+    # -------------------------
+    @staticmethod
+    def _index_add(index: Dict, key, package_id: int) -> None:
+        index.setdefault(key, set()).add(package_id)
+
+    @staticmethod
+    def _index_remove(index: Dict, key, package_id: int) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(package_id)
+            if not ids:
+                del index[key]
+
+    def _set_state(self, rec: PackageRecord, state: PackageState) -> None:
+        self._by_state[rec.state].discard(rec.package_id)
+        rec.state = state
+        self._by_state[state].add(rec.package_id)
+
+    def _detach_from_robot(self, rec: PackageRecord) -> None:
+        rid = rec.robot_id
+        self._index_remove(self._by_robot, rid, rec.package_id)
+        self._index_remove(self._by_robot_destination, (rid, rec.destination_key), rec.package_id)
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    def create(self, start: str, destination: str, size: PackageSize) -> PackageRecord:
+        """
+        Create a new package in state CREATED.
+        """
+        with self._lock:
+            self._next_id += 1
+            rec = PackageRecord(self._next_id, start, destination, PackageSize(size))
+            self._records[rec.package_id] = rec
+            self._index_add(self._by_destination, rec.destination_key, rec.package_id)
+            self._index_add(self._by_origin, rec.origin_key, rec.package_id)
+            self._by_state[rec.state].add(rec.package_id)
+            self._changed(rec.package_id)
+            return rec
+
+    def load(self, package_id: int, robot: Robot) -> PackageRecord:
+        """
+        Load a CREATED package onto a robot.
+
+        Raises:
+            KeyError: unknown package_id.
+            ValueError: package is not in state CREATED or the robot is full.
+        """
+        with self._lock:
+            rec = self._records[package_id]
+            if rec.state != PackageState.CREATED:
+                raise ValueError(f"Package {package_id} is already {rec.state.name}.")
+            robot.add_package(rec.to_package())  # raises ValueError if the robot is full
+
+            rid = robot.robot_id
+            rec.robot_id = rid
+            self._set_state(rec, PackageState.LOADED)
+            self._index_add(self._by_robot, rid, package_id)
+            self._index_add(self._by_robot_destination, (rid, rec.destination_key), package_id)
+            self._changed(package_id)
+            return rec
+
+    def add(self, robot: Robot, start: str, destination: str, size: PackageSize) -> PackageRecord:
+        """
+        Create a package and load it onto a robot. Nothing is stored if the robot is full.
+        """
+        rec = self.create(start, destination, size)
+        try:
+            return self.load(rec.package_id, robot)
+        except ValueError:
+            self.remove(rec.package_id)
+            raise
+
+    def remove(self, package_id: int) -> None:
+        """
+        Remove a package from the store (and from its robot's counters/indexes).
+        """
+        with self._lock:
+            rec = self._records.pop(package_id, None)
+            if rec is None:
+                return
+            if rec.state == PackageState.LOADED:
+                self._detach_from_robot(rec)
+            self._by_state[rec.state].discard(package_id)
+            self._index_remove(self._by_destination, rec.destination_key, package_id)
+            self._index_remove(self._by_origin, rec.origin_key, package_id)
+            self._changed(package_id)
+
+    def unload_at(self, robot: Robot, station: str) -> List[PackageRecord]:
+        """
+        Deliver all packages of a robot whose destination is the given station.
+        Only the packages due at this station are touched.
+
+        Returns:
+            The delivered records.
+        """
+        key = station_key(station)
+        with self._lock:
+            ids = self._by_robot_destination.get((robot.robot_id, key))
+            if not ids:
+                return []
+            ids = set(ids)
+            now = time.time()
+            delivered = []
+            for package_id in ids:
+                rec = self._records[package_id]
+                self._detach_from_robot(rec)
+                self._set_state(rec, PackageState.DELIVERED)
+                rec.delivered_ts = now
+                delivered.append(rec)
+                self._changed(package_id)
+            robot.remove_packages(ids)
+            return sorted(delivered, key=lambda r: r.package_id)
+
+    def records(self) -> List[PackageRecord]:
+        """
+        All records ordered by package_id (e.g. for snapshots).
+        """
+        with self._lock:
+            return list(self._records.values())
+
+    def restore(self, records: List[PackageRecord], next_id: int) -> None:
+        """
+        Replace the store content with the given records and rebuild all indexes.
+        """
+        self.clear()
+        with self._lock:
+            self._next_id = int(next_id)
+            for rec in sorted(records, key=lambda r: r.package_id):
+                pid = rec.package_id
+                self._records[pid] = rec
+                self._index_add(self._by_destination, rec.destination_key, pid)
+                self._index_add(self._by_origin, rec.origin_key, pid)
+                self._by_state[rec.state].add(pid)
+                if rec.state == PackageState.LOADED:
+                    rid = rec.robot_id
+                    self._index_add(self._by_robot, rid, pid)
+                    self._index_add(self._by_robot_destination, (rid, rec.destination_key), pid)
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def get(self, package_id: int) -> Optional[PackageRecord]:
+        return self._records.get(package_id)
+
+    def query(
+        self,
+        destination: Optional[str] = None,
+        origin: Optional[str] = None,
+        robot_id: Optional[int] = None,
+        state: Optional[PackageState] = None,
+        offset: int = 0,
+        limit: int = 100,
+    ) -> Tuple[int, List[PackageRecord]]:
+        """
+        Filter packages using the indexes. Results are ordered by package_id.
+
+        Returns:
+            (total number of matches, records of the requested page)
+        """
+        with self._lock:
+            sets: List[Set[int]] = []
+            if destination is not None:
+                sets.append(self._by_destination.get(station_key(destination), set()))
+            if origin is not None:
+                sets.append(self._by_origin.get(station_key(origin), set()))
+            if robot_id is not None:
+                sets.append(self._by_robot.get(robot_id, set()))
+            if state is not None:
+                sets.append(self._by_state[state])
+
+            if sets:
+                sets.sort(key=len)
+                ids = set(sets[0]).intersection(*sets[1:])
+                ids = sorted(ids)
+            else:
+                ids = list(self._records)  # insertion order == id order
+
+            offset = max(0, int(offset))
+            limit = max(0, int(limit))
+            page = [self._records[i] for i in ids[offset:offset + limit]]
+            return len(ids), page
@@ -1,12 +1,18 @@
 """
 TODO
 """
+import sys
 from enum import Enum
+from typing import Any, Dict, Optional
 
 STD_START: str = "Karlsruhe Hauptbahnhof, Germany"
 STD_DESTINATION: str = "Karlsruhe Durlach Bahnhof, Germany"
 
 
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
 class PackageSize(Enum):
     """
     TODO: Docstring
@@ -19,21 +25,39 @@ class Package:
     """
     TODO: Docstring
     """
-    _start: str = "Karlsruhe Hauptbahnhof"
+    # no per-instance __dict__; station names are interned so that many packages
+    # to the same stations share one string object
+    __slots__ = ("_start", "_destination", "_size", "_package_id")
+
+    _start: Optional[str]
     _destination: str
     _size: PackageSize
+    _package_id: Optional[int]
 
-    def __init__(self, start: str, destination:  str, size: str):
+    def __init__(self, start: str, destination:  str, size: str, package_id: Optional[int] = None):
         """
         TODO: Docstring
         """
-        self._start = start
-        self._destination = destination
+        self._start = _intern(start)
+        self._destination = _intern(destination)
         self._size = size
+        self._package_id = package_id
 
     def __str__(self) -> str:
         return f"Package, Size {self._size.name}"
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "package_id": self._package_id,
+            "size": str(self._size),
+            "start": self.start,
+            "destination": self._destination,
+        }
+
+    @property
+    def package_id(self) -> Optional[int]:
+        return self._package_id
+
     @property
     def start(self) -> str:
         if self._start is None:
@@ -42,7 +66,7 @@ class Package:
 
     @start.setter
     def start(self, value):
-        self._start = value
+        self._start = _intern(value)
 
     @property
     def destination(self) -> str:
@@ -50,7 +74,7 @@ class Package:
 
     @destination.setter
     def destination(self, value):
-        self._destination = value
+        self._destination = _intern(value)
 
     @property
     def size(self) -> PackageSize:
@@ -0,0 +1,223 @@
+"""
+planner.py
+
+Multi-stop delivery routes: visit the destinations of all packages a robot carries
+in a short order and drive them as one continuous route job.
+
+Per batch of robots:
+    1. The robot positions and all destination stations are snapped to the road
+       network; one Dijkstra search per distinct start node gives the distances
+       between them and the predecessors to rebuild the paths (road_network.py).
+    2. Per robot the visiting order is an open-path TSP from the robot position over
+       its (at most MAX_NUM_OF_PACKAGES) stops: nearest insertion, improved with 2-opt
+       and Or-opt moves until no move shortens the path. Road distances are directed,
+       so every move is evaluated on the real path cost.
+    3. The legs are concatenated into one coordinate list that passes exactly through
+       every stop, so the route job reports them as stations and unloads there.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.packages import STD_START
+from backend.road_network import ROBOT_SPEED_M_S, RoadNetwork, polyline_length_m
+from backend.robot import Robot
+from backend.stations import find_station, list_stations, station_coords, station_index
+
+_EPS: float = 1e-6
+UNREACHABLE_M: float = 1e9  # cost of a leg without a road path (visited last)
+SEARCH_CHUNK: int = 256  # sources per Dijkstra call (bounds the temporary memory)
+
+
+# -------------------------
+# Open-path TSP
+# -------------------------
+def path_cost(dist: List[List[float]], order: Sequence[int]) -> float:
+    return sum(dist[a][b] for a, b in zip(order, order[1:]))
+
+
+def nearest_insertion(dist: List[List[float]], start: int = 0) -> List[int]:
+    """
+    Path starting at `start` that visits every node of the (n, n) matrix: repeatedly
+    take the node closest to the path and insert it where it adds the least.
+    """
+    n = len(dist)
+    order = [start]
+    left = [k for k in range(n) if k != start]
+    closest = {k: dist[start][k] for k in left}
+    while left:
+        k = min(left, key=closest.__getitem__)
+        left.remove(k)
+        # append at the end or insert between two neighbours
+        best_pos, best_add = len(order), dist[order[-1]][k]
+        for pos in range(1, len(order)):
+            a, b = order[pos - 1], order[pos]
+            add = dist[a][k] + dist[k][b] - dist[a][b]
+            if add < best_add:
+                best_pos, best_add = pos, add
+        order.insert(best_pos, k)
+        for other in left:
+            closest[other] = min(closest[other], dist[k][other])
+    return order
+
+
+def two_opt(dist: List[List[float]], order: List[int]) -> bool:
+    """
+    Reverse the segment that shortens the path most (first node stays fixed).
+    Returns True if the path changed.
+    """
+    best, best_order = path_cost(dist, order), None
+    for i in range(1, len(order) - 1):
+        for j in range(i + 1, len(order)):
+            candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+            cost = path_cost(dist, candidate)
+            if cost < best - _EPS:
+                best, best_order = cost, candidate
+    if best_order is None:
+        return False
+    order[:] = best_order
+    return True
+
+
+def or_opt(dist: List[List[float]], order: List[int]) -> bool:
+    """
+    Move a run of 1-3 consecutive stops to the position where the path gets shortest.
+    Returns True if the path changed.
+    """
+    best, best_order = path_cost(dist, order), None
+    n = len(order)
+    for length in (1, 2, 3):
+        for i in range(1, n - length + 1):
+            segment = order[i:i + length]
+            rest = order[:i] + order[i + length:]
+            for pos in range(1, len(rest) + 1):
+                if pos == i:
+                    continue
+                candidate = rest[:pos] + segment + rest[pos:]
+                cost = path_cost(dist, candidate)
+                if cost < best - _EPS:
+                    best, best_order = cost, candidate
+    if best_order is None:
+        return False
+    order[:] = best_order
+    return True
+
+
+def solve_open_tsp(dist: List[List[float]], start: int = 0) -> List[int]:
+    """
+    Short path from `start` over all nodes (no return to the start).
+    """
+    order = nearest_insertion(dist, start)
+    if len(order) > 3:
+        while two_opt(dist, order) or or_opt(dist, order):
+            pass
+    return order
+
+
+# -------------------------
+# Fleet planning
+# -------------------------
+@dataclass
+class RoutePlan:
+    """
+    Planned delivery route of one robot.
+
+    stops: station triasIDs in visiting order
+    coords: continuous path over all stops (starts at the robot position)
+    """
+
+    robot_id: int
+    stops: List[str] = field(default_factory=list)
+    stop_names: List[str] = field(default_factory=list)
+    coords: List[Tuple[float, float]] = field(default_factory=list)
+    total_m: float = 0.0
+    route_id: Optional[int] = None
+
+    def duration_s(self, speed_m_s: float = ROBOT_SPEED_M_S) -> float:
+        return max(3.0, self.total_m / speed_m_s)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "robot_id": self.robot_id,
+            "stops": self.stop_names,
+            "stop_ids": self.stops,
+            "total_m": round(self.total_m, 1),
+            "route_id": self.route_id,
+        }
+
+
+def robot_stops(robot: Robot) -> List[int]:
+    """
+    Distinct destination station indices of the packages a robot carries.
+    """
+    out = []
+    for package in robot.packages:
+        i = station_index(package.destination)
+        if i is not None and i not in out:
+            out.append(i)
+    return out
+
+
+def plan_routes(robots: Sequence[Robot], network: RoadNetwork) -> List[RoutePlan]:
+    """
+    Plan the delivery routes of a batch of robots (robots without deliverable
+    packages get an empty plan).
+    """
+    stations = list_stations()
+    default = station_coords(find_station(STD_START))
+    starts = [r.position or default for r in robots]
+    stops = [robot_stops(r) for r in robots]
+
+    # snap robot positions and all stop stations, search once from every distinct node
+    stop_ids = sorted({i for s in stops for i in s})
+    stop_xy = [station_coords(stations[i]) for i in stop_ids]
+    robot_nodes, _ = network.nearest_nodes([p[0] for p in starts], [p[1] for p in starts])
+    if stop_ids:
+        stop_nodes, _ = network.nearest_nodes([p[0] for p in stop_xy], [p[1] for p in stop_xy])
+    else:
+        stop_nodes = np.empty(0, dtype=np.int64)
+    col = {s: k for k, s in enumerate(stop_ids)}
+    active = [k for k, s in enumerate(stops) if s]
+    sources = np.unique(np.concatenate([robot_nodes[active], stop_nodes]).astype(np.int64))
+    row = {int(node): k for k, node in enumerate(sources.tolist())}
+
+    dist = np.empty((len(sources), len(stop_ids)))
+    pred = np.empty((len(sources), network.n_nodes), dtype=np.int32)
+    for a in range(0, len(sources), SEARCH_CHUNK):
+        d, p = network.shortest_from(sources[a:a + SEARCH_CHUNK], predecessors=True)
+        dist[a:a + SEARCH_CHUNK] = d[:, stop_nodes]
+        pred[a:a + SEARCH_CHUNK] = p
+
+    plans = []
+    for k, robot in enumerate(robots):
+        plan = RoutePlan(robot.robot_id)
+        plans.append(plan)
+        if not stops[k]:
+            continue
+        cols = [col[i] for i in stops[k]]
+        nodes = [int(robot_nodes[k])] + [int(stop_nodes[c]) for c in cols]
+        n = len(nodes)
+        # local matrix: 0 = robot, 1.. = its stops (the robot is never a target)
+        local = [[0.0] * n for _ in range(n)]
+        for a in range(n):
+            r = dist[row[nodes[a]]]
+            for b in range(1, n):
+                if a != b:
+                    local[a][b] = min(float(r[cols[b - 1]]), UNREACHABLE_M)
+        order = solve_open_tsp(local)
+
+        coords = [tuple(starts[k])]
+        for a, b in zip(order, order[1:]):
+            # an unreachable leg has no path: drive straight to the stop
+            coords.extend(network.coords(network.path(pred[row[nodes[a]]], nodes[a], nodes[b])))
+            coords.append(tuple(stop_xy[cols[b - 1]]))
+        plan.coords = coords
+        plan.total_m = polyline_length_m(coords)
+        plan.stops = [stations[stops[k][i - 1]]["triasID"] for i in order[1:]]
+        plan.stop_names = [stations[stops[k][i - 1]]["name"] for i in order[1:]]
+    return plans
+
@@ -0,0 +1,323 @@
+"""
+profiling.py
+
+On-demand profiling of the running backend (served under /api/debug/profile).
+
+Modes:
+    cprofile  deterministic cProfile of request threads, route job threads and the tick
+              engine. cProfile only sees the thread that enabled it, so every one of
+              these threads calls sync_thread() once per request / frame / tick and
+              attaches (or detaches) its own profiler; the profiles are merged at stop.
+              Output: pstats text or the raw pstats dump (snakeviz, pstats.Stats).
+    sample    statistical sampler: a thread reads sys._current_frames() every
+              interval and counts the stack of every thread. Low overhead, sees all
+              threads, also the ones that wait. Output: collapsed stacks
+              ("thread;outer;...;inner count", input of flamegraph.pl / speedscope).
+    memory    tracemalloc snapshot at start, diff against a second snapshot at stop
+              (allocations that grew in between). Slows down allocations while it runs.
+
+Only one session runs at a time and every session stops itself after `seconds`, so a
+forgotten session does not keep slowing down the process. The endpoints are disabled
+unless KVV_PROFILING=1 is set.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter as CounterDict
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILING_ENABLED: bool = os.environ.get("KVV_PROFILING", "0") == "1"
+MODES: Tuple[str, ...] = ("cprofile", "sample", "memory")
+MAX_SECONDS: float = 300.0
+DETACH_WAIT_S: float = 0.5  # time the profiled threads get to detach at stop
+
+
+# -------------------------
+# cProfile: per-thread profilers that follow the active session
+# -------------------------
+class _CProfileSession:
+    def __init__(self) -> None:
+        self.profiles: List[cProfile.Profile] = []
+        self.threads = set()  # idents of the threads that were profiled
+        self.attached = 0
+        self.lock = threading.Lock()
+
+    def attach(self) -> cProfile.Profile:
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+            self.threads.add(threading.get_ident())
+            self.attached += 1
+        profile.enable()
+        return profile
+
+    def detach(self, profile: cProfile.Profile) -> None:
+        profile.disable()
+        with self.lock:
+            self.attached -= 1
+
+
+_session: Optional[_CProfileSession] = None
+_local = threading.local()
+
+
+def sync_thread() -> None:
+    """
+    Attach the calling thread to the running cProfile session, or detach it when the
+    session is over. Costs one global and one thread-local lookup when nothing changes.
+    """
+    session = _session
+    if getattr(_local, "session", None) is session:
+        return
+    release_thread()
+    if session is not None:
+        _local.profile = session.attach()
+        _local.session = session
+
+
+def release_thread() -> None:
+    """
+    Detach the calling thread (end of a request).
+    """
+    session = getattr(_local, "session", None)
+    if session is not None:
+        session.detach(_local.profile)
+        _local.session = _local.profile = None
+
+
+class _Snapshot:
+    """
+    pstats.Stats input from a profile that may still be enabled in another thread
+    (pstats would call create_stats(), which disables the profiler of the calling thread).
+    """
+
+    def __init__(self, profile: cProfile.Profile):
+        self.profile = profile
+
+    def create_stats(self) -> None:
+        self.profile.snapshot_stats()
+        self.stats = self.profile.stats
+
+
+# -------------------------
+# Sampler
+# -------------------------
+def _thread_group(name: str) -> str:
+    # "route-17" -> "route", "Thread-8 (process_request_thread)" -> "Thread (process_request_thread)"
+    return re.sub(r"-\d+", "", name).replace(";", ",")
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval_s: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval_s = interval_s
+        self.stacks: "CounterDict[Tuple[str, ...]]" = CounterDict()
+        self.samples = 0
+        self.busy_s = 0.0  # time spent sampling (overhead)
+        self._stop_event = threading.Event()
+        self._labels: Dict[Any, str] = {}
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label.replace(";", ",")
+        return label
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        names_at = 0.0
+        while True:
+            t0 = time.perf_counter()
+            if t0 - names_at > 1.0:
+                names = {t.ident: _thread_group(t.name) for t in threading.enumerate()}
+                names_at = t0
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+            self.busy_s += time.perf_counter() - t0
+            if self._stop_event.wait(self.interval_s):
+                break
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+# -------------------------
+# Session manager
+# -------------------------
+class Profiler:
+    """
+    At most one profiling session at a time. stop() returns the result; a session that
+    ended by its time limit keeps its result until it is fetched with stop().
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.mode: Optional[str] = None
+        self.started_at = 0.0
+        self.seconds = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._sampler: Optional[_Sampler] = None
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._own_tracemalloc = False
+        self._result: Optional[Dict[str, Any]] = None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.mode is not None,
+                "mode": self.mode,
+                "elapsed_s": round(time.time() - self.started_at, 3) if self.mode else None,
+                "seconds": self.seconds if self.mode else None,
+                "result_ready": self._result is not None,
+            }
+
+    def start(self, mode: str, seconds: float = 30.0, interval_s: float = 0.01, frames: int = 10) -> Dict[str, Any]:
+        """
+        Raises:
+            ValueError: unknown mode or invalid parameters.
+            RuntimeError: a session is already running.
+        """
+        global _session
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if not 0 < seconds <= MAX_SECONDS:
+            raise ValueError(f"seconds must be in (0, {MAX_SECONDS:g}]")
+        if not 0.001 <= interval_s <= 1.0:
+            raise ValueError("interval_ms must be between 1 and 1000")
+        with self._lock:
+            if self.mode is not None:
+                raise RuntimeError(f"a {self.mode} session is already running")
+            self._result = None
+            if mode == "cprofile":
+                _session = _CProfileSession()
+            elif mode == "sample":
+                self._sampler = _Sampler(interval_s)
+                self._sampler.start()
+            else:
+                self._own_tracemalloc = not tracemalloc.is_tracing()
+                if self._own_tracemalloc:
+                    tracemalloc.start(max(1, min(int(frames), 50)))
+                self._baseline = tracemalloc.take_snapshot()
+            self.mode = mode
+            self.started_at = time.time()
+            self.seconds = float(seconds)
+            self._timer = threading.Timer(seconds, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+            return self.status()
+
+    def _expire(self) -> None:
+        with self._lock:
+            if self.mode is not None:
+                self._result = self._finish()
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        """
+        Stop the running session and return its result (None if there is none).
+        """
+        with self._lock:
+            if self.mode is None:
+                result, self._result = self._result, None
+                return result
+            if self._timer is not None:
+                self._timer.cancel()
+            return self._finish()
+
+    def _finish(self) -> Dict[str, Any]:
+        global _session
+        mode, elapsed = self.mode, time.time() - self.started_at
+        result: Dict[str, Any] = {"mode": mode, "elapsed_s": round(elapsed, 3)}
+        if mode == "cprofile":
+            session, _session = _session, None
+            release_thread()
+            deadline = time.perf_counter() + DETACH_WAIT_S
+            while session.attached > 0 and time.perf_counter() < deadline:
+                time.sleep(0.01)
+            with session.lock:
+                profiles = list(session.profiles)
+            stats = None
+            for profile in profiles:
+                if stats is None:
+                    stats = pstats.Stats(_Snapshot(profile))
+                else:
+                    stats.add(_Snapshot(profile))
+            result.update(stats=stats, threads=len(session.threads))
+        elif mode == "sample":
+            sampler, self._sampler = self._sampler, None
+            sampler.stop()
+            result.update(stacks=sampler.stacks, samples=sampler.samples,
+                          overhead=round(sampler.busy_s / max(elapsed, 1e-9), 4))
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+            result.update(baseline=self._baseline, snapshot=snapshot)
+            self._baseline = None
+        self.mode = None
+        return result
+
+
+# -------------------------
+# Output
+# -------------------------
+def render(result: Dict[str, Any], fmt: Optional[str] = None, sort: str = "cumulative",
+           limit: int = 50, group: str = "lineno") -> Tuple[bytes, str]:
+    """
+    (body, mimetype) of a session result.
+
+    cprofile: fmt "pstats" (text, sorted by `sort`, `limit` rows) or "raw" (pstats dump)
+    sample: fmt "collapsed" (one "stack count" line per distinct stack)
+    memory: fmt "diff" (top `limit` allocation sites by growth, grouped by `group`:
+            "lineno", "filename" or "traceback")
+    """
+    mode = result["mode"]
+    if mode == "cprofile":
+        stats = result["stats"]
+        if fmt == "raw":
+            return (marshal.dumps(stats.stats) if stats else b""), "application/octet-stream"
+        out = io.StringIO()
+        out.write(f"cProfile of {result['threads']} thread(s), {result['elapsed_s']} s\n")
+        if stats is not None:
+            stats.stream = out
+            stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue().encode(), "text/plain"
+
+    if mode == "sample":
+        lines = [f"{';'.join(stack)} {n}" for stack, n in result["stacks"].most_common()]
+        return ("\n".join(lines) + "\n").encode(), "text/plain"
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    diff = result["snapshot"].filter_traces(ignore).compare_to(result["baseline"].filter_traces(ignore), group)
+    out = io.StringIO()
+    total = sum(s.size_diff for s in diff)
+    out.write(f"tracemalloc diff over {result['elapsed_s']} s: {total / 1024:+.1f} KiB\n")
+    for stat in diff[:limit]:
+        out.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  {stat.traceback[0]}\n")
+        if group == "traceback":
+            for line in stat.traceback.format()[2:]:
+                out.write(f"        {line}\n")
+    return out.getvalue().encode(), "text/plain"
+
+
+PROFILER = Profiler()
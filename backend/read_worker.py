@@ -0,0 +1,132 @@
+"""
+read_worker.py
+
+Read-only API worker processes on top of the shared fleet state (shared_state.py).
+
+The owner (backend/app.py started with KVV_SHARED_STATE=<name>) runs the simulation
+and the full API. Every worker attaches to the shared memory block and the on-disk
+journal and serves:
+    /api/robot/read       same view function and response as the owner
+    /api/sim/heartbeat    ticks, date and time of the owner
+    /ready                200 while the owner publishes, 503 otherwise
+
+All workers listen on the same port (SO_REUSEPORT, the kernel spreads the
+connections); a reverse proxy sends the reads there and everything else to the owner.
+Without SO_REUSEPORT (Windows) worker i listens on port + i.
+
+Run:
+    KVV_SHARED_STATE=kvv-fleet flask --app backend/app.py run
+    python -m backend.read_worker --name kvv-fleet --workers 4 --port 5001
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import socket
+import time
+from datetime import datetime
+from typing import Optional
+
+from flask import Flask, g
+from flask_cors import CORS
+
+from backend.api import json_response
+from backend.api.robot import get_robot_status
+from backend.journal import JOURNAL_DIR
+from backend.shared_state import SHARED_STATE_NAME, SharedSimulation
+
+STALE_AFTER_S: float = 2.0  # /ready fails if the owner has not published for this long
+ATTACH_TIMEOUT_S: float = 60.0  # time a worker waits for the owner to create the block
+
+
+def create_app(view: SharedSimulation) -> Flask:
+    app = Flask(__name__)
+    CORS(app=app)
+
+    @app.before_request
+    def inject_view():
+        g.sim = view
+
+    @app.route("/api/sim/heartbeat", methods=["GET"])
+    def heartbeat():
+        h = view.header()
+        now = datetime.fromtimestamp(h["sim_time"])
+        return json_response({"ticks": h["ticks"], "date": now.strftime("%d.%m.%y"), "time": now.strftime("%H:%M"),
+                              "ready": bool(h["owner_ready"])}, 200)
+
+    @app.route("/ready", methods=["GET"])
+    def ready():
+        h = view.header()
+        age = time.time() - h["published_at"]
+        status = {"ready": age < STALE_AFTER_S, "owner_pid": h["owner_pid"], "robots": h["count"],
+                  "published_s_ago": round(age, 3)}
+        return json_response(status, 200 if status["ready"] else 503)
+
+    app.add_url_rule("/api/robot/read", view_func=get_robot_status, methods=["GET"])
+    return app
+
+
+def _listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    return sock
+
+
+def serve(name: str, host: str, port: int, journal_dir: Optional[str]) -> None:
+    """
+    Run one worker (threaded Werkzeug server) until it is stopped.
+    """
+    from werkzeug.serving import make_server
+
+    deadline = time.monotonic() + ATTACH_TIMEOUT_S
+    while True:
+        try:
+            view = SharedSimulation(name, journal_dir)
+            break
+        except FileNotFoundError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+    sock = _listen(host, port)
+    server = make_server(host, port, create_app(view), threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        view.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--name", default=SHARED_STATE_NAME or "kvv-fleet", help="shared memory block of the owner")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--journal-dir", default=JOURNAL_DIR, help="journal of the owner (messages)")
+    args = parser.parse_args()
+
+    shared_port = hasattr(socket, "SO_REUSEPORT")
+    workers = []
+    for i in range(max(1, args.workers)):
+        port = args.port if shared_port else args.port + i
+        proc = multiprocessing.Process(target=serve, args=(args.name, args.host, port, args.journal_dir),
+                                       name=f"read-worker-{i}")
+        proc.start()
+        workers.append(proc)
+    print(f"{len(workers)} read workers on {args.host}:{args.port}"
+          + ("" if shared_port else f"..{args.port + len(workers) - 1}") + f" (fleet state {args.name})")
+    try:
+        for proc in workers:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in workers:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
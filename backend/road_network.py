@@ -0,0 +1,647 @@
+"""
+road_network.py
+
+Road network as a sparse matrix for batched shortest path searches.
+
+The OSMnx graph is exported once into a CSR adjacency matrix (edge weight = length in
+meters, the shortest of parallel edges). Many-to-many distances are then computed with
+scipy.sparse.csgraph.dijkstra: one search per distinct origin gives the distances to all
+nodes at once, instead of one ox.shortest_path call per (origin, destination) pair.
+Large batches of origins are split over a long-lived pool of worker processes (spawn
+start method: the threaded server is never forked).
+
+Matrices are cached by the snapped origin / destination node sets, so asking for the
+same stations again is a dictionary lookup.
+
+Networks of several cities / regions are kept by a GraphCache under a byte budget
+(KVV_GRAPH_CACHE_MB). A downloaded network is also written to GRAPH_DIR
+(KVV_GRAPH_DIR) as .npz, so an evicted or restarted city is read back from disk
+instead of being downloaded and exported again.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:  # scipy is imported on first use (faster backend start)
+    import scipy.sparse as sp
+
+from backend.geodesy import segment_lengths_m
+from backend.metrics import METRICS
+from backend.stations import find_station, project_xy, station_coords
+
+CITY_DEFAULT: str = "Karlsruhe, Baden-Württemberg, Germany"
+
+ROBOT_SPEED_M_S: float = 5.0  # used to turn distances into durations
+MATRIX_CACHE_SIZE: int = 32
+# below this many distinct origins a single process is faster than starting workers
+PARALLEL_MIN_SOURCES: int = 64
+
+GRAPH_CACHE_BYTES: int = int(float(os.environ.get("KVV_GRAPH_CACHE_MB", "512")) * (1 << 20))
+GRAPH_DIR: str = os.environ.get("KVV_GRAPH_DIR", os.path.join(os.path.dirname(__file__), "graphs"))
+GRAPH_FILE_VERSION: int = 1
+
+Point = Tuple[str, float, float]  # (label, lat, lon)
+
+
+class UnknownPlaceError(ValueError):
+    """
+    OSM has nothing for the requested city or place (bad input).
+    """
+
+
+class RoadNetworkUnavailableError(OSError):
+    """
+    OSM could not be reached or answered with an error; asking again later may work.
+    """
+
+
+@contextmanager
+def _osm_request(subject: str) -> Iterator[None]:
+    """
+    Turn the failures of an OSMnx request into UnknownPlaceError /
+    RoadNetworkUnavailableError; everything else is raised unchanged.
+    """
+    from osmnx._errors import InsufficientResponseError, ResponseStatusCodeError
+
+    try:
+        yield
+    except ResponseStatusCodeError as e:  # a ValueError, but a server-side failure
+        raise RoadNetworkUnavailableError(f"OSM request for {subject} failed: {e}") from e
+    except InsufficientResponseError as e:
+        raise UnknownPlaceError(f"Nothing found for {subject}: {e}") from e
+    except OSError as e:  # connection errors (requests), cache-only mode
+        raise RoadNetworkUnavailableError(f"OSM request for {subject} failed: {e}") from e
+
+
+class RoadNetwork:
+    """
+    Directed road graph in CSR form plus a KD-tree of its nodes.
+
+    Args:
+        node_ids: OSM node id per node index.
+        lat, lon: Node coordinates.
+        adjacency: (n, n) CSR matrix with edge lengths in meters.
+    """
+
+    def __init__(self, node_ids: np.ndarray, lat: np.ndarray, lon: np.ndarray, adjacency: sp.csr_matrix):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.adjacency = adjacency.tocsr()
+        from scipy.spatial import cKDTree
+
+        self._tree = cKDTree(project_xy(self.lat, self.lon))
+        self._cache: "OrderedDict[Tuple[bytes, bytes], np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_graph(cls, G) -> "RoadNetwork":
+        """
+        Export a networkx (OSMnx) MultiDiGraph with node attributes x/y and edge
+        attribute length.
+        """
+        node_ids = np.fromiter(G.nodes, dtype=np.int64, count=G.number_of_nodes())
+        index = {n: i for i, n in enumerate(node_ids.tolist())}
+        lat = np.array([G.nodes[n]["y"] for n in node_ids.tolist()], dtype=np.float64)
+        lon = np.array([G.nodes[n]["x"] for n in node_ids.tolist()], dtype=np.float64)
+
+        m = G.number_of_edges()
+        u = np.empty(m, dtype=np.int64)
+        v = np.empty(m, dtype=np.int64)
+        w = np.empty(m, dtype=np.float64)
+        for k, (a, b, length) in enumerate(G.edges(data="length", default=0.0)):
+            u[k], v[k], w[k] = index[a], index[b], length
+        return cls(node_ids, lat, lon, _csr_min(u, v, w, len(node_ids)))
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self) -> int:
+        return self.adjacency.nnz
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory footprint (arrays, CSR matrix, KD-tree and cached matrices)."""
+        a = self.adjacency
+        tree = self._tree.data.nbytes + self._tree.indices.nbytes
+        with self._cache_lock:
+            cached = sum(m.nbytes for m in self._cache.values())
+        return (self.node_ids.nbytes + self.lat.nbytes + self.lon.nbytes
+                + a.data.nbytes + a.indices.nbytes + a.indptr.nbytes + tree + cached)
+
+    # -------------------------
+    # On-disk form
+    # -------------------------
+    def save(self, path: str) -> None:
+        """
+        Write the network as an uncompressed .npz (atomically: temp file + rename).
+        """
+        a = self.adjacency
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, version=np.int64(GRAPH_FILE_VERSION), node_ids=self.node_ids, lat=self.lat, lon=self.lon,
+                     indptr=a.indptr, indices=a.indices, data=a.data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "RoadNetwork":
+        """
+        Read a network written by save().
+
+        Raises:
+            ValueError: not a network file or written by another version.
+        """
+        import scipy.sparse as sp
+
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                if int(f["version"]) != GRAPH_FILE_VERSION:
+                    raise ValueError(f"{path}: graph file version {int(f['version'])}")
+                n = len(f["node_ids"])
+                adjacency = sp.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=(n, n))
+                return cls(f["node_ids"], f["lat"], f["lon"], adjacency)
+        except (KeyError, zipfile.BadZipFile) as e:
+            raise ValueError(f"{path}: not a road network file ({e})") from e
+
+    # -------------------------
+    # Snapping
+    # -------------------------
+    def nearest_nodes(self, lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest graph node per coordinate.
+
+        Returns:
+            (node indices, snap distances in meters)
+        """
+        d, i = self._tree.query(project_xy(lats, lons))
+        return np.atleast_1d(i).astype(np.int64), np.atleast_1d(d)
+
+    # -------------------------
+    # Searches
+    # -------------------------
+    def shortest_from(self, sources: Sequence[int], predecessors: bool = False):
+        """
+        One Dijkstra search per source node (node indices).
+
+        Returns:
+            (len(sources), n_nodes) distances, plus the predecessor matrix if requested
+            (-9999 = no predecessor).
+        """
+        from scipy.sparse.csgraph import dijkstra
+
+        with METRICS.timer("kvv_routing_seconds", kind="dijkstra"):
+            return dijkstra(self.adjacency, directed=True, indices=np.asarray(sources, dtype=np.int64),
+                            return_predecessors=predecessors)
+
+    def node_matrix(self, src: Sequence[int], dst: Sequence[int], workers: Optional[int] = None) -> np.ndarray:
+        """
+        Shortest path lengths (meters) between node indices, np.inf if unreachable.
+        Each distinct source is searched once; results are cached by (src, dst).
+        """
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        key = (src.tobytes(), dst.tobytes())
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+
+        sources, inverse = np.unique(src, return_inverse=True)
+        with METRICS.timer("kvv_routing_seconds", kind="matrix"):
+            rows = self._search_rows(sources, dst, workers)
+        out = rows[inverse]
+        out.setflags(write=False)
+
+        with self._cache_lock:
+            self._cache[key] = out
+            while len(self._cache) > MATRIX_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return out
+
+    def _search_rows(self, sources: np.ndarray, dst: np.ndarray, workers: Optional[int]) -> np.ndarray:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1 or len(sources) < PARALLEL_MIN_SOURCES:
+            return _rows(self.adjacency, sources, dst)
+        # the scipy search holds the GIL, so threads would not help: use processes
+        chunks = np.array_split(sources, workers)
+        futures = _submit_rows(self.adjacency, workers, chunks, dst)
+        try:
+            return np.vstack([f.result() for f in futures])
+        except BrokenProcessPool:
+            _drop_pool()
+            return _rows(self.adjacency, sources, dst)
+
+    def path(self, predecessors: np.ndarray, source: int, target: int) -> List[int]:
+        """
+        Node indices from source to target, using the predecessor row of source
+        returned by shortest_from(..., predecessors=True). Empty if target is unreachable.
+        """
+        if target != source and predecessors[target] < 0:
+            return []
+        out = [int(target)]
+        node = int(target)
+        while predecessors[node] >= 0:
+            node = int(predecessors[node])
+            out.append(node)
+        out.reverse()
+        return out
+
+    def coords(self, nodes: Sequence[int]) -> List[Tuple[float, float]]:
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return list(zip(self.lat[nodes].tolist(), self.lon[nodes].tolist()))
+
+    def route(self, start: Tuple[float, float], end: Tuple[float, float]) -> Tuple[List[Tuple[float, float]], float]:
+        """
+        Shortest route between the road nodes nearest to two (lat, lon) points.
+
+        Returns:
+            (node coordinates along the route, route length in meters)
+
+        Raises:
+            ValueError: the end cannot be reached from the start.
+        """
+        nodes, _ = self.nearest_nodes([start[0], end[0]], [start[1], end[1]])
+        source, target = int(nodes[0]), int(nodes[1])
+        dist, pred = self.shortest_from([source], predecessors=True)
+        path = self.path(pred[0], source, target)
+        if not path:
+            raise ValueError("No road route between start and end.")
+        return self.coords(path), float(dist[0, target])
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            cached = len(self._cache)
+        return {"nodes": self.n_nodes, "edges": self.n_edges, "bytes": self.nbytes, "cached_matrices": cached}
+
+
+def polyline_length_m(coords: Sequence[Tuple[float, float]]) -> float:
+    """
+    Great-circle length of a (lat, lon) polyline in meters.
+    """
+    return float(np.sum(segment_lengths_m(coords)))
+
+
+def _csr_min(u: np.ndarray, v: np.ndarray, w: np.ndarray, n: int) -> sp.csr_matrix:
+    """
+    CSR matrix keeping the shortest of parallel edges (csr_matrix would sum them).
+    Zero lengths are stored as a tiny positive value; scipy treats 0 as "no edge".
+    """
+    import scipy.sparse as sp
+
+    order = np.lexsort((w, v, u))
+    u, v, w = u[order], v[order], w[order]
+    first = np.ones(len(u), dtype=bool)
+    first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+    keep = first & (u != v)
+    w = np.maximum(w[keep], 1e-6)
+    return sp.csr_matrix((w, (u[keep], v[keep])), shape=(n, n))
+
+
+def _rows(adjacency: sp.csr_matrix, sources: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    from scipy.sparse.csgraph import dijkstra
+
+    dist = dijkstra(adjacency, directed=True, indices=sources)
+    return np.ascontiguousarray(np.atleast_2d(dist)[:, dst])
+
+
+_worker_adjacency: Optional[sp.csr_matrix] = None
+
+# (adjacency the workers hold, worker count, pool)
+_pool: Optional[Tuple[Any, int, ProcessPoolExecutor]] = None
+_pool_lock = threading.Lock()
+
+
+def _submit_rows(adjacency: sp.csr_matrix, workers: int, chunks: List[np.ndarray], dst: np.ndarray) -> list:
+    """
+    Submit one search per chunk to the worker pool. The workers get the CSR matrix once
+    through the pool initializer; a search on another network (or with another worker
+    count) replaces the pool. Submitting under the lock keeps a replaced pool from
+    being shut down before its searches are queued (queued searches still finish).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[0] is not adjacency or _pool[1] != workers:
+            if _pool is not None:
+                _pool[2].shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(adjacency,))
+            _pool = (adjacency, workers, pool)
+        return [_pool[2].submit(_worker_rows, chunk, dst) for chunk in chunks]
+
+
+def _drop_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool[2].shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(_drop_pool)
+
+
+def _init_worker(adjacency: sp.csr_matrix) -> None:
+    global _worker_adjacency
+    _worker_adjacency = adjacency
+
+
+def _worker_rows(sources: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    return _rows(_worker_adjacency, sources, dst)
+
+
+# -------------------------
+# Graph cache (several cities / regions)
+# -------------------------
+def download_road_network(city: str) -> RoadNetwork:
+    """
+    Drive network of a city, downloaded with OSMnx and exported to CSR form.
+
+    Raises:
+        UnknownPlaceError: OSM has no drive network for city.
+        RoadNetworkUnavailableError: the download failed.
+    """
+    import osmnx as ox
+
+    with METRICS.timer("kvv_graph_load_seconds", source="road_network"):
+        with _osm_request(repr(city)):
+            graph = ox.graph_from_place(city, network_type="drive")
+        return RoadNetwork.from_graph(graph)
+
+
+def geocode(place: str) -> Tuple[float, float]:
+    """
+    (lat, lon) of a place name, geocoded with OSMnx (errors as in download_road_network).
+    """
+    import osmnx as ox
+
+    with METRICS.timer("kvv_geocode_seconds"), _osm_request(repr(place)):
+        return ox.geocode(place)
+
+
+def city_key(city: str) -> str:
+    """Cache key of a city name (case and whitespace do not matter)."""
+    return " ".join(str(city).split()).casefold()
+
+
+class _PendingLoad:
+    """
+    A load in progress; requests for the same city wait for it instead of loading again.
+    """
+    __slots__ = ("done", "network", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.network: Optional[RoadNetwork] = None
+        self.error: Optional[BaseException] = None
+
+
+class GraphCache:
+    """
+    Road networks of several cities in memory under a byte budget.
+
+    get(city) returns the cached network and marks it as most recently used. A city
+    that is not in memory is read from its on-disk form (written after the first
+    download) or downloaded. Concurrent requests for a city that is being loaded wait
+    for that one load. Networks are dropped in least recently used order while the
+    measured footprint (RoadNetwork.nbytes, cached distance matrices included) exceeds
+    the budget; the most recently used network always stays, even if it alone is larger.
+
+    Args:
+        budget_bytes: Memory budget of all cached networks.
+        directory: Directory of the on-disk networks (None: no files).
+        loader: city -> RoadNetwork for cities without a file (default: OSMnx download).
+    """
+
+    def __init__(self, budget_bytes: int = GRAPH_CACHE_BYTES, directory: Optional[str] = GRAPH_DIR,
+                 loader: Callable[[str], RoadNetwork] = download_road_network):
+        self.budget_bytes = int(budget_bytes)
+        self.directory = directory
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._networks: "OrderedDict[str, RoadNetwork]" = OrderedDict()  # LRU first
+        self._names: Dict[str, str] = {}  # key -> city name as first requested
+        self._loading: Dict[str, _PendingLoad] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.disk_loads = 0
+        self.downloads = 0
+        self.evictions = 0
+
+    def path(self, city: str) -> Optional[str]:
+        """On-disk form of a city's network (a readable slug plus a hash of the key)."""
+        if self.directory is None:
+            return None
+        key = city_key(city)
+        slug = re.sub(r"[^a-z0-9]+", "-", key).strip("-")[:48] or "city"
+        return os.path.join(self.directory, f"{slug}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]}.npz")
+
+    def get(self, city: str = CITY_DEFAULT) -> RoadNetwork:
+        key = city_key(city)
+        with self._lock:
+            network = self._networks.get(key)
+            if network is not None:
+                self._networks.move_to_end(key)
+                self.hits += 1
+                self._evict()
+                return network
+            pending = self._loading.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._loading[key] = _PendingLoad()
+                self._names.setdefault(key, city)
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.network
+
+        try:
+            pending.network = self._load(city)
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._loading[key]
+                if pending.network is not None:
+                    self._networks[key] = pending.network
+                    self._evict()
+                else:
+                    self._names.pop(key, None)
+            pending.done.set()
+        return pending.network
+
+    def _load(self, city: str) -> RoadNetwork:
+        path = self.path(city)
+        if path is not None and os.path.isfile(path):
+            try:
+                with METRICS.timer("kvv_graph_load_seconds", source="graph_file"):
+                    network = RoadNetwork.load(path)
+                self.disk_loads += 1
+                return network
+            except (OSError, ValueError):
+                pass  # unreadable or outdated file: download again and overwrite it
+        network = self.loader(city)
+        self.downloads += 1
+        if path is not None:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                network.save(path)
+            except OSError:
+                pass  # the network is still served from memory
+        return network
+
+    def _evict(self) -> None:
+        """Drop least recently used networks until the budget holds (lock must be held)."""
+        sizes = {key: network.nbytes for key, network in self._networks.items()}
+        total = sum(sizes.values())
+        while total > self.budget_bytes and len(self._networks) > 1:
+            key, _ = self._networks.popitem(last=False)
+            self._names.pop(key, None)
+            total -= sizes[key]
+            self.evictions += 1
+
+    def __contains__(self, city: str) -> bool:
+        return city_key(city) in self._networks
+
+    def clear(self) -> None:
+        with self._lock:
+            self._networks.clear()
+            self._names.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            networks = [(self._names.get(key, key), network) for key, network in self._networks.items()]
+            loading = [self._names.get(key, key) for key in self._loading]
+        cities = [{"city": name, "nodes": n.n_nodes, "edges": n.n_edges, "bytes": n.nbytes} for name, n in networks]
+        return {
+            "budget_bytes": self.budget_bytes,
+            "bytes": sum(c["bytes"] for c in cities),
+            "cities": cities,  # least recently used first
+            "loading": loading,
+            "directory": self.directory,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "disk_loads": self.disk_loads,
+            "downloads": self.downloads,
+            "evictions": self.evictions,
+        }
+
+
+GRAPHS = GraphCache()
+
+
+def load_road_network(city: str = CITY_DEFAULT) -> RoadNetwork:
+    """
+    Drive network of a city from the graph cache (memory, then disk, then OSMnx).
+    Raises UnknownPlaceError / RoadNetworkUnavailableError (see download_road_network).
+    """
+    return GRAPHS.get(city)
+
+
+# -------------------------
+# Distance matrices between stations / coordinates
+# -------------------------
+def resolve_points(items: Sequence[Any]) -> List[Point]:
+    """
+    Turn KVV stations (name, triasName or triasID) and [lat, lon] pairs into
+    (label, lat, lon).
+
+    Raises:
+        ValueError: unknown station or malformed coordinate.
+    """
+    out: List[Point] = []
+    for item in items:
+        if isinstance(item, str):
+            station = find_station(item)
+            if station is None:
+                raise ValueError(f"Unknown station: {item}")
+            lat, lon = station_coords(station)
+            out.append((station["triasID"], lat, lon))
+        else:
+            try:
+                lat, lon = (float(x) for x in item)
+            except (TypeError, ValueError):
+                raise ValueError(f"Expected a station or [lat, lon], got {item!r}") from None
+            out.append((f"{lat:.6f},{lon:.6f}", lat, lon))
+    return out
+
+
+@dataclass
+class DistanceMatrix:
+    """
+    Result of distance_matrix(). distances_m[i][j] is the road distance from origin i
+    to destination j including the walk to / from the nearest road node (None if
+    unreachable).
+    """
+
+    origins: List[str]
+    destinations: List[str]
+    distances_m: np.ndarray
+    speed_m_s: float = ROBOT_SPEED_M_S
+
+    @property
+    def durations_s(self) -> np.ndarray:
+        return self.distances_m / self.speed_m_s
+
+    def to_dict(self) -> Dict[str, Any]:
+        def rows(m: np.ndarray, digits: int) -> List[List[Optional[float]]]:
+            return [[round(x, digits) if x != float("inf") else None for x in row] for row in m.tolist()]
+
+        return {
+            "origins": self.origins,
+            "destinations": self.destinations,
+            "distances_m": rows(self.distances_m, 1),
+            "durations_s": rows(self.durations_s, 1),
+            "speed_m_s": self.speed_m_s,
+        }
+
+
+def distance_matrix(
+    origins: Sequence[Any],
+    destinations: Optional[Sequence[Any]] = None,
+    network: Optional[RoadNetwork] = None,
+    speed_m_s: float = ROBOT_SPEED_M_S,
+) -> DistanceMatrix:
+    """
+    Many-to-many road distances between stations and/or coordinates.
+
+    Args:
+        origins: Stations or [lat, lon] pairs (see resolve_points).
+        destinations: Same; defaults to the origins.
+        network: Road network; defaults to load_road_network().
+    """
+    src = resolve_points(origins)
+    dst = src if destinations is None else resolve_points(destinations)
+    net = network or load_road_network()
+
+    src_nodes, src_snap = net.nearest_nodes([p[1] for p in src], [p[2] for p in src])
+    dst_nodes, dst_snap = net.nearest_nodes([p[1] for p in dst], [p[2] for p in dst])
+    dist = net.node_matrix(src_nodes, dst_nodes) + src_snap[:, None] + dst_snap[None, :]
+    return DistanceMatrix([p[0] for p in src], [p[0] for p in dst], dist, speed_m_s)
@@ -8,12 +8,38 @@ It stores current state, packages, and (important for map simulation):
 - messages: event log (for /api/robot/read polling)
 
 This file is intentionally simple and "student readable".
+
+Memory layout (large fleets):
+- Robot is a slotted dataclass (no per-instance __dict__).
+- Robots share a small pool of reentrant locks instead of one lock each.
+- The package list and the message log are allocated on first use; until then
+  they point to the shared empty tuple.
+- Event names are interned, so all messages share one string per event type.
+
+Message journal:
+- set_message_sink() installs a callable that receives every new message
+  (the simulation uses it to feed the on-disk journal, see journal.py).
+
+Change tracking:
+- track_changes() returns a ChangeSet that collects the ids of robots whose state
+  changed (cold fields, progress, position, new messages). Its consumer drains it
+  with pop(): the shared fleet state (shared_state.py) and the persistent store
+  (storage.py) only write these robots.
+
+Serialization:
+- to_dict() is split into a "cold" section (flags, battery, packages, ...) and a
+  "hot" section (progress, position).
+- Every change of a cold field bumps _version. The cold section is cached together
+  with its JSON encoding and only rebuilt when the version changed, so polling an
+  idle robot does not re-serialize its packages.
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import json
+import sys
 import threading
 import time
 
@@ -24,12 +50,95 @@ MAX_NUM_OF_PACKAGES: int = 8
 MAX_NUM_OF_LARGE_PACKAGES: int = 2
 MAX_NUM_OF_SMALL_PACKAGES: int = 6
 
+# shared "no packages / no messages yet" placeholder
+_EMPTY: tuple = ()
+
+# lock striping: robot i uses _LOCKS[i % len(_LOCKS)]. The locks are reentrant, so a
+# robot method (or the message sink it calls) may use a robot on the same stripe again.
+# Code that needs several robots at once must take their stripes in ascending order.
+_LOCKS: Tuple[threading.RLock, ...] = tuple(threading.RLock() for _ in range(64))
+
+
+# receives every message created by add_message() (or None)
+_message_sink: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+def set_message_sink(sink: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+    """
+    Install the callable that receives every new robot message. It is called while the
+    robot lock is held, so it must be cheap (e.g. a deque append).
+    """
+    global _message_sink
+    _message_sink = sink
+
+
+def clear_message_sink(sink: Callable[[Dict[str, Any]], None]) -> None:
+    """
+    Remove sink unless another sink has replaced it in the meantime.
+    """
+    global _message_sink
+    if _message_sink is sink:
+        _message_sink = None
+
+
+# fields that are part of the cached (cold) serialization
+_COLD_FIELDS = frozenset({
+    "robot_id", "is_parked", "is_door_opened", "is_reversing", "is_charging",
+    "battery_status", "message", "led_rgb", "_packages",
+})
+
+# fields that change what to_json() / get_messages_since() return
+_TRACKED_FIELDS = _COLD_FIELDS | {"progress", "position", "_last_message_id", "_version"}
+
+class ChangeSet:
+    """
+    Ids of the objects that changed since the last pop(). Producers only add to a set
+    and set.pop() is atomic, so neither side waits; an id that changes again while it
+    is being consumed is simply returned by the next pop().
+    """
+    __slots__ = ("ids",)
+
+    def __init__(self) -> None:
+        self.ids: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def pop(self, limit: int = 1 << 30) -> List[int]:
+        """Remove and return up to `limit` ids."""
+        ids, out = self.ids, []
+        try:
+            while len(out) < limit:
+                out.append(ids.pop())
+        except KeyError:
+            pass
+        return out
+
+
+# id sets of the active change sets (replaced, never mutated, so readers need no lock)
+_trackers: Tuple[Set[int], ...] = ()
+
+
+def track_changes() -> ChangeSet:
+    """
+    Start collecting the ids of changed robots into a new ChangeSet.
+    """
+    global _trackers
+    changes = ChangeSet()
+    _trackers = _trackers + (changes.ids,)
+    return changes
+
+
+def untrack_changes(changes: ChangeSet) -> None:
+    global _trackers
+    _trackers = tuple(ids for ids in _trackers if ids is not changes.ids)
+
 
 def _clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
 
 
-@dataclass
+@dataclass(slots=True)
 class Robot:
     """
     Robot model for the simulation.
@@ -54,13 +163,53 @@ class Robot:
     # Simulation state for route driving
     progress: float = 0.0
     position: Optional[Tuple[float, float]] = None  # (lat, lon)
+    _odometer_m: float = field(default=0.0, repr=False)  # total meters driven
 
-    _packages: List[Package] = field(default_factory=list, repr=False)
+    _packages: List[Package] = field(default=_EMPTY, repr=False)
+    # size counters, kept in sync with _packages
+    _num_large: int = field(default=0, repr=False)
+    _num_small: int = field(default=0, repr=False)
 
     # Message log for polling (thread-safe)
-    _messages: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+    _messages: List[Dict[str, Any]] = field(default=_EMPTY, repr=False)
     _last_message_id: int = field(default=0, repr=False)
-    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    # Serialization cache: (version, cold dict, cold JSON without closing brace)
+    _version: int = field(default=0, repr=False)
+    _cold: Optional[Tuple[int, Dict[str, Any], str]] = field(default=None, repr=False)
+
+    @property
+    def _lock(self) -> threading.RLock:
+        return _LOCKS[hash(self.robot_id) % len(_LOCKS)]
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        if name in _COLD_FIELDS:
+            object.__setattr__(self, "_version", getattr(self, "_version", 0) + 1)
+        if _trackers and name in _TRACKED_FIELDS:
+            for ids in _trackers:
+                ids.add(self.robot_id)
+
+    def _touch(self) -> None:
+        """Mark the cold section as changed (for in-place mutations)."""
+        self._version += 1
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Robot":
+        """
+        Build a robot from stored field values (e.g. a snapshot) without running the
+        per-field __setattr__ hook. Missing fields get their defaults.
+        """
+        robot = cls.__new__(cls)
+        setter = object.__setattr__
+        for name, default in _FIELD_DEFAULTS:
+            setter(robot, name, state.get(name, default))
+        return robot
+
+    @property
+    def version(self) -> int:
+        """Changes whenever the cold part of to_dict() changes."""
+        return self._version
 
     # -------------------------
     # Packages
@@ -74,33 +223,83 @@ class Robot:
         if not isinstance(val, list) or not all(isinstance(p, Package) for p in val):
             raise TypeError("packages must be a list[Package].")
         self._validate_package_constraints(val)
-        self._packages = list(val)
+        with self._lock:
+            # counters first: assigning _packages bumps the version
+            self._num_large = sum(1 for p in val if p.size == PackageSize.LARGE)
+            self._num_small = sum(1 for p in val if p.size == PackageSize.SMALL)
+            self._packages = list(val) if val else _EMPTY
+
+    def add_package(self, pkg: Package) -> None:
+        """Add a single package. Raises ValueError if the robot would be overloaded."""
+        if not isinstance(pkg, Package):
+            raise TypeError("pkg must be a Package.")
+        with self._lock:
+            large = self._num_large + (pkg.size == PackageSize.LARGE)
+            small = self._num_small + (pkg.size == PackageSize.SMALL)
+            self._check_counts(len(self._packages) + 1, large, small)
+            # counters first: the version bump below must cover them
+            self._num_large = large
+            self._num_small = small
+            if self._packages:
+                self._packages.append(pkg)
+                self._touch()
+            else:
+                self._packages = [pkg]
+
+    def remove_packages(self, package_ids) -> List[Package]:
+        """Remove all packages whose package_id is in package_ids and return them."""
+        with self._lock:
+            removed = [p for p in self._packages if p.package_id in package_ids]
+            if removed:
+                self._num_large -= sum(1 for p in removed if p.size == PackageSize.LARGE)
+                self._num_small -= sum(1 for p in removed if p.size == PackageSize.SMALL)
+                self._packages = [p for p in self._packages if p.package_id not in package_ids] or _EMPTY
+            return removed
+
+    def free_capacity(self) -> Tuple[int, int, int]:
+        """Return how many (packages, large packages, small packages) can still be added."""
+        return (
+            max(0, MAX_NUM_OF_PACKAGES - len(self._packages)),
+            max(0, MAX_NUM_OF_LARGE_PACKAGES - self._num_large),
+            max(0, MAX_NUM_OF_SMALL_PACKAGES - self._num_small),
+        )
 
     def count_large_packages(self) -> int:
-        return sum(1 for p in self._packages if getattr(p, "size", None) == PackageSize.LARGE)
+        return self._num_large
 
     def count_small_packages(self) -> int:
-        return sum(1 for p in self._packages if getattr(p, "size", None) == PackageSize.SMALL)
+        return self._num_small
 
     @staticmethod
-    def _validate_package_constraints(pkgs: List[Package]) -> None:
-        if len(pkgs) > MAX_NUM_OF_PACKAGES:
+    def _check_counts(total: int, large: int, small: int) -> None:
+        if total > MAX_NUM_OF_PACKAGES:
             raise ValueError(f"Too many packages: max {MAX_NUM_OF_PACKAGES}.")
-
-        large = sum(1 for p in pkgs if getattr(p, "size", None) == PackageSize.LARGE)
-        small = sum(1 for p in pkgs if getattr(p, "size", None) == PackageSize.SMALL)
-
         if large > MAX_NUM_OF_LARGE_PACKAGES:
             raise ValueError(f"Too many large packages: max {MAX_NUM_OF_LARGE_PACKAGES}.")
         if small > MAX_NUM_OF_SMALL_PACKAGES:
             raise ValueError(f"Too many small packages: max {MAX_NUM_OF_SMALL_PACKAGES}.")
 
+    @staticmethod
+    def _validate_package_constraints(pkgs: List[Package]) -> None:
+        large = sum(1 for p in pkgs if getattr(p, "size", None) == PackageSize.LARGE)
+        small = sum(1 for p in pkgs if getattr(p, "size", None) == PackageSize.SMALL)
+        Robot._check_counts(len(pkgs), large, small)
+
     # -------------------------
     # Simulation helpers
     # -------------------------
     def set_battery(self, value: float) -> None:
         self.battery_status = float(_clamp(float(value), 0.0, 100.0))
 
+    @property
+    def odometer_m(self) -> float:
+        return self._odometer_m
+
+    def add_distance(self, meters: float) -> None:
+        """Advance the odometer (used by the energy model)."""
+        if meters > 0:
+            self._odometer_m += float(meters)
+
     def set_progress_position(self, progress: float, lat: float, lon: float) -> None:
         """Thread-safe update of progress/position."""
         with self._lock:
@@ -111,6 +310,12 @@ class Robot:
             self.progress = progress
             self.position = (float(lat), float(lon))
 
+    def reset_progress(self, lat: float, lon: float) -> None:
+        """Start a new route: progress back to 0 at the given position."""
+        with self._lock:
+            self.progress = 0.0
+            self.position = (float(lat), float(lon))
+
     def add_message(self, event: str, text: str, progress: float) -> int:
         """Append a message event and return its id."""
         with self._lock:
@@ -118,12 +323,18 @@ class Robot:
             msg = {
                 "id": self._last_message_id,
                 "robot_id": self.robot_id,
-                "event": str(event),
+                "event": sys.intern(str(event)),
                 "text": str(text),
                 "progress": float(_clamp(float(progress), 0.0, 1.0)),
                 "ts": time.time(),
             }
-            self._messages.append(msg)
+            if self._messages:
+                self._messages.append(msg)
+            else:
+                self._messages = [msg]
+            sink = _message_sink
+            if sink is not None:
+                sink(msg)
             return self._last_message_id
 
     def get_messages_since(self, since_message_id: int) -> Tuple[int, List[Dict[str, Any]]]:
@@ -135,29 +346,32 @@ class Robot:
             out = [m for m in self._messages if int(m.get("id", 0)) > since_message_id]
             return last_id, out
 
-    # -------------------------
-    # API serialization
-    # -------------------------
-    def to_dict(self) -> Dict[str, Any]:
-        # packages serialization (simple)
-        pkg_list: List[Any] = []
-        for p in self._packages:
-            if hasattr(p, "to_dict") and callable(getattr(p, "to_dict")):
-                pkg_list.append(p.to_dict())
-            else:
-                pkg_list.append(
-                    {
-                        "size": str(getattr(p, "size", "")),
-                        "start": getattr(p, "start", None),
-                        "destination": getattr(p, "destination", None),
-                    }
-                )
+    @property
+    def message_count(self) -> int:
+        """Number of messages kept in memory."""
+        return len(self._messages)
 
+    def trim_messages(self, keep: int) -> int:
+        """Drop all but the newest `keep` messages. Returns the number of dropped messages."""
         with self._lock:
-            pos = self.position
-            prog = float(self.progress)
+            drop = len(self._messages) - max(0, int(keep))
+            if drop <= 0:
+                return 0
+            self._messages = self._messages[drop:] or _EMPTY
+            return drop
 
-        return {
+    # -------------------------
+    # API serialization
+    # -------------------------
+    def _cold_section(self) -> Tuple[Dict[str, Any], str]:
+        """Return the cached cold section, rebuilding it if the robot changed."""
+        cold = self._cold
+        version = self._version
+        if cold is not None and cold[0] == version:
+            return cold[1], cold[2]
+
+        pkgs = self._packages
+        data = {
             "robot_id": self.robot_id,
             "is_parked": self.is_parked,
             "is_door_opened": self.is_door_opened,
@@ -166,10 +380,58 @@ class Robot:
             "battery_status": self.battery_status,
             "message": self.message,
             "led_rgb": self.led_rgb,
-            "packages": pkg_list,
-            "package_count": len(self._packages),
-            "package_count_large": self.count_large_packages(),
-            "package_count_small": self.count_small_packages(),
-            "progress": prog,
-            "position": pos,  # (lat, lon) or None
+            "packages": [p.to_dict() for p in pkgs],
+            "package_count": len(pkgs),
+            "package_count_large": self._num_large,
+            "package_count_small": self._num_small,
+            "version": version,
         }
+        encoded = json.dumps(data, separators=(",", ":"))[:-1]
+        # a concurrent mutation bumps _version again, so a stale entry is never reused
+        object.__setattr__(self, "_cold", (version, data, encoded))
+        return data, encoded
+
+    def hot_dict(self) -> Dict[str, Any]:
+        """Cheap part of the status: progress and position only."""
+        with self._lock:
+            pos = self.position
+            prog = float(self.progress)
+        return {"robot_id": self.robot_id, "progress": prog, "position": pos}
+
+    def to_dict(self) -> Dict[str, Any]:
+        data, _ = self._cold_section()
+        with self._lock:
+            pos = self.position
+            prog = float(self.progress)
+
+        # the cached section backs to_json() too: callers get their own package dicts
+        out = dict(data)
+        out["packages"] = [dict(p) for p in data["packages"]]
+        out["progress"] = prog
+        out["position"] = pos  # (lat, lon) or None
+        return out
+
+    def export_state(self) -> Tuple[int, str, float, Optional[Tuple[float, float]], int]:
+        """
+        (version, cold JSON without the closing brace, progress, position, last message id),
+        the parts of to_json() and get_messages_since() kept in the shared fleet state.
+        The version is the one the cold JSON was built from.
+        """
+        self._cold_section()
+        version, _, encoded = self._cold
+        with self._lock:
+            return version, encoded, float(self.progress), self.position, self._last_message_id
+
+    def to_json(self) -> str:
+        """Same content as to_dict(), already JSON encoded."""
+        _, encoded = self._cold_section()
+        with self._lock:
+            pos = self.position
+            prog = float(self.progress)
+        pos_json = "null" if pos is None else f"[{pos[0]!r},{pos[1]!r}]"
+        return f'{encoded},"progress":{prog!r},"position":{pos_json}}}'
+
+
+_FIELD_DEFAULTS: Tuple[Tuple[str, Any], ...] = tuple(
+    (f.name, f.default) for f in fields(Robot) if f.name != "robot_id"
+) + (("robot_id", 0),)
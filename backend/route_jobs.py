@@ -0,0 +1,236 @@
+"""
+route_jobs.py
+
+Lifecycle of route jobs (see Simulation.start_route_job).
+
+Every job has an explicit state:
+
+    RUNNING <-> PAUSED
+       |           |
+       v           v
+    FINISHED    CANCELLED  (reason: "cancelled", "rerouted", "replaced", "reset")
+
+The job thread polls its cancellation token and pause flag in every update, so
+cancel / pause / resume take effect within one frame (50 ms). A robot has at most one
+active job: starting a new job for it cancels the old one ("replaced") and waits for
+the old thread to stop.
+
+Finished and cancelled jobs are reaped right away: the manager forgets the thread and
+keeps only a small summary in a bounded history.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+HISTORY_SIZE: int = 200
+
+
+class JobState(Enum):
+    """
+    State of a route job.
+    """
+    RUNNING = "running"
+    PAUSED = "paused"
+    FINISHED = "finished"
+    CANCELLED = "cancelled"
+
+
+class RouteJob:
+    """
+    One route job: its route data, state and control flags.
+    """
+
+    def __init__(self, route_id: int, robot_id: int, coords: List[Tuple[float, float]], duration_s: float,
+                 route_color: str, destination: Optional[str], dwell_s: float, total_m: float,
+                 stops: List[Dict[str, Any]], drops: Optional[List[str]] = None):
+        self.route_id = route_id
+        self.robot_id = robot_id
+        self.coords = list(coords)
+        self.duration_s = duration_s
+        self.route_color = route_color
+        self.destination = destination
+        self.dwell_s = dwell_s
+        self.total_m = total_m
+        self.stops = stops
+        self.drops = list(drops or [])  # station triasIDs where packages are unloaded
+        # same geometry = same track; the conflict detector uses it where the robot is
+        # not between two stations (there the station pair is the track, see conflicts.py)
+        self.track = hash(tuple(self.coords))
+
+        self.state = JobState.RUNNING
+        self.reason: Optional[str] = None
+        self.created_ts = time.time()
+        self.ended_ts: Optional[float] = None
+        self.progress = 0.0  # last progress reported by the job thread
+        self.thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+
+    # -------------------------
+    # Control (called from API threads)
+    # -------------------------
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def paused(self) -> bool:
+        return self.state == JobState.PAUSED
+
+    @property
+    def active(self) -> bool:
+        return self.state in (JobState.RUNNING, JobState.PAUSED)
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        if not self.active or self.cancelled:
+            return False
+        self.reason = reason
+        self._cancel.set()
+        return True
+
+    def pause(self) -> bool:
+        if self.state != JobState.RUNNING or self.cancelled:
+            return False
+        self.state = JobState.PAUSED
+        return True
+
+    def resume(self) -> bool:
+        if self.state != JobState.PAUSED or self.cancelled:
+            return False
+        self.state = JobState.RUNNING
+        return True
+
+    def join(self, timeout: float = 1.0) -> None:
+        t = self.thread
+        if t is not None and t is not threading.current_thread():
+            t.join(timeout)
+
+    # -------------------------
+    # Serialization
+    # -------------------------
+    def descriptor(self) -> Dict[str, Any]:
+        """Everything needed to restart the job (used for snapshots and conflict detection)."""
+        return {
+            "route_id": self.route_id,
+            "robot_id": self.robot_id,
+            "coords": self.coords,
+            "duration_s": self.duration_s,
+            "route_color": self.route_color,
+            "destination": self.destination,
+            "dwell_s": self.dwell_s,
+            "track": self.track,
+            "total_m": self.total_m,
+            "stops": self.stops,
+            "drops": self.drops,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "route_id": self.route_id,
+            "robot_id": self.robot_id,
+            "state": self.state.value,
+            "reason": self.reason,
+            "progress": round(self.progress, 4),
+            "destination": self.destination,
+            "duration_s": self.duration_s,
+            "dwell_s": self.dwell_s,
+            "total_m": round(self.total_m, 1),
+            "stops": [s["name"] for s in self.stops],
+            "created_ts": self.created_ts,
+            "ended_ts": self.ended_ts,
+        }
+
+
+class JobManager:
+    """
+    Registry of the active jobs (one per robot) plus a bounded history of ended jobs.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._active: Dict[int, RouteJob] = {}
+        self._by_robot: Dict[int, RouteJob] = {}
+        self._history: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._history_size = history_size
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def add(self, job: RouteJob) -> Optional[RouteJob]:
+        """
+        Register a new job. An active job of the same robot is cancelled ("replaced")
+        and returned; the caller should join() it before the new job starts moving.
+        """
+        with self._lock:
+            old = self._by_robot.get(job.robot_id)
+            self._active[job.route_id] = job
+            self._by_robot[job.robot_id] = job
+        if old is not None:
+            old.cancel("replaced")
+        return old
+
+    def end(self, job: RouteJob) -> None:
+        """
+        Called by the job thread when it stops: reap the job.
+        """
+        job.state = JobState.CANCELLED if job.cancelled else JobState.FINISHED
+        job.ended_ts = time.time()
+        job.thread = None
+        with self._lock:
+            self._active.pop(job.route_id, None)
+            if self._by_robot.get(job.robot_id) is job:
+                del self._by_robot[job.robot_id]
+            self._history[job.route_id] = job.to_dict()
+            while len(self._history) > self._history_size:
+                self._history.popitem(last=False)
+
+    def get(self, route_id: int) -> Optional[RouteJob]:
+        with self._lock:
+            return self._active.get(route_id)
+
+    def for_robot(self, robot_id: int) -> Optional[RouteJob]:
+        with self._lock:
+            return self._by_robot.get(robot_id)
+
+    def active(self) -> List[RouteJob]:
+        with self._lock:
+            return list(self._active.values())
+
+    def info(self, route_id: int) -> Optional[Dict[str, Any]]:
+        """Summary of an active or recently ended job."""
+        with self._lock:
+            job = self._active.get(route_id)
+            if job is not None:
+                return job.to_dict()
+            return self._history.get(route_id)
+
+    def list(self, include_ended: bool = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            out = [job.to_dict() for job in self._active.values()]
+            if include_ended:
+                out.extend(self._history.values())
+        return sorted(out, key=lambda j: j["route_id"])
+
+    def cancel_all(self, reason: str = "reset", wait: bool = True) -> None:
+        jobs = self.active()
+        for job in jobs:
+            job.cancel(reason)
+        if wait:
+            for job in jobs:
+                job.join()
+
+    def clear_history(self) -> None:
+        with self._lock:
+            self._history.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"active": len(self._active), "history": len(self._history),
+                    "threads": sum(1 for j in self._active.values() if j.thread is not None)}
@@ -0,0 +1,502 @@
+"""
+shared_state.py
+
+Robot state in shared memory, for read-only API workers in other processes.
+
+The simulation lives in one process (the owner, backend/app.py), so more server workers
+would each get their own fleet. With KVV_SHARED_STATE=<name> the owner publishes the
+state of every robot into a multiprocessing.shared_memory block of that name and any
+number of worker processes (read_worker.py) serve /api/robot/read from it without a
+round trip to the owner; reads scale with the number of worker processes instead of
+sharing one GIL.
+
+Layout (fixed, numpy structured arrays over the block):
+    header        HEADER_DTYPE at offset 0: capacity, published robot count, clock,
+                  journal position, owner pid, ...
+    rows          ROW_DTYPE x capacity at HEADER_BYTES: per robot the cold JSON of
+                  Robot.to_json() (COLD_BYTES), its version, progress, position and the
+                  last message id
+
+Consistency: the header and every row carry a sequence counter (seqlock). The single
+writer makes it odd, writes the fields and makes it even again; a reader copies the
+row and retries while the counter is odd or changed in between. Readers never block
+the owner. (The stores are plain numpy stores, ordered on x86-64; the owner is the
+only writer.)
+
+Publishing: the owner tracks which robots changed (robot.track_changes) and a
+publisher thread copies only those every PUBLISH_INTERVAL_S, in batches of
+PUBLISH_BATCH rows. A reset / restore replaces the fleet and republishes every robot.
+The journal is flushed before a round is published, so every message up to a row's
+last message id can be read from the on-disk journal by the workers.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.metrics import METRICS
+from backend.robot import track_changes, untrack_changes
+from backend.systems import MAX_MESSAGES_PER_ROBOT
+from backend.warmup import WARMUP
+
+SHARED_STATE_NAME: str = os.environ.get("KVV_SHARED_STATE", "")
+SHARED_CAPACITY: int = int(os.environ.get("KVV_SHARED_CAPACITY", "16384"))
+PUBLISH_INTERVAL_S: float = 0.02
+PUBLISH_BATCH: int = 256  # rows per seqlock window
+READ_TIMEOUT_S: float = 0.1  # a reader gives up if a row stays locked this long
+
+MAGIC: int = 0x4B56564649454554  # "KVVFLEET"
+LAYOUT_VERSION: int = 1
+HEADER_BYTES: int = 256
+COLD_BYTES: int = 2048  # 8 packages with the longest station names need ~1.6 KiB
+
+HEADER_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("magic", "<u8"),
+    ("layout", "<u4"),
+    ("cold_bytes", "<u4"),
+    ("capacity", "<i8"),
+    ("count", "<i8"),             # robots published (rows 0..count-1 are valid)
+    ("generation", "<u8"),        # bumped when the fleet was replaced (reset / restore)
+    ("ticks", "<i8"),
+    ("sim_time", "<f8"),          # simulation date and time (unix timestamp)
+    ("seconds_per_tick", "<i8"),
+    ("journal_epoch", "<u8"),
+    ("journal_segment", "<u8"),   # see EventJournal.position
+    ("journal_events", "<u8"),
+    ("published_at", "<f8"),
+    ("owner_pid", "<i8"),
+    ("owner_ready", "<u1"),
+])
+
+ROW_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("version", "<u8"),
+    ("last_message_id", "<i8"),
+    ("progress", "<f8"),
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+    ("has_position", "<u1"),
+    ("cold", f"S{COLD_BYTES}"),   # Robot.to_json() up to "progress" (no closing brace)
+])
+
+
+# the same layouts for struct: readers unpack one copied record instead of numpy scalars
+_HEADER_STRUCT = struct.Struct("<QQIIqqQqdqQQQdqB")
+_ROW_STRUCT = struct.Struct("<QQqdddB")
+_U64 = struct.Struct("<Q")
+_I64 = struct.Struct("<q")
+_HEADER_NAMES: Tuple[str, ...] = tuple(HEADER_DTYPE.names)
+_COUNT_OFFSET: int = HEADER_DTYPE.fields["count"][1]
+assert _HEADER_STRUCT.size == HEADER_DTYPE.itemsize <= HEADER_BYTES
+assert _ROW_STRUCT.size + COLD_BYTES == ROW_DTYPE.itemsize
+
+# blocks created by this process (their resource tracker entry must stay)
+_created: set = set()
+
+
+def block_size(capacity: int) -> int:
+    return HEADER_BYTES + ROW_DTYPE.itemsize * int(capacity)
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to an existing block without handing it to this process' resource tracker
+    (which would unlink the owner's block when a worker exits).
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if name in _created:
+        return shm
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+class SharedFleetState:
+    """
+    The shared memory block: header and rows, with seqlocked writes and reads.
+    Use create() in the owner and attach() in the workers.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, owner: bool = False):
+        self.shm = shm
+        self.owner = owner
+        self.capacity = int(capacity)
+        self.header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf, offset=0)
+        self.rows = np.ndarray((self.capacity,), dtype=ROW_DTYPE, buffer=shm.buf, offset=HEADER_BYTES)
+        self._seq = self.rows["seq"]
+        self._header_seq = self.header["seq"]
+
+    @classmethod
+    def create(cls, name: str, capacity: int = SHARED_CAPACITY) -> "SharedFleetState":
+        size = block_size(capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left over by an owner that did not exit cleanly
+            stale = _attach_block(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created.add(name)
+        state = cls(shm, capacity, owner=True)
+        h = state.header
+        h["magic"], h["layout"], h["cold_bytes"] = MAGIC, LAYOUT_VERSION, COLD_BYTES
+        h["capacity"], h["owner_pid"] = capacity, os.getpid()
+        return state
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFleetState":
+        """
+        Raises:
+            FileNotFoundError: no block of that name (the owner is not running).
+            ValueError: the block has another layout.
+        """
+        shm = _attach_block(name)
+        header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf, offset=0)[0].item()
+        fields = dict(zip(HEADER_DTYPE.names, header))
+        if (fields["magic"], fields["layout"], fields["cold_bytes"]) != (MAGIC, LAYOUT_VERSION, COLD_BYTES):
+            shm.close()
+            raise ValueError(f"{name} is not a fleet state block of layout {LAYOUT_VERSION}")
+        return cls(shm, fields["capacity"])
+
+    def close(self) -> None:
+        self.header = self.rows = self._seq = self._header_seq = None
+        self.shm.close()
+        if self.owner:
+            _created.discard(self.shm.name.lstrip("/"))
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # -------------------------
+    # Writer (owner, one thread)
+    # -------------------------
+    def write_rows(self, ids: List[int], states: List[Tuple[int, bytes, float, Optional[Tuple[float, float]], int]],
+                   cold_ids: List[int], colds: List[bytes]) -> None:
+        """
+        Publish rows: states are (version, cold JSON, progress, position, last message id),
+        the cold JSON is only copied for cold_ids (robots whose version changed).
+        """
+        idx = np.asarray(ids, dtype=np.int64)
+        versions, _, progress, positions, last_ids = zip(*states)
+        lat = np.fromiter((p[0] if p is not None else 0.0 for p in positions), dtype=np.float64, count=len(idx))
+        lon = np.fromiter((p[1] if p is not None else 0.0 for p in positions), dtype=np.float64, count=len(idx))
+        has_position = np.fromiter((p is not None for p in positions), dtype=np.uint8, count=len(idx))
+        rows = self.rows
+        self._seq[idx] += 1  # odd: readers retry
+        rows["version"][idx] = versions
+        rows["last_message_id"][idx] = last_ids
+        rows["progress"][idx] = progress
+        rows["lat"][idx] = lat
+        rows["lon"][idx] = lon
+        rows["has_position"][idx] = has_position
+        if cold_ids:
+            rows["cold"][np.asarray(cold_ids, dtype=np.int64)] = colds
+        self._seq[idx] += 1
+
+    def write_header(self, **values: Any) -> None:
+        h = self.header
+        self._header_seq[0] += 1
+        for key, value in values.items():
+            h[key] = value
+        self._header_seq[0] += 1
+
+    # -------------------------
+    # Readers (any process)
+    # -------------------------
+    def _read(self, offset: int, size: int) -> bytes:
+        """
+        Copy of the seqlocked record at offset (its first 8 bytes are the counter).
+        """
+        buf = self.shm.buf
+        deadline = None
+        while True:
+            s1 = _U64.unpack_from(buf, offset)[0]
+            if not s1 & 1:
+                raw = bytes(buf[offset:offset + size])
+                if _U64.unpack_from(buf, offset)[0] == s1:
+                    return raw
+            if deadline is None:
+                deadline = time.perf_counter() + READ_TIMEOUT_S
+            elif time.perf_counter() > deadline:
+                raise TimeoutError("shared fleet state is locked (owner stopped while writing?)")
+            time.sleep(0)
+
+    def read_header(self) -> Dict[str, Any]:
+        return dict(zip(_HEADER_NAMES, _HEADER_STRUCT.unpack(self._read(0, _HEADER_STRUCT.size))))
+
+    def count(self) -> int:
+        """Published robots (a single aligned word, no retry needed)."""
+        return _I64.unpack_from(self.shm.buf, _COUNT_OFFSET)[0]
+
+    def read_row(self, i: int) -> tuple:
+        """
+        (seq, version, last_message_id, progress, lat, lon, has_position, cold) of row i.
+        """
+        raw = self._read(HEADER_BYTES + i * ROW_DTYPE.itemsize, ROW_DTYPE.itemsize)
+        end = raw.find(b"\0", _ROW_STRUCT.size)
+        return _ROW_STRUCT.unpack_from(raw) + (raw[_ROW_STRUCT.size:end if end >= 0 else None],)
+
+
+# -------------------------
+# Owner: publisher thread
+# -------------------------
+class FleetPublisher:
+    """
+    Copies changed robots of a simulation into a SharedFleetState.
+    """
+
+    def __init__(self, sim, name: str, capacity: int = SHARED_CAPACITY,
+                 interval_s: float = PUBLISH_INTERVAL_S, batch: int = PUBLISH_BATCH):
+        self.sim = sim
+        self.name = name
+        self.interval_s = float(interval_s)
+        self.batch = int(batch)
+        self.state = SharedFleetState.create(name, capacity)
+        self._changes = track_changes()
+        self._robots: Optional[list] = None  # fleet list that was published
+        self._published = 0  # robots of that list published at least once
+        self._versions: Dict[int, int] = {}  # cold version per published row
+        self._generation = 0
+        self._stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.rounds = 0
+        self.rows_published = 0
+        self.oversized = 0
+        self.last_round_ms = 0.0
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name="fleet-publisher", daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        if self.state.shm is not None and self.state.header is not None:
+            untrack_changes(self._changes)
+            self.state.close()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.publish()
+
+    def _cold(self, robot, encoded: str) -> bytes:
+        data = encoded.encode("utf-8")
+        if len(data) <= COLD_BYTES:
+            return data
+        # too large for the slot: publish without the package list
+        self.oversized += 1
+        cold = dict(robot.to_dict(), packages=[], packages_truncated=True)
+        cold.pop("progress"), cold.pop("position")
+        return json.dumps(cold, separators=(",", ":"))[:-1].encode("utf-8")
+
+    def publish(self) -> int:
+        """
+        One round: publish the changed and the new robots, then the header.
+        Returns the number of published rows.
+        """
+        t0 = time.perf_counter()
+        robots = self.sim.robots
+        if robots is not self._robots:  # reset / restore replaced the fleet
+            self._robots, self._published = robots, 0
+            self._versions.clear()
+            self._generation += 1
+            self._changes.pop()
+        count = min(len(robots), self.state.capacity)
+        ids = sorted({i for i in self._changes.pop() if i < self._published} | set(range(self._published, count)))
+
+        exported = []
+        for i in ids:
+            robot = robots[i]
+            exported.append((i, robot, robot.export_state()))
+        journal = self.sim.journal
+        if journal is not None:
+            journal.flush()  # messages up to the published last ids are on disk
+
+        for start in range(0, len(exported), self.batch):
+            chunk = exported[start:start + self.batch]
+            cold_ids, colds = [], []
+            for i, robot, state in chunk:
+                if self._versions.get(i) != state[0]:
+                    self._versions[i] = state[0]
+                    cold_ids.append(i)
+                    colds.append(self._cold(robot, state[1]))
+            self.state.write_rows([c[0] for c in chunk], [c[2] for c in chunk], cold_ids, colds)
+        self._published = count
+
+        segment, events = journal.position if journal is not None else (0, 0)
+        self.state.write_header(
+            count=count,
+            generation=self._generation,
+            ticks=self.sim.ticks,
+            sim_time=self.sim.date_and_time.timestamp(),
+            seconds_per_tick=self.sim.seconds_per_tick,
+            journal_epoch=journal.epoch if journal is not None else 0,
+            journal_segment=segment,
+            journal_events=events,
+            published_at=time.time(),
+            owner_ready=WARMUP.ready,
+        )
+        seconds = time.perf_counter() - t0
+        METRICS.observe("kvv_shared_publish_seconds", seconds)
+        self.rounds += 1
+        self.rows_published += len(ids)
+        self.last_round_ms = seconds * 1000.0
+        return len(ids)
+
+    def stats(self) -> Dict[str, Any]:
+        robots = len(self.sim.robots)
+        return {
+            "enabled": True,
+            "name": self.name,
+            "capacity": self.state.capacity,
+            "bytes": self.state.shm.size,
+            "published": self._published,
+            "unpublished": max(0, robots - self.state.capacity),
+            "generation": self._generation,
+            "rounds": self.rounds,
+            "rows_published": self.rows_published,
+            "oversized": self.oversized,
+            "last_round_ms": round(self.last_round_ms, 3),
+            "interval_ms": self.interval_s * 1000.0,
+        }
+
+
+# -------------------------
+# Workers: read-only simulation view
+# -------------------------
+class SharedRobot:
+    """
+    Consistent copy of one published robot with the read methods of Robot that
+    /api/robot/read uses (to_json, hot_dict, get_messages_since).
+    """
+    __slots__ = ("robot_id", "version", "last_message_id", "progress", "position", "_cold", "_view")
+
+    def __init__(self, view: "SharedSimulation", robot_id: int, row: tuple):
+        _, self.version, self.last_message_id, self.progress, lat, lon, has_position, cold = row
+        self.robot_id = robot_id
+        self.position = (lat, lon) if has_position else None
+        self._cold = cold
+        self._view = view
+
+    def get_messages_since(self, since_message_id: int) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Messages come from the journal; everything up to last_message_id was committed
+        before the row was published. Like the owner's in-memory window, at most the newest
+        MAX_MESSAGES_PER_ROBOT are returned (older ones: SharedSimulation.message_history).
+        Messages that exist only in the owner's memory (restored from a snapshot) are not
+        in the journal.
+        """
+        since_message_id = max(0, since_message_id, self.last_message_id - MAX_MESSAGES_PER_ROBOT)
+        if since_message_id >= self.last_message_id:
+            return self.last_message_id, []
+        return self.last_message_id, self._view.journal_messages(self.robot_id, since_message_id,
+                                                                 self.last_message_id + 1)
+
+    def hot_dict(self) -> Dict[str, Any]:
+        return {"robot_id": self.robot_id, "progress": self.progress, "position": self.position}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return json.loads(self.to_json())
+
+    def to_json(self) -> str:
+        pos = self.position
+        pos_json = "null" if pos is None else f"[{pos[0]!r},{pos[1]!r}]"
+        return f'{self._cold.decode("utf-8")},"progress":{self.progress!r},"position":{pos_json}}}'
+
+
+class _SharedRobots:
+    """
+    Sequence of the published robots (len / index like Simulation.robots).
+    """
+
+    def __init__(self, view: "SharedSimulation"):
+        self._view = view
+
+    def __len__(self) -> int:
+        return self._view.state.count()
+
+    def __getitem__(self, i: int) -> SharedRobot:
+        count = len(self)
+        if i < 0:
+            i += count
+        if not 0 <= i < count:
+            raise IndexError("robot index out of range")
+        return SharedRobot(self._view, i, self._view.state.read_row(i))
+
+
+class SharedSimulation:
+    """
+    Read-only stand-in for Simulation in the worker processes (g.sim of read_worker.py).
+    """
+
+    def __init__(self, name: str, journal_dir: Optional[str] = None):
+        self.name = name
+        self.state = SharedFleetState.attach(name)
+        self.robots = _SharedRobots(self)
+        self.journal = None
+        if journal_dir is not None:
+            from backend.journal import EventJournal
+            self.journal = EventJournal(journal_dir, read_only=True)
+        self._journal_lock = threading.Lock()
+
+    def header(self) -> Dict[str, Any]:
+        return self.state.read_header()
+
+    @property
+    def ticks(self) -> int:
+        return self.header()["ticks"]
+
+    @property
+    def date_and_time(self):
+        import datetime as dt
+        return dt.datetime.fromtimestamp(self.header()["sim_time"])
+
+    @property
+    def date(self) -> str:
+        return self.date_and_time.strftime("%d.%m.%y")
+
+    @property
+    def time(self) -> str:
+        return self.date_and_time.strftime("%H:%M")
+
+    def journal_messages(self, robot_id: int, since_message_id: int,
+                         before_message_id: Optional[int], limit: int = 1000) -> List[Dict[str, Any]]:
+        if self.journal is None:
+            return []
+        h = self.header()
+        with self._journal_lock:
+            if self.journal.position != (h["journal_segment"], h["journal_events"]):
+                self.journal.refresh()
+            self.journal.epoch = h["journal_epoch"]
+        return self.journal.robot_messages(robot_id, since_message_id, before_message_id, limit)
+
+    def message_history(self, robot_id: int, since_message_id: int,
+                        before_message_id: Optional[int] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Messages older than the window get_messages_since() returns, also from the journal.
+        """
+        return self.journal_messages(robot_id, since_message_id, before_message_id, limit)
+
+    def close(self) -> None:
+        self.state.close()
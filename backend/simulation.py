@@ -6,36 +6,43 @@ Adds: route simulation jobs that update robot.position + robot.progress smoothly
 and send status messages:
 - ROUTE_TICK every 1 second
 - ROUTE_PROGRESS every 5%
+- STATION_ARRIVED / STATION_DEPARTED at the KVV stations along the route
+
+Simulated time advances through a TickEngine (tick_engine.py), which also runs the
+per-tick batch systems from systems.py over the whole fleet.
 """
 
 from __future__ import annotations
 
+import bisect
 import threading
+from collections import deque
 from time import sleep
 import time
 import datetime as dt
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Optional, Tuple
 
-from backend.robot import Robot
+import numpy as np
 
+from backend.conflicts import ConflictDetector
+from backend.energy import EnergyModel
+from backend.eta import EtaIndex
+from backend.geodesy import haversine_m, segment_lengths_m
+from backend.journal import EventJournal
+from backend.metrics import METRICS
+from backend.package_store import PackageStore
+from backend.profiling import release_thread, sync_thread
+from backend.robot import Robot, clear_message_sink, set_message_sink
+from backend.route_jobs import JobManager, RouteJob
+from backend.shared_state import FleetPublisher
+from backend.stations import stations_along_route
+from backend.storage import StateStore, StoreWriter, load_stored_state
+from backend.systems import DEFAULT_SYSTEMS
+from backend.tick_engine import TickContext, TickEngine
+from backend.trajectory import TrajectoryStore
 
-def _haversine_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
-    """
-    Distance in meters between (lat,lon) points.
-    """
-    import math
 
-    lat1, lon1 = a
-    lat2, lon2 = b
-    R = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dl = math.radians(lon2 - lon1)
-
-    s = math.sin(dphi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dl / 2.0) ** 2
-    c = 2.0 * math.atan2(math.sqrt(s), math.sqrt(1.0 - s))
-    return R * c
+STATION_SNAP_M: float = 40.0  # a route passes a station if it comes this close
 
 
 def _resample_by_distance(coords: List[Tuple[float, float]], step_m: float) -> List[Tuple[float, float]]:
@@ -55,7 +62,7 @@ def _resample_by_distance(coords: List[Tuple[float, float]], step_m: float) -> L
     for i in range(len(coords) - 1):
         a = coords[i]
         b = coords[i + 1]
-        dist = _haversine_m(a, b)
+        dist = haversine_m(a, b)
         if dist <= 0:
             continue
 
@@ -76,12 +83,28 @@ def _cumdist(coords: List[Tuple[float, float]]) -> List[float]:
     """
     cumulative distance array in meters (same length as coords).
     """
-    cum = [0.0]
-    total = 0.0
-    for i in range(len(coords) - 1):
-        total += _haversine_m(coords[i], coords[i + 1])
-        cum.append(total)
-    return cum
+    if len(coords) < 2:
+        return [0.0] * len(coords)
+    # all segments at once (long multi-stop routes)
+    return [0.0] + np.cumsum(segment_lengths_m(coords)).tolist()
+
+
+def _route_geometry(coords: List[Tuple[float, float]]) -> Tuple[List[Tuple[float, float]], List[float], float]:
+    """
+    Resampled route points, their cumulative distance and the total length in meters.
+
+    Raises:
+        ValueError: less than 2 points or a route of length zero.
+    """
+    if not coords or len(coords) < 2:
+        raise ValueError("coords must contain at least 2 points")
+    # resample for constant speed look
+    route_pts = _resample_by_distance(coords, step_m=12.0)
+    cum = _cumdist(route_pts)
+    total_m = cum[-1] if cum else 0.0
+    if total_m <= 0:
+        raise ValueError("route distance is zero")
+    return route_pts, cum, total_m
 
 
 def _interp_on_cum(coords: List[Tuple[float, float]], cum: List[float], target_m: float) -> Tuple[float, float]:
@@ -99,12 +122,8 @@ def _interp_on_cum(coords: List[Tuple[float, float]], cum: List[float], target_m
     if target_m >= cum[-1]:
         return coords[-1]
 
-    # find segment (linear scan is fine for student project; could be binary search)
-    idx = 0
-    for i in range(len(cum) - 1):
-        if cum[i] <= target_m <= cum[i + 1]:
-            idx = i
-            break
+    # find segment (binary search; multi-stop routes have thousands of points)
+    idx = min(max(bisect.bisect_right(cum, target_m) - 1, 0), len(cum) - 2)
 
     a = coords[idx]
     b = coords[idx + 1]
@@ -120,6 +139,23 @@ def _interp_on_cum(coords: List[Tuple[float, float]], cum: List[float], target_m
     return (lat, lon)
 
 
+def _fan_out(sinks: List[Callable[[Dict[str, Any]], None]]) -> Callable[[Dict[str, Any]], None]:
+    """
+    One message sink that hands every message to all given sinks.
+    """
+    if len(sinks) == 1:
+        return sinks[0]
+
+    def sink(msg: Dict[str, Any]) -> None:
+        for s in sinks:
+            s(msg)
+    return sink
+
+
+def _clamp01(x: float) -> float:
+    return max(0.0, min(1.0, float(x)))
+
+
 class Simulation:
     """
     Simulation environment. Holds robots and simulated time.
@@ -133,23 +169,60 @@ class Simulation:
     _robots: List[Robot] = []
     _ticks: int = 0
     thread: Optional[threading.Thread] = None
-
-    # route jobs
-    _route_lock: threading.Lock
-    _route_id_counter: int
-    _route_threads: Dict[int, threading.Thread]
-
-    def __init__(self, robots: List[Robot] = [], time_per_tick: int = 1):
-        self._route_lock = threading.Lock()
-        self._route_id_counter = 0
-        self._route_threads = {}
+    packages: PackageStore
+    engine: Optional[TickEngine] = None
+
+    jobs: JobManager
+
+    def __init__(self, robots: List[Robot] = [], time_per_tick: int = 1, journal_dir: Optional[str] = None,
+                 shared_state: Optional[str] = None, store: Optional[StateStore] = None):
+        self.jobs = JobManager()
+        self.packages = PackageStore()
+        self.energy = EnergyModel()
+        self.trajectories = TrajectoryStore()
+        self.conflicts = ConflictDetector()
+        self.eta = EtaIndex()
+        # robots whose route progress is paused (set by the conflicts system)
+        self.held_robots: FrozenSet[int] = frozenset()
+        self._clock_lock = threading.Lock()
+        # (robot_id, station) of finished routes, consumed by the delivery system
+        self._arrivals: Deque[Tuple[int, str]] = deque()
+
+        # on-disk message history (optional)
+        self.journal: Optional[EventJournal] = None
+        if journal_dir is not None:
+            self.journal = EventJournal(journal_dir)
+            self.journal.new_epoch()  # robot ids start again in this process
 
         self.robots = robots
+
+        # persistent state backend (optional); a stored state is loaded back first
+        self.store = store
+        self.store_writer: Optional[StoreWriter] = None
+        if store is not None:
+            stored = store.load()
+            if stored is not None:
+                load_stored_state(self, stored)
+            self.store_writer = StoreWriter(self, store)
+            self.store_writer.start()
+
+        # the sink is process-wide: a new simulation always replaces the previous one
+        sinks = [s.append for s in (self.journal, self.store_writer) if s is not None]
+        self._message_sink = _fan_out(sinks) if sinks else None
+        set_message_sink(self._message_sink)
+
+        # robot state in shared memory for read-only worker processes (optional)
+        self.publisher: Optional[FleetPublisher] = None
+        if shared_state is not None:
+            self.publisher = FleetPublisher(self, shared_state)
+            self.publisher.start()
         self.seconds_per_tick = time_per_tick
 
-        self.thread = threading.Thread(target=self.timer_ticks)
-        self.thread.daemon = True
-        self.thread.start()
+        self.engine = TickEngine(self, self.seconds_per_tick, self._advance_clock)
+        for name, system in DEFAULT_SYSTEMS:
+            self.engine.register(name, system)
+        self.engine.start()
+        self.thread = self.engine.thread
 
     # -------------------------
     # Getters / Setters
@@ -197,20 +270,158 @@ class Simulation:
             val = int(val)
             if val >= 1:
                 self._seconds_per_tick = val
+                if self.engine is not None:
+                    self.engine.interval_s = val
         except TypeError:
             return
 
+    def close(self) -> None:
+        """
+        Stop the tick engine, the route jobs and the background writers, and detach the
+        message sink (unless a newer simulation installed its own).
+        """
+        if self.engine is not None:
+            self.engine.stop()
+        self.jobs.cancel_all("reset")
+        if self._message_sink is not None:
+            clear_message_sink(self._message_sink)
+        for part in (self.publisher, self.store_writer, self.journal):
+            if part is not None:
+                part.close()
+
     def reset(self):
+        self.jobs.cancel_all("reset")
+        if self.journal is not None:
+            self.journal.new_epoch()
         self._robots = []
-        self._ticks = 0
-        self._date_and_time = dt.datetime.now()
+        self.packages.clear()
+        self.energy.reset()
+        self.trajectories.clear()
+        self.conflicts.reset()
+        self.eta.clear()
+        self.held_robots = frozenset()
+        self._arrivals.clear()
+        with self._clock_lock:
+            self._ticks = 0
+            self._date_and_time = dt.datetime.now()
+        if self.store_writer is not None:
+            self.store_writer.resync()
+
+    def message_history(self, robot_id: int, since_message_id: int,
+                        before_message_id: Optional[int] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Messages of a robot that are no longer held in memory, read from the journal
+        (or from the persistent store without a journal).
+        """
+        if self.journal is None:
+            if self.store is not None:
+                return self.store.messages(robot_id, since_message_id, before_message_id, limit)
+            return []
+        return self.journal.robot_messages(robot_id, since_message_id, before_message_id, limit)
+
+    def route_jobs(self) -> List[Dict[str, Any]]:
+        """
+        Descriptors of the active route jobs, with their current progress.
+        """
+        return [dict(job.descriptor(), progress=job.progress) for job in self.jobs.active()]
+
+    def load_state(
+        self,
+        robots: List[Robot],
+        package_records: list,
+        next_package_id: int,
+        ticks: int,
+        date_and_time: dt.datetime,
+        time_per_tick: int,
+        seconds_per_tick: int,
+        route_jobs: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Replace the whole simulation state (used by snapshot.restore()).
+        Running route jobs stop; the given route jobs resume at their progress.
+        """
+        self.jobs.cancel_all("reset")
+        if self.journal is not None:
+            self.journal.new_epoch()
+        self._robots = list(robots)
+        self.packages.restore(package_records, next_package_id)
+        self.energy.reset()
+        self.trajectories.clear()
+        self.conflicts.reset()
+        self.eta.clear()
+        self.held_robots = frozenset()
+        self._arrivals.clear()
+        with self._clock_lock:
+            self._ticks = int(ticks)
+            self._date_and_time = date_and_time
+            self.time_per_tick = time_per_tick
+        self.seconds_per_tick = seconds_per_tick
+        if self.store_writer is not None:
+            self.store_writer.resync()
+        for job in route_jobs:
+            self.start_route_job(
+                job["robot_id"], job["coords"], job["duration_s"],
+                route_color=job["route_color"], destination=job["destination"],
+                start_progress=job["progress"], dwell_s=job.get("dwell_s", 0.0),
+                drops=job.get("drops"),
+            )
+
+    def snapshot(self, path: str) -> Dict[str, Any]:
+        """
+        Write the simulation state to a binary snapshot file (see snapshot.py).
+        """
+        from backend import snapshot
+        return snapshot.save(self, path)
 
-    def timer_ticks(self):
-        while True:
-            sleep(self.seconds_per_tick)
+    def restore(self, path: str) -> Dict[str, Any]:
+        """
+        Load the simulation state from a snapshot file written by snapshot().
+        """
+        from backend import snapshot
+        return snapshot.restore(self, path)
+
+    def _advance_clock(self) -> TickContext:
+        """
+        First step of every tick (called by the TickEngine).
+        """
+        with self._clock_lock:
             self._ticks += 1
-            new_time = self.date_and_time + dt.timedelta(0, seconds=self.time_per_tick)
-            self._date_and_time = new_time
+            self._date_and_time = self.date_and_time + dt.timedelta(0, seconds=self.time_per_tick)
+            return TickContext(
+                tick=self._ticks,
+                sim_time=self._date_and_time,
+                sim_seconds=float(self.time_per_tick),
+                interval_s=float(self.seconds_per_tick),
+            )
+
+    def process_arrivals(self) -> int:
+        """
+        Unload packages for all queued route arrivals. Returns the number of arrivals.
+        """
+        count = 0
+        while self._arrivals:
+            robot_id, station = self._arrivals.popleft()
+            try:
+                self.unload_at(robot_id, station)
+            except IndexError:  # robot removed by a reset
+                pass
+            count += 1
+        return count
+
+    def unload_at(self, robot_id: int, station: str) -> list:
+        """
+        Deliver the packages of a robot that are due at a station.
+        Returns the delivered package records.
+        """
+        robot = self._robots[robot_id]  # may raise IndexError
+        delivered = self.packages.unload_at(robot, station)
+        if delivered:
+            robot.add_message(
+                "PACKAGES_DELIVERED",
+                f"{len(delivered)} package(s) delivered at {station}.",
+                robot.progress,
+            )
+        return delivered
 
     # -------------------------
     # Route job (Backend-master)
@@ -221,6 +432,10 @@ class Simulation:
         coords: List[Tuple[float, float]],
         duration_s: float,
         route_color: str = "#d32f2f",
+        destination: Optional[str] = None,
+        start_progress: float = 0.0,
+        dwell_s: float = 0.0,
+        drops: Optional[List[str]] = None,
     ) -> int:
         """
         Start a route simulation for robot_id. Returns route_id.
@@ -228,48 +443,149 @@ class Simulation:
         The robot is updated smoothly (20Hz), but messages are sent:
         - every 1 second ROUTE_TICK
         - every 5% ROUTE_PROGRESS
+        - STATION_ARRIVED / STATION_DEPARTED when passing a KVV station
+
+        Stations within STATION_SNAP_M of the route are looked up once before the job
+        starts (KD-tree + cumulative distance); the loop only compares the distance
+        driven with the next stop. At intermediate stations the robot waits dwell_s
+        seconds (not counted in duration_s).
+
+        If destination (station name) is given, packages due there are unloaded
+        by the delivery system in the first tick after the route is finished.
+        drops (station triasIDs) are unloaded the same way when the robot arrives there
+        (multi-stop routes, see planner.py).
+
+        A robot drives one route at a time: an active job of the robot is cancelled
+        ("replaced") first. start_progress > 0 resumes a job (e.g. after restoring a
+        snapshot). See route_jobs.py for cancel / pause / resume.
         """
         robot = self._robots[robot_id]  # may raise IndexError
-
-        if not coords or len(coords) < 2:
-            raise ValueError("coords must contain at least 2 points")
+        route_pts, cum, total_m = _route_geometry(coords)  # may raise ValueError
 
         duration_s = float(duration_s)
         if duration_s <= 0:
             duration_s = 10.0
 
-        # resample for constant speed look
-        route_pts = _resample_by_distance(coords, step_m=12.0)
-        cum = _cumdist(route_pts)
-        total_m = cum[-1] if cum else 0.0
-        if total_m <= 0:
-            raise ValueError("route distance is zero")
+        start_progress = float(_clamp01(start_progress))
+        dwell_s = max(0.0, float(dwell_s))
+
+        # stations on the way, in driving order
+        stops = stations_along_route(route_pts, cum, STATION_SNAP_M)
+        terminal_m = total_m - STATION_SNAP_M  # stops behind this are the end of the route
 
-        with self._route_lock:
-            self._route_id_counter += 1
-            route_id = self._route_id_counter
+        job = RouteJob(self.jobs.next_id(), robot_id, coords, duration_s, route_color,
+                       destination, dwell_s, total_m, stops, drops)
+        job.progress = start_progress
+        route_id = job.route_id
+        drop_ids = set(job.drops)
+        replaced = self.jobs.add(job)
+        if replaced is not None:
+            replaced.join()  # never two threads moving one robot
+        METRICS.inc("kvv_route_jobs_started_total")
+        update_delay = METRICS.histogram("kvv_route_job_update_delay_seconds")
 
         def run():
             # init robot
             robot.is_parked = False
-            robot.set_progress_position(0.0, route_pts[0][0], route_pts[0][1])
-            robot.add_message("ROUTE_STARTED", "Route started.", 0.0)
+            if start_progress <= 0.0:
+                robot.reset_progress(route_pts[0][0], route_pts[0][1])
+                robot.add_message("ROUTE_STARTED", "Route started.", 0.0)
+            else:
+                robot.add_message("ROUTE_RESUMED", "Route resumed.", start_progress)
 
-            start_ts = time.time()
+            start_ts = time.time() - start_progress * duration_s
 
             last_tick_sec = -1
-            last_progress_bucket = -1  # 5% steps => 0..20
+            last_progress_bucket = int((start_progress * 100.0) // 5) if start_progress > 0 else -1
+            last_m = start_progress * total_m  # for the odometer
             fps_sleep = 0.05  # 20Hz updates
-
-            while True:
+            prev_now = time.time()
+            held = False
+            stalled = False  # paused or held in the last update
+            update_due: Optional[float] = None  # perf_counter time of the next 20Hz update
+
+            # next station stop; a stop at the very start is only departed from
+            next_stop = 0
+            while next_stop < len(stops) and stops[next_stop]["along_m"] <= last_m:
+                next_stop += 1
+            departing: Optional[Dict[str, Any]] = None
+            dwell_until = 0.0
+            if start_progress <= 0.0 and next_stop > 0:
+                departing = stops[next_stop - 1]
+
+            def publish_etas(now: float, at_m: float, first: int, dwell_left: float) -> None:
+                """ETAs of the stops ahead at the current speed (incl. dwell times)."""
+                if job.cancelled:
+                    return
+                speed = total_m / duration_s
+                etas = []
+                wait = dwell_left
+                for stop in stops[first:]:
+                    etas.append((stop["triasID"], now + wait + (stop["along_m"] - at_m) / speed))
+                    if stop["along_m"] < terminal_m:
+                        wait += dwell_s
+                self.eta.set_route(route_id, robot_id, etas, destination)
+
+            publish_etas(time.time(), last_m, next_stop, 0.0)
+
+            while not job.cancelled:
+                sync_thread()  # cProfile sessions (profiling.py)
                 now = time.time()
+                t_update = time.perf_counter()
+                if update_due is not None:
+                    update_delay.observe(max(0.0, t_update - update_due))
+                update_due = t_update + fps_sleep
+
+                # dwell at a station / pause / headway hold: shift the start so that progress pauses
+                if departing is not None and now < dwell_until:
+                    start_ts += now - prev_now
+                elif departing is not None:
+                    robot.add_message("STATION_DEPARTED", f"Departed from {departing['name']}.", robot.progress)
+                    departing = None
+                was_stalled = stalled
+                stalled = job.paused or robot_id in self.held_robots
+                if stalled:
+                    start_ts += now - prev_now
+                if robot_id in self.held_robots and not held:
+                    held = True
+                    robot.add_message("HEADWAY_HOLD", "Holding for headway.", robot.progress)
+                elif held and robot_id not in self.held_robots:
+                    held = False
+                    robot.add_message("HEADWAY_RELEASED", "Headway restored, continuing.", robot.progress)
+                if was_stalled and not stalled:
+                    # the stop delayed every station ahead
+                    publish_etas(now, last_m, next_stop, max(0.0, dwell_until - now) if departing else 0.0)
+                prev_now = now
                 elapsed = now - start_ts
                 progress = min(1.0, max(0.0, elapsed / duration_s))
 
                 # position from progress (distance-based)
                 target_m = progress * total_m
+
+                # station stops: fire exactly at the precomputed distance
+                while departing is None and next_stop < len(stops) and target_m >= stops[next_stop]["along_m"]:
+                    stop = stops[next_stop]
+                    next_stop += 1
+                    robot.add_message("STATION_ARRIVED", f"Arrived at {stop['name']}.", stop["along_m"] / total_m)
+                    self.eta.arrived(route_id, stop["triasID"])
+                    if stop["triasID"] in drop_ids:
+                        self._arrivals.append((robot_id, stop["triasID"]))
+                    if stop["along_m"] >= terminal_m:
+                        continue  # end of the route: no departure
+                    departing = stop
+                    dwell_until = now + dwell_s
+                    if dwell_s > 0:
+                        # stand exactly at the stop for the dwell time
+                        target_m = stop["along_m"]
+                        progress = target_m / total_m
+                        start_ts = now - progress * duration_s
+                        elapsed = now - start_ts
+
                 lat, lon = _interp_on_cum(route_pts, cum, target_m)
                 robot.set_progress_position(progress, lat, lon)
+                robot.add_distance(target_m - last_m)
+                last_m = target_m
+                job.progress = progress
 
                 # ROUTE_TICK every 1s (stable)
                 sec = int(elapsed)
@@ -293,15 +609,166 @@ class Simulation:
 
                 sleep(fps_sleep)
 
-            # finish
-            robot.set_progress_position(1.0, route_pts[-1][0], route_pts[-1][1])
-            robot.is_parked = True
-            robot.add_message("ROUTE_FINISHED", "Route finished.", 1.0)
-
-        t = threading.Thread(target=run, daemon=True)
+            self.eta.remove_route(route_id)
+            if job.cancelled:
+                # stop where we are; "replaced" and "rerouted" jobs are followed by a new one
+                if job.reason == "cancelled":
+                    robot.is_parked = True
+                robot.add_message("ROUTE_CANCELLED", f"Route cancelled ({job.reason}).", robot.progress)
+            else:
+                # finish
+                robot.set_progress_position(1.0, route_pts[-1][0], route_pts[-1][1])
+                robot.is_parked = True
+                robot.add_message("ROUTE_FINISHED", "Route finished.", 1.0)
+                if destination:
+                    self._arrivals.append((robot_id, destination))
+            self.jobs.end(job)
+            release_thread()
+
+        t = threading.Thread(target=run, name=f"route-{route_id}", daemon=True)
+        job.thread = t
         t.start()
+        return route_id
 
-        with self._route_lock:
-            self._route_threads[route_id] = t
+    def cancel_job(self, route_id: int) -> bool:
+        """
+        Stop a route job; the robot stays where it is. Returns False if the job is not active.
+        """
+        job = self.jobs.get(route_id)
+        if job is None or not job.cancel("cancelled"):
+            return False
+        job.join()
+        return True
 
-        return route_id
+    def pause_job(self, route_id: int) -> bool:
+        """
+        Pause a route job; its progress is kept until resume_job().
+        """
+        job = self.jobs.get(route_id)
+        if job is None or not job.pause():
+            return False
+        robot = self._robots[job.robot_id]
+        robot.add_message("ROUTE_PAUSED", "Route paused.", robot.progress)
+        return True
+
+    def resume_job(self, route_id: int) -> bool:
+        job = self.jobs.get(route_id)
+        if job is None or not job.resume():
+            return False
+        robot = self._robots[job.robot_id]
+        robot.add_message("ROUTE_RESUMED", "Route resumed.", robot.progress)
+        return True
+
+    def reroute_job(
+        self,
+        route_id: int,
+        coords: List[Tuple[float, float]],
+        destination: Optional[str] = None,
+        duration_s: Optional[float] = None,
+    ) -> int:
+        """
+        Replace the rest of a route: the new path starts at the robot's current position.
+        Without duration_s the robot keeps its current speed. Returns the new route_id.
+
+        The new path is checked before the old job is cancelled; on ValueError the
+        old job keeps running.
+
+        Raises:
+            KeyError: route_id is not an active job.
+            ValueError: invalid coords (e.g. only the current position).
+        """
+        job = self.jobs.get(route_id)
+        if job is None:
+            raise KeyError(route_id)
+        if not coords:
+            raise ValueError("coords must contain at least 1 point")
+        robot = self._robots[job.robot_id]
+        here = robot.position or job.coords[0]
+        new_coords = [tuple(here)] + [tuple(c) for c in coords]
+        _route_geometry(new_coords)  # may raise ValueError
+
+        job.cancel("rerouted")
+        job.join()
+        if duration_s is None:
+            speed = job.total_m / job.duration_s if job.total_m > 0 else 0.0
+            dist = sum(haversine_m(a, b) for a, b in zip(new_coords, new_coords[1:]))
+            duration_s = max(1.0, dist / speed) if speed > 0 else job.duration_s
+        robot.add_message("ROUTE_REROUTED", f"Rerouted (was route {route_id}).", robot.progress)
+        return self.start_route_job(
+            job.robot_id, new_coords, duration_s, route_color=job.route_color,
+            destination=destination if destination is not None else job.destination, dwell_s=job.dwell_s,
+            drops=job.drops,
+        )
+
+    def plan_deliveries(
+        self,
+        robot_ids: Optional[List[int]] = None,
+        network=None,
+        speed_m_s: Optional[float] = None,
+        start: bool = True,
+    ) -> list:
+        """
+        Plan one multi-stop route per robot over the destinations of its packages
+        (see planner.py) and start them as route jobs. Robots without packages or
+        charging robots are skipped; a running job of a planned robot is replaced.
+
+        Args:
+            robot_ids: Robots to plan (default: all robots).
+            network: RoadNetwork (default: road_network.load_road_network()).
+            speed_m_s: Driving speed used for the job duration.
+            start: False only plans.
+
+        Returns:
+            List of RoutePlan (route_id is set for started jobs).
+        """
+        from backend.planner import plan_routes
+        from backend.road_network import ROBOT_SPEED_M_S, load_road_network
+
+        robots = self._robots
+        if robot_ids is None:
+            robot_ids = range(len(robots))
+        batch = [robots[i] for i in robot_ids]  # may raise IndexError
+        batch = [r for r in batch if r.packages and not r.is_charging]
+        if not batch:
+            return []
+        plans = [p for p in plan_routes(batch, network or load_road_network()) if len(p.coords) >= 2]
+        if not start:
+            return plans
+
+        speed = speed_m_s or ROBOT_SPEED_M_S
+        route_ids = self.start_route_jobs([
+            {"robot_id": p.robot_id, "coords": p.coords, "duration_s": p.duration_s(speed),
+             "destination": p.stop_names[-1], "drops": p.stops}
+            for p in plans
+        ])
+        for plan, route_id in zip(plans, route_ids):
+            plan.route_id = route_id
+        return plans
+
+    def start_route_jobs(self, specs: List[Dict[str, Any]]) -> List[int]:
+        """
+        Start many route jobs at once (keyword arguments of start_route_job() per job).
+        All specs are checked (robot, route length) before any old job is cancelled,
+        so an invalid spec leaves every robot as it was. The old jobs of all robots
+        are cancelled together, so their threads stop in parallel instead of one
+        join per robot.
+
+        Every new job still runs in its own thread like start_route_job(): pause,
+        dwell, headway holds and cancel/join work per job.
+
+        Raises:
+            IndexError: unknown robot_id.
+            ValueError: a route has less than 2 points or length zero.
+        """
+        for spec in specs:
+            self._robots[spec["robot_id"]]  # may raise IndexError
+            _route_geometry(spec["coords"])  # may raise ValueError
+
+        old = [self.jobs.for_robot(spec["robot_id"]) for spec in specs]
+        for job in old:
+            if job is not None:
+                job.cancel("replaced")
+        for job in old:
+            if job is not None:
+                job.join()
+        return [self.start_route_job(**spec) for spec in specs]
@@ -0,0 +1,473 @@
+"""
+snapshot.py
+
+Binary checkpoint / restore of the full simulation state.
+
+File layout (little endian):
+    8 bytes   magic b"KVVSNAP1"
+    8 bytes   length of the JSON header
+    n bytes   JSON header: simulation meta data and the table of arrays
+              {name: {"dtype", "shape", "offset"}}
+    padding   up to a multiple of 64 bytes
+    arrays    raw column arrays, each starting at a 64 byte aligned offset
+
+Numeric robot state is stored column-wise (one array per field). Packages, messages
+and route jobs are columns as well; all strings (station names, event names, message
+texts, ...) go into one string table (UTF-8 blob + offsets) and are referenced by index.
+
+Restoring reads the file in one go and builds the objects from the columns with bulk
+numpy -> list conversions (garbage collection is paused meanwhile). Running route jobs
+are saved as well and resume at their progress.
+
+CLI (run from the repository root):
+    python -m backend.snapshot info <file>
+    python -m backend.snapshot save <name> [--url http://localhost:5000]
+    python -m backend.snapshot restore <name> [--url http://localhost:5000]
+    python -m backend.snapshot bench [--robots 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import gc
+import json
+import os
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.package_store import PackageRecord, PackageState, station_key
+from backend.packages import Package, PackageSize
+from backend.robot import Robot
+
+
+MAGIC = b"KVVSNAP1"
+FORMAT_VERSION = 2  # 2: route jobs with dwell time and drop stops (job_dwell, job_drop_*)
+_ALIGN = 64
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "snapshots")
+
+# robot flag bits
+_PARKED, _DOOR, _REVERSING, _CHARGING = 1, 2, 4, 8
+
+
+class SnapshotError(ValueError):
+    """
+    Raised for unreadable or incompatible snapshot files.
+    """
+
+
+def snapshot_path(name: str) -> str:
+    """
+    Path of a named snapshot inside SNAPSHOT_DIR. Only plain file names are allowed.
+    """
+    name = os.path.basename(str(name).strip())
+    if not name or name.startswith("."):
+        raise SnapshotError("Invalid snapshot name.")
+    if not name.endswith(".snap"):
+        name += ".snap"
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self._index: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        i = self._index.get(value)
+        if i is None:
+            i = len(self.strings)
+            self._index[value] = i
+            self.strings.append(value)
+        return i
+
+    def encode(self) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [s.encode("utf-8") for s in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            offsets[1:] = np.cumsum([len(b) for b in encoded])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = blob.tobytes()
+    off = offsets.tolist()
+    return [raw[off[i]:off[i + 1]].decode("utf-8") for i in range(len(off) - 1)]
+
+
+# -------------------------
+# Save
+# -------------------------
+def _collect(sim) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    strings = _StringTable()
+    robots: List[Robot] = list(sim.robots)
+    n = len(robots)
+
+    # robots
+    flags = np.fromiter(
+        ((_PARKED * r.is_parked) | (_DOOR * r.is_door_opened) | (_REVERSING * r.is_reversing)
+         | (_CHARGING * r.is_charging) for r in robots),
+        dtype=np.uint8, count=n,
+    )
+    pos = [r.position for r in robots]
+    arrays: Dict[str, np.ndarray] = {
+        "robot_id": np.fromiter((r.robot_id for r in robots), dtype=np.int64, count=n),
+        "robot_flags": flags,
+        "robot_battery": np.fromiter((r.battery_status for r in robots), dtype=np.float64, count=n),
+        "robot_led": np.clip(np.array([r.led_rgb for r in robots], dtype=np.int64).reshape(n, 3), 0, 255).astype(np.uint8),
+        "robot_progress": np.fromiter((r.progress for r in robots), dtype=np.float64, count=n),
+        "robot_lat": np.fromiter((p[0] if p else np.nan for p in pos), dtype=np.float64, count=n),
+        "robot_lon": np.fromiter((p[1] if p else np.nan for p in pos), dtype=np.float64, count=n),
+        "robot_odometer": np.fromiter((r.odometer_m for r in robots), dtype=np.float64, count=n),
+        "robot_last_msg": np.fromiter((r._last_message_id for r in robots), dtype=np.int64, count=n),
+        "robot_message": np.fromiter((strings.add(r.message) for r in robots), dtype=np.int32, count=n),
+    }
+
+    # messages (all robots, concatenated)
+    msg_robot, msg_id, msg_event, msg_text, msg_progress, msg_ts = [], [], [], [], [], []
+    for i, r in enumerate(robots):
+        _, msgs = r.get_messages_since(0)
+        for m in msgs:
+            msg_robot.append(i)
+            msg_id.append(m["id"])
+            msg_event.append(strings.add(m["event"]))
+            msg_text.append(strings.add(m["text"]))
+            msg_progress.append(m["progress"])
+            msg_ts.append(m["ts"])
+    arrays.update({
+        "msg_robot": np.array(msg_robot, dtype=np.int32),
+        "msg_id": np.array(msg_id, dtype=np.int64),
+        "msg_event": np.array(msg_event, dtype=np.int32),
+        "msg_text": np.array(msg_text, dtype=np.int32),
+        "msg_progress": np.array(msg_progress, dtype=np.float64),
+        "msg_ts": np.array(msg_ts, dtype=np.float64),
+    })
+
+    # packages (all records of the store, including delivered ones)
+    recs = sim.packages.records()
+    arrays.update({
+        "pkg_id": np.array([p.package_id for p in recs], dtype=np.int64),
+        "pkg_start": np.array([strings.add(p.start) for p in recs], dtype=np.int32),
+        "pkg_destination": np.array([strings.add(p.destination) for p in recs], dtype=np.int32),
+        "pkg_size": np.array([p.size.value for p in recs], dtype=np.int8),
+        "pkg_state": np.array([p.state.value for p in recs], dtype=np.int8),
+        "pkg_robot": np.array([-1 if p.robot_id is None else p.robot_id for p in recs], dtype=np.int64),
+        "pkg_created": np.array([p.created_ts for p in recs], dtype=np.float64),
+        "pkg_delivered": np.array([np.nan if p.delivered_ts is None else p.delivered_ts for p in recs],
+                                  dtype=np.float64),
+    })
+
+    # route jobs: descriptors + concatenated coordinates
+    jobs = sim.route_jobs()
+    coords = [c for j in jobs for c in j["coords"]]
+    arrays.update({
+        "job_robot": np.array([j["robot_id"] for j in jobs], dtype=np.int64),
+        "job_duration": np.array([j["duration_s"] for j in jobs], dtype=np.float64),
+        "job_progress": np.array([j["progress"] for j in jobs], dtype=np.float64),
+        "job_dwell": np.array([j.get("dwell_s", 0.0) for j in jobs], dtype=np.float64),
+        "job_color": np.array([strings.add(j["route_color"]) for j in jobs], dtype=np.int32),
+        "job_destination": np.array([strings.add(j["destination"]) for j in jobs], dtype=np.int32),
+        "job_coord_offsets": np.cumsum([0] + [len(j["coords"]) for j in jobs]).astype(np.int64),
+        "job_coords": np.array(coords, dtype=np.float64).reshape(len(coords), 2),
+        "job_drop_offsets": np.cumsum([0] + [len(j.get("drops", ())) for j in jobs]).astype(np.int64),
+        "job_drops": np.array([strings.add(d) for j in jobs for d in j.get("drops", ())], dtype=np.int32),
+    })
+
+    blob, offsets = strings.encode()
+    arrays["str_blob"] = blob
+    arrays["str_offsets"] = offsets
+
+    meta = {
+        "ticks": sim.ticks,
+        "date_and_time": sim.date_and_time.isoformat(),
+        "time_per_tick": sim.time_per_tick,
+        "seconds_per_tick": sim.seconds_per_tick,
+        "next_package_id": sim.packages.next_id,
+        "created": time.time(),
+        "robot_count": n,
+        "package_count": len(recs),
+        "message_count": len(msg_id),
+        "route_job_count": len(jobs),
+    }
+    return meta, arrays
+
+
+def save(sim, path: str) -> Dict[str, Any]:
+    """
+    Write the simulation state to path. Returns the meta data.
+    """
+    meta, arrays = _collect(sim)
+
+    table: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        arrays[name] = arr
+        table[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+
+    header = json.dumps({"version": FORMAT_VERSION, "meta": meta, "arrays": table}).encode("utf-8")
+    data_start = -(-(16 + len(header)) // _ALIGN) * _ALIGN
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - 16 - len(header)))
+        for name, arr in arrays.items():
+            f.write(arr.tobytes())
+            f.write(b"\0" * (-arr.nbytes % _ALIGN))
+    os.replace(tmp, path)  # never leave a half written snapshot behind
+    meta["bytes"] = os.path.getsize(path)
+    return meta
+
+
+# -------------------------
+# Load
+# -------------------------
+def read(path: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Read a snapshot file in bulk. Returns (meta, arrays); arrays are views on the file buffer.
+    """
+    with open(path, "rb") as f:
+        buf = f.read()
+    if len(buf) < 16 or buf[:8] != MAGIC:
+        raise SnapshotError("Not a simulation snapshot.")
+    (header_len,) = struct.unpack_from("<Q", buf, 8)
+    header = json.loads(buf[16:16 + header_len].decode("utf-8"))
+    version = header.get("version")
+    if version not in (1, FORMAT_VERSION):
+        raise SnapshotError(f"Unsupported snapshot version {version}.")
+    data_start = -(-(16 + header_len) // _ALIGN) * _ALIGN
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        arrays[name] = np.frombuffer(buf, dtype=dtype, count=count,
+                                     offset=data_start + spec["offset"]).reshape(shape)
+    if version == 1:
+        _upgrade_v1(arrays)
+    return header["meta"], arrays
+
+
+def _upgrade_v1(arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Version 1 route jobs had no dwell time and no drop stops.
+    """
+    jobs = len(arrays["job_robot"])
+    arrays["job_dwell"] = np.zeros(jobs, dtype=np.float64)
+    arrays["job_drop_offsets"] = np.zeros(jobs + 1, dtype=np.int64)
+    arrays["job_drops"] = np.zeros(0, dtype=np.int32)
+
+
+def restore(sim, path: str) -> Dict[str, Any]:
+    """
+    Replace the simulation state with the content of a snapshot file.
+    Running route jobs are stopped; jobs from the snapshot resume where they were.
+    """
+    meta, a = read(path)
+    # the cyclic GC would otherwise run many times while ~1M objects are created
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _restore(sim, path, meta, a)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _restore(sim, path: str, meta: Dict[str, Any], a: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    strings = _decode_strings(a["str_blob"], a["str_offsets"])
+
+    def s(i: int) -> Optional[str]:
+        return None if i < 0 else strings[i]
+
+    # packages (station keys are computed once per distinct string)
+    keys: Dict[int, str] = {}
+
+    def key(i: int) -> str:
+        k = keys.get(i)
+        if k is None:
+            k = keys[i] = station_key(strings[i])
+        return k
+
+    sizes = (PackageSize.SMALL, PackageSize.LARGE)
+    states = tuple(PackageState)
+    records: List[PackageRecord] = []
+    loaded: Dict[int, List[Package]] = {}
+    delivered = a["pkg_delivered"].tolist()
+    for k, (pid, st, de, sz, state, rid, created) in enumerate(zip(
+            a["pkg_id"].tolist(), a["pkg_start"].tolist(), a["pkg_destination"].tolist(),
+            a["pkg_size"].tolist(), a["pkg_state"].tolist(), a["pkg_robot"].tolist(),
+            a["pkg_created"].tolist())):
+        rec = PackageRecord.__new__(PackageRecord)
+        rec.package_id = pid
+        rec.start = strings[st]
+        rec.destination = strings[de]
+        rec.size = sizes[sz]
+        rec.state = states[state]
+        rec.robot_id = None if rid < 0 else rid
+        rec.origin_key = key(st)
+        rec.destination_key = key(de)
+        rec.created_ts = created
+        rec.delivered_ts = None if delivered[k] != delivered[k] else delivered[k]  # NaN -> None
+        records.append(rec)
+        if rec.state is PackageState.LOADED:
+            loaded.setdefault(rid, []).append(rec.to_package())
+
+    # messages, grouped by robot index
+    messages: Dict[int, List[Dict[str, Any]]] = {}
+    ids = a["robot_id"].tolist()
+    for i, mid, ev, tx, pr, ts in zip(a["msg_robot"].tolist(), a["msg_id"].tolist(),
+                                      a["msg_event"].tolist(), a["msg_text"].tolist(),
+                                      a["msg_progress"].tolist(), a["msg_ts"].tolist()):
+        messages.setdefault(i, []).append({
+            "id": mid, "robot_id": ids[i], "event": strings[ev], "text": strings[tx],
+            "progress": pr, "ts": ts,
+        })
+
+    # robots
+    flags = a["robot_flags"].tolist()
+    battery = a["robot_battery"].tolist()
+    led = a["robot_led"].tolist()
+    progress = a["robot_progress"].tolist()
+    lat, lon = a["robot_lat"].tolist(), a["robot_lon"].tolist()
+    odo = a["robot_odometer"].tolist()
+    last_msg = a["robot_last_msg"].tolist()
+    message = a["robot_message"].tolist()
+
+    robots: List[Robot] = []
+    for i, rid in enumerate(ids):
+        f = flags[i]
+        state = {
+            "robot_id": rid,
+            "is_parked": bool(f & _PARKED),
+            "is_door_opened": bool(f & _DOOR),
+            "is_reversing": bool(f & _REVERSING),
+            "is_charging": bool(f & _CHARGING),
+            "battery_status": battery[i],
+            "message": s(message[i]) or "",
+            "led_rgb": tuple(led[i]),
+            "progress": progress[i],
+            "position": None if lat[i] != lat[i] else (lat[i], lon[i]),
+            "_odometer_m": odo[i],
+            "_last_message_id": last_msg[i],
+        }
+        pkgs = loaded.get(rid)
+        if pkgs:
+            large = sum(1 for p in pkgs if p.size is PackageSize.LARGE)
+            state.update(_packages=pkgs, _num_large=large, _num_small=len(pkgs) - large)
+        msgs = messages.get(i)
+        if msgs:
+            state["_messages"] = msgs
+        robots.append(Robot.from_state(state))
+
+    # route jobs
+    offsets = a["job_coord_offsets"].tolist()
+    coords = a["job_coords"].tolist()
+    jobs = []
+    dwell = a["job_dwell"].tolist()
+    drop_offsets = a["job_drop_offsets"].tolist()
+    drops = a["job_drops"].tolist()
+    for j, (rid, dur, prog, color, dest) in enumerate(zip(
+            a["job_robot"].tolist(), a["job_duration"].tolist(), a["job_progress"].tolist(),
+            a["job_color"].tolist(), a["job_destination"].tolist())):
+        jobs.append({
+            "robot_id": rid,
+            "coords": [tuple(c) for c in coords[offsets[j]:offsets[j + 1]]],
+            "duration_s": dur,
+            "progress": prog,
+            "route_color": s(color) or "#d32f2f",
+            "destination": s(dest),
+            "dwell_s": dwell[j],
+            "drops": [s(d) for d in drops[drop_offsets[j]:drop_offsets[j + 1]]],
+        })
+
+    sim.load_state(
+        robots=robots,
+        package_records=records,
+        next_package_id=meta["next_package_id"],
+        ticks=meta["ticks"],
+        date_and_time=dt.datetime.fromisoformat(meta["date_and_time"]),
+        time_per_tick=meta["time_per_tick"],
+        seconds_per_tick=meta["seconds_per_tick"],
+        route_jobs=jobs,
+    )
+    meta["bytes"] = os.path.getsize(path)
+    return meta
+
+
+# -------------------------
+# CLI
+# -------------------------
+def _post(url: str, endpoint: str, name: str) -> None:
+    import urllib.parse
+    import urllib.request
+
+    query = urllib.parse.urlencode({"name": name})
+    req = urllib.request.Request(f"{url.rstrip('/')}{endpoint}?{query}", method="POST")
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        print(resp.read().decode("utf-8"))
+
+
+def _bench(n_robots: int) -> None:
+    from backend.simulation import Simulation
+
+    sim = Simulation()
+    sim.engine.stop()
+    for i in range(n_robots):
+        robot = Robot(robot_id=i, battery_status=50.0 + i % 50)
+        robot.position = (49.0 + (i % 1000) * 1e-5, 8.4 + (i // 1000) * 1e-5)
+        sim.robots.append(robot)
+        sim.packages.add(robot, "Karlsruhe Hauptbahnhof", "Durlach Bahnhof", PackageSize(i % 2))
+        robot.add_message("ROUTE_FINISHED", "Route finished.", 1.0)
+
+    path = os.path.join(SNAPSHOT_DIR, "bench.snap")
+    t0 = time.perf_counter()
+    meta = save(sim, path)
+    t1 = time.perf_counter()
+    restore(sim, path)
+    t2 = time.perf_counter()
+    print(f"robots={n_robots}: save {t1 - t0:.2f} s, restore {t2 - t1:.2f} s, "
+          f"file {meta['bytes'] / 2 ** 20:.1f} MiB")
+    os.remove(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulation snapshots.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("info", help="print the header of a snapshot file")
+    p.add_argument("path")
+    for cmd in ("save", "restore"):
+        p = sub.add_parser(cmd, help=f"{cmd} a named snapshot on a running backend")
+        p.add_argument("name")
+        p.add_argument("--url", default="http://localhost:5000")
+    p = sub.add_parser("bench", help="time save/restore of a synthetic fleet")
+    p.add_argument("--robots", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.cmd == "info":
+        meta, arrays = read(args.path)
+        print(json.dumps(meta, indent=2))
+        for name, arr in arrays.items():
+            print(f"  {name:<18} {arr.dtype.str:<5} {tuple(arr.shape)}")
+    elif args.cmd == "save":
+        _post(args.url, "/api/sim/snapshot", args.name)
+    elif args.cmd == "restore":
+        _post(args.url, "/api/sim/restore", args.name)
+    else:
+        _bench(args.robots)
+
+
+if __name__ == "__main__":
+    main()
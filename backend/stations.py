@@ -0,0 +1,270 @@
+"""
+stations.py
+
+Load and query KVV station (Haltestellen) data from backend/db/KVV_Haltestellen_v2.json.
+
+Besides simple lookups this module provides the station coordinates as numpy arrays,
+a precomputed station-to-station distance matrix and a KD-tree for spatial queries, so
+that other modules (e.g. package assignment, route jobs) can work on station indices
+instead of names.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.geodesy import M_PER_DEG_LAT, M_PER_DEG_LON, haversine_matrix_m
+
+
+_DB_PATH = os.path.join(os.path.dirname(__file__), "db", "KVV_Haltestellen_v2.json")
+
+@lru_cache(maxsize=1)
+def load_kvv_stations() -> List[Dict[str, Any]]:
+    """
+    Load the full KVV station JSON structure.
+
+    Returns:
+        The parsed JSON list; each entry has 'name', 'triasID', 'triasName'
+        and 'coordPositionWGS84'.
+    """
+    with open(_DB_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else []
+
+
+def list_stations() -> List[Dict[str, Any]]:
+    """
+    Return the list of all station objects.
+
+    Returns:
+        A list of dicts, each representing a station.
+    """
+    return load_kvv_stations()
+
+
+def station_coords(station: Dict[str, Any]) -> Tuple[float, float]:
+    """
+    Return the (lat, lon) of a station dict.
+
+    Args:
+        station: Station dict as stored in the JSON file.
+
+    Returns:
+        (lat, lon) as floats.
+    """
+    pos = station.get("coordPositionWGS84", {})
+    return float(pos.get("lat", 0.0)), float(pos.get("long", 0.0))
+
+
+def _normalize(name: str) -> str:
+    name = str(name).strip().lower()
+    if name.endswith(", germany"):
+        name = name[: -len(", germany")].strip()
+    return name
+
+
+@lru_cache(maxsize=1)
+def _name_index() -> Dict[str, int]:
+    """
+    Map normalized triasID / triasName / name to the station index.
+    The first occurrence wins if a key is not unique.
+    """
+    index: Dict[str, int] = {}
+    for key in ("triasID", "triasName", "name"):
+        for i, station in enumerate(load_kvv_stations()):
+            value = station.get(key)
+            if isinstance(value, str):
+                index.setdefault(_normalize(value), i)
+    return index
+
+
+def station_index(query: str) -> Optional[int]:
+    """
+    Find the index of a station by triasID, triasName or short name.
+
+    Matching is case-insensitive and ignores a trailing ", Germany" as well as a
+    leading "Karlsruhe " (e.g. "Karlsruhe Durlach Bahnhof, Germany").
+
+    Args:
+        query: Station id or name.
+
+    Returns:
+        Index into list_stations() or None.
+    """
+    if not isinstance(query, str) or not query.strip():
+        return None
+    key = _normalize(query)
+    index = _name_index()
+    if key in index:
+        return index[key]
+    if key.startswith("karlsruhe "):
+        return index.get(key[len("karlsruhe "):])
+    return None
+
+
+def find_station(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Find a station by triasID, triasName or short name.
+
+    Args:
+        query: Station id or name.
+
+    Returns:
+        The matching station dict or None.
+    """
+    i = station_index(query)
+    return None if i is None else load_kvv_stations()[i]
+
+
+def get_station_by_id(trias_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Find a station by its triasID (e.g. 'de:08212:90').
+
+    Args:
+        trias_id: Full trias id.
+
+    Returns:
+        The matching station dict or None.
+    """
+    trias_id = str(trias_id).strip()
+    for station in load_kvv_stations():
+        if str(station.get("triasID", "")).strip() == trias_id:
+            return station
+    return None
+
+
+@lru_cache(maxsize=1)
+def station_latlon() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return all station coordinates as two float64 arrays (lat, lon) in degrees.
+    """
+    coords = [station_coords(s) for s in load_kvv_stations()]
+    lat = np.array([c[0] for c in coords], dtype=np.float64)
+    lon = np.array([c[1] for c in coords], dtype=np.float64)
+    return lat, lon
+
+
+@lru_cache(maxsize=1)
+def station_distance_matrix() -> np.ndarray:
+    """
+    Precomputed great-circle distances between all stations (meters).
+
+    Returns:
+        float32 array of shape (n_stations, n_stations). Do not modify it.
+    """
+    lat, lon = station_latlon()
+    dist = haversine_matrix_m(lat, lon, lat, lon).astype(np.float32)
+    dist.setflags(write=False)
+    return dist
+
+
+def nearest_station_indices(lats, lons) -> np.ndarray:
+    """
+    Vectorized nearest station lookup.
+
+    Args:
+        lats, lons: Arrays (or lists) of coordinates in degrees.
+
+    Returns:
+        int array with one station index per input point.
+    """
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+    st_lat, st_lon = station_latlon()
+    out = np.empty(len(lats), dtype=np.int64)
+    # chunked, so a large fleet does not build one huge (n, n_stations) matrix
+    chunk = 4096
+    for i in range(0, len(lats), chunk):
+        d = haversine_matrix_m(lats[i:i + chunk], lons[i:i + chunk], st_lat, st_lon)
+        out[i:i + chunk] = np.argmin(d, axis=1)
+    return out
+
+
+# -------------------------
+# Spatial index
+# -------------------------
+@lru_cache(maxsize=1)
+def _projection_origin() -> Tuple[float, float]:
+    lat, lon = station_latlon()
+    return float(lat.mean()), float(lon.mean())
+
+
+def project_xy(lats, lons) -> np.ndarray:
+    """
+    Project coordinates to local planar meters (equirectangular around the KVV area).
+    Accurate to well below a meter over the few kilometers a snap radius covers.
+
+    Returns:
+        float64 array of shape (n, 2) with (x, y) in meters.
+    """
+    lat0, lon0 = _projection_origin()
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+    x = (lons - lon0) * np.cos(np.radians(lat0)) * M_PER_DEG_LON
+    y = (lats - lat0) * M_PER_DEG_LAT
+    return np.column_stack((x, y))
+
+
+@lru_cache(maxsize=1)
+def station_tree():
+    """
+    KD-tree over all stations in projected meters (see project_xy).
+    """
+    from scipy.spatial import cKDTree
+
+    lat, lon = station_latlon()
+    return cKDTree(project_xy(lat, lon))
+
+
+def stations_along_route(coords: List[Tuple[float, float]], cum_m: List[float],
+                         snap_m: float) -> List[Dict[str, Any]]:
+    """
+    Stations that a route passes within snap_m meters, in driving order.
+
+    Every route point is matched to its nearest station with the KD-tree. Consecutive
+    points matched to the same station form one pass; the stop lies at the point of
+    the pass closest to the station.
+
+    Args:
+        coords: (lat, lon) route points (densely resampled).
+        cum_m: Cumulative distance along the route for every point.
+        snap_m: Snap radius in meters.
+
+    Returns:
+        List of dicts with station index, triasID, name, along_m and offset_m
+        (distance between route and station).
+    """
+    if not coords:
+        return []
+    pts = np.asarray(coords, dtype=np.float64)
+    dist, idx = station_tree().query(project_xy(pts[:, 0], pts[:, 1]), distance_upper_bound=snap_m)
+    hit = np.isfinite(dist)
+    if not hit.any():
+        return []
+
+    # split the hits into passes: runs of consecutive points with the same station
+    stations = np.where(hit, idx, -1)
+    change = np.flatnonzero(np.diff(stations) != 0) + 1
+    bounds = np.concatenate(([0], change, [len(stations)]))
+    cum = np.asarray(cum_m, dtype=np.float64)
+    all_stations = load_kvv_stations()
+    stops = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        s = int(stations[a])
+        if s < 0:
+            continue
+        best = a + int(np.argmin(dist[a:b]))
+        station = all_stations[s]
+        stops.append({
+            "station": s,
+            "triasID": station.get("triasID"),
+            "name": station.get("triasName") or station.get("name"),
+            "along_m": float(cum[best]),
+            "offset_m": float(dist[best]),
+        })
+    return stops
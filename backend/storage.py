@@ -0,0 +1,610 @@
+"""
+storage.py
+
+Persistent state backend: robots, packages and robot messages outside the Python
+objects, so the state survives a restart and can be queried without the API.
+
+Backends (KVV_STORE):
+    ""              off (default)
+    memory          MemoryStore: plain dicts behind the same interface (nothing survives)
+    sqlite:<path>   SQLiteStore: one SQLite database in WAL mode
+
+Writes are write-behind. The hot paths only note what changed: Robot.__setattr__ and
+PackageStore add ids to a ChangeSet (robot.track_changes) and Robot.add_message()
+hands the message to the sink, a deque append. A StoreWriter thread wakes every
+FLUSH_INTERVAL_S, turns the changed ids into rows (a robot that moved fifty times is
+written once, with its newest state) and gives rows and queued messages to the store
+as one batch. SQLiteStore writes a batch in one transaction with executemany on fixed
+statements, which the sqlite3 statement cache prepares once per connection. Route
+update threads never wait for the database.
+
+reset() and snapshot restores replace the whole state: StoreWriter.resync() queues a
+marker behind the messages of the old state, and the batch that reaches it clears the
+tables and writes the full fleet in the same transaction.
+
+SQLite schema (readable with the sqlite3 shell while the backend runs):
+    robots    one row per robot (flags, battery, LED, progress, position, odometer)
+    packages  one row per package; indexes (destination_key, state) and (robot_id)
+    messages  primary key (robot_id, message_id), WITHOUT ROWID: a message cursor
+              "robot_id = ? AND message_id > ?" is one range scan
+    meta      clock and id counters (ticks, date_and_time, next_package_id, ...)
+
+On start, Simulation(store=...) loads a stored state back: robots with their newest
+messages, packages and the clock. Route jobs are not stored; robots stay where they
+stopped.
+"""
+
+from __future__ import annotations
+
+import atexit
+import datetime as dt
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from backend.metrics import METRICS
+from backend.package_store import PackageRecord, PackageState
+from backend.packages import PackageSize
+from backend.robot import Robot, track_changes, untrack_changes
+from backend.systems import MAX_MESSAGES_PER_ROBOT
+
+STORE_URL: str = os.environ.get("KVV_STORE", "")
+FLUSH_INTERVAL_S: float = 0.1  # write-behind delay of the StoreWriter
+READERS: int = 4  # pooled read connections of a SQLiteStore
+
+ROBOT_COLUMNS: Tuple[str, ...] = (
+    "robot_id", "is_parked", "is_door_opened", "is_reversing", "is_charging", "battery_status", "message",
+    "led_r", "led_g", "led_b", "progress", "lat", "lon", "odometer_m", "last_message_id", "updated_ts",
+)
+PACKAGE_COLUMNS: Tuple[str, ...] = (
+    "package_id", "start", "destination", "origin_key", "destination_key", "size", "state", "robot_id",
+    "created_ts", "delivered_ts",
+)
+MESSAGE_COLUMNS: Tuple[str, ...] = ("robot_id", "message_id", "event", "text", "progress", "ts")
+
+_SIZES = tuple(PackageSize)
+_STATES = tuple(PackageState)
+
+
+class StoreError(ValueError):
+    """Invalid store configuration."""
+
+
+# -------------------------
+# Rows
+# -------------------------
+def robot_row(robot: Robot, now: float) -> tuple:
+    pos = robot.position
+    r, g, b = robot.led_rgb
+    return (
+        robot.robot_id, int(robot.is_parked), int(robot.is_door_opened), int(robot.is_reversing),
+        int(robot.is_charging), float(robot.battery_status), robot.message, r, g, b, float(robot.progress),
+        None if pos is None else pos[0], None if pos is None else pos[1], robot.odometer_m,
+        robot._last_message_id, now,
+    )
+
+
+def package_row(rec: PackageRecord) -> tuple:
+    return (
+        rec.package_id, rec.start, rec.destination, rec.origin_key, rec.destination_key, rec.size.value,
+        rec.state.value, rec.robot_id, rec.created_ts, rec.delivered_ts,
+    )
+
+
+def message_row(msg: Dict[str, Any]) -> tuple:
+    return msg["robot_id"], msg["id"], msg["event"], msg["text"], msg["progress"], msg["ts"]
+
+
+def robot_state(row: tuple) -> Dict[str, Any]:
+    """
+    Field values for Robot.from_state() (packages and messages are added by the caller).
+    """
+    (rid, parked, door, reversing, charging, battery, message, r, g, b, progress, lat, lon, odometer,
+     last_message_id, _) = row
+    return {
+        "robot_id": rid,
+        "is_parked": bool(parked),
+        "is_door_opened": bool(door),
+        "is_reversing": bool(reversing),
+        "is_charging": bool(charging),
+        "battery_status": battery,
+        "message": message or "",
+        "led_rgb": (r, g, b),
+        "progress": progress,
+        "position": None if lat is None else (lat, lon),
+        "_odometer_m": odometer,
+        "_last_message_id": last_message_id,
+    }
+
+
+def package_record(row: tuple) -> PackageRecord:
+    rec = PackageRecord.__new__(PackageRecord)  # station keys are stored, no lookup
+    (rec.package_id, rec.start, rec.destination, rec.origin_key, rec.destination_key, size, state,
+     rec.robot_id, rec.created_ts, rec.delivered_ts) = row
+    rec.size = _SIZES[size]
+    rec.state = _STATES[state]
+    return rec
+
+
+def message_dict(row: tuple) -> Dict[str, Any]:
+    rid, mid, event, text, progress, ts = row
+    return {"id": mid, "robot_id": rid, "event": event, "text": text, "progress": progress, "ts": ts}
+
+
+# -------------------------
+# Backends
+# -------------------------
+class StateStore:
+    """
+    Interface of a storage backend. write() is only called by the StoreWriter thread;
+    the queries may run on any thread.
+    """
+    kind = "none"
+
+    def write(self, robots: List[tuple], packages: List[tuple], removed_packages: List[int],
+              messages: List[tuple], meta: Dict[str, str], clear: bool = False) -> None:
+        """
+        Apply one batch atomically; with clear=True the previous content is dropped first.
+        """
+        raise NotImplementedError
+
+    def load(self, messages_per_robot: int = MAX_MESSAGES_PER_ROBOT) -> Optional[Dict[str, Any]]:
+        """
+        The stored state as {"meta", "robots", "packages", "messages"} (rows; messages
+        grouped by robot id, the newest `messages_per_robot` each), None if empty.
+        """
+        raise NotImplementedError
+
+    def robot(self, robot_id: int) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def packages_to(self, destination_key: str, state: Optional[PackageState] = None,
+                    limit: int = 100) -> List[PackageRecord]:
+        """Packages for a destination station key, ordered by package_id."""
+        raise NotImplementedError
+
+    def messages(self, robot_id: int, since_message_id: int, before_message_id: Optional[int] = None,
+                 limit: int = 1000) -> List[Dict[str, Any]]:
+        """Messages of a robot after a cursor, oldest first (same dicts as Robot messages)."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"kind": self.kind}
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStore(StateStore):
+    """
+    Dict-backed store; queries scan. For tests and runs that need no persistence.
+    """
+    kind = "memory"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._robots: Dict[int, tuple] = {}
+        self._packages: Dict[int, tuple] = {}
+        self._messages: Dict[int, List[tuple]] = {}
+        self._meta: Dict[str, str] = {}
+
+    def write(self, robots, packages, removed_packages, messages, meta, clear=False) -> None:
+        with self._lock:
+            if clear:
+                self._robots, self._packages, self._messages, self._meta = {}, {}, {}, {}
+            for row in robots:
+                self._robots[row[0]] = row
+            for row in packages:
+                self._packages[row[0]] = row
+            for package_id in removed_packages:
+                self._packages.pop(package_id, None)
+            for row in messages:
+                log = self._messages.setdefault(row[0], [])
+                if not log or log[-1][1] < row[1]:  # ids only grow; skip rows written twice
+                    log.append(row)
+            self._meta.update(meta)
+
+    def load(self, messages_per_robot: int = MAX_MESSAGES_PER_ROBOT) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._robots and not self._meta:
+                return None
+            return {
+                "meta": dict(self._meta),
+                "robots": [self._robots[i] for i in sorted(self._robots)],
+                "packages": [self._packages[i] for i in sorted(self._packages)],
+                "messages": {rid: log[-messages_per_robot:] for rid, log in self._messages.items()
+                             if messages_per_robot > 0},
+            }
+
+    def robot(self, robot_id: int) -> Optional[Dict[str, Any]]:
+        row = self._robots.get(robot_id)
+        return None if row is None else dict(zip(ROBOT_COLUMNS, row))
+
+    def packages_to(self, destination_key, state=None, limit=100) -> List[PackageRecord]:
+        with self._lock:
+            rows = [row for row in self._packages.values()
+                    if row[4] == destination_key and (state is None or row[6] == state.value)]
+        return [package_record(row) for row in sorted(rows)[:limit]]
+
+    def messages(self, robot_id, since_message_id, before_message_id=None, limit=1000) -> List[Dict[str, Any]]:
+        with self._lock:
+            log = list(self._messages.get(robot_id, ()))
+        return [message_dict(row) for row in log
+                if row[1] > since_message_id and (before_message_id is None or row[1] < before_message_id)][:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "robots": len(self._robots), "packages": len(self._packages),
+                "messages": sum(len(log) for log in self._messages.values())}
+
+
+def _columns(names: Tuple[str, ...]) -> str:
+    return ", ".join(names)
+
+
+def _placeholders(names: Tuple[str, ...]) -> str:
+    return ", ".join("?" * len(names))
+
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS robots (
+    robot_id INTEGER PRIMARY KEY, is_parked INTEGER, is_door_opened INTEGER, is_reversing INTEGER,
+    is_charging INTEGER, battery_status REAL, message TEXT, led_r INTEGER, led_g INTEGER, led_b INTEGER,
+    progress REAL, lat REAL, lon REAL, odometer_m REAL, last_message_id INTEGER, updated_ts REAL
+);
+CREATE TABLE IF NOT EXISTS packages (
+    package_id INTEGER PRIMARY KEY, start TEXT, destination TEXT, origin_key TEXT, destination_key TEXT,
+    size INTEGER, state INTEGER, robot_id INTEGER, created_ts REAL, delivered_ts REAL
+);
+CREATE INDEX IF NOT EXISTS packages_destination ON packages (destination_key, state);
+CREATE INDEX IF NOT EXISTS packages_robot ON packages (robot_id) WHERE robot_id IS NOT NULL;
+CREATE TABLE IF NOT EXISTS messages (
+    robot_id INTEGER, message_id INTEGER, event TEXT, text TEXT, progress REAL, ts REAL,
+    PRIMARY KEY (robot_id, message_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_UPSERT_ROBOT = f"INSERT OR REPLACE INTO robots ({_columns(ROBOT_COLUMNS)}) VALUES ({_placeholders(ROBOT_COLUMNS)})"
+_UPSERT_PACKAGE = (f"INSERT OR REPLACE INTO packages ({_columns(PACKAGE_COLUMNS)}) "
+                   f"VALUES ({_placeholders(PACKAGE_COLUMNS)})")
+_DELETE_PACKAGE = "DELETE FROM packages WHERE package_id = ?"
+_INSERT_MESSAGE = (f"INSERT OR REPLACE INTO messages ({_columns(MESSAGE_COLUMNS)}) "
+                   f"VALUES ({_placeholders(MESSAGE_COLUMNS)})")
+_UPSERT_META = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+
+
+class SQLiteStore(StateStore):
+    """
+    SQLite database in WAL mode: the writer commits while readers keep reading.
+
+    Args:
+        path: Database file (created with its directory if missing).
+        synchronous: PRAGMA synchronous; NORMAL only syncs at checkpoints (a crash can
+            lose the last batches, never corrupt the file), FULL syncs every batch.
+    """
+    kind = "sqlite"
+
+    def __init__(self, path: str, synchronous: str = "NORMAL"):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.synchronous = synchronous
+        self._db = self._connect()  # used by the writer thread only (after load())
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={synchronous}")
+        self._db.executescript(_SCHEMA)
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self.batches = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA busy_timeout=5000")
+        return db
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._readers_lock:
+            db = self._readers.pop() if self._readers else None
+        if db is None:
+            db = self._connect()
+            db.execute("PRAGMA query_only=1")
+        try:
+            return db.execute(sql, params).fetchall()
+        finally:
+            with self._readers_lock:
+                if len(self._readers) < READERS:
+                    self._readers.append(db)
+                    db = None
+            if db is not None:
+                db.close()
+
+    def write(self, robots, packages, removed_packages, messages, meta, clear=False) -> None:
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if clear:
+                for table in ("robots", "packages", "messages", "meta"):
+                    db.execute(f"DELETE FROM {table}")
+            if robots:
+                db.executemany(_UPSERT_ROBOT, robots)
+            if packages:
+                db.executemany(_UPSERT_PACKAGE, packages)
+            if removed_packages:
+                db.executemany(_DELETE_PACKAGE, [(i,) for i in removed_packages])
+            if messages:
+                db.executemany(_INSERT_MESSAGE, messages)
+            if meta:
+                db.executemany(_UPSERT_META, meta.items())
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.batches += 1
+
+    def load(self, messages_per_robot: int = MAX_MESSAGES_PER_ROBOT) -> Optional[Dict[str, Any]]:
+        meta = dict(self._query("SELECT key, value FROM meta"))
+        robots = self._query(f"SELECT {_columns(ROBOT_COLUMNS)} FROM robots ORDER BY robot_id")
+        if not robots and not meta:
+            return None
+        packages = self._query(f"SELECT {_columns(PACKAGE_COLUMNS)} FROM packages ORDER BY package_id")
+        messages: Dict[int, List[tuple]] = {}
+        if messages_per_robot > 0:
+            rows = self._query(
+                f"SELECT {_columns(MESSAGE_COLUMNS)} FROM ("
+                f"SELECT *, ROW_NUMBER() OVER (PARTITION BY robot_id ORDER BY message_id DESC) AS n FROM messages"
+                f") WHERE n <= ? ORDER BY robot_id, message_id", (messages_per_robot,))
+            for row in rows:
+                messages.setdefault(row[0], []).append(row)
+        return {"meta": meta, "robots": robots, "packages": packages, "messages": messages}
+
+    def robot(self, robot_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._query(f"SELECT {_columns(ROBOT_COLUMNS)} FROM robots WHERE robot_id = ?", (robot_id,))
+        return dict(zip(ROBOT_COLUMNS, rows[0])) if rows else None
+
+    def packages_to(self, destination_key, state=None, limit=100) -> List[PackageRecord]:
+        sql = f"SELECT {_columns(PACKAGE_COLUMNS)} FROM packages WHERE destination_key = ?"
+        params: tuple = (destination_key,)
+        if state is not None:
+            sql += " AND state = ?"
+            params += (state.value,)
+        rows = self._query(sql + " ORDER BY package_id LIMIT ?", params + (int(limit),))
+        return [package_record(row) for row in rows]
+
+    def messages(self, robot_id, since_message_id, before_message_id=None, limit=1000) -> List[Dict[str, Any]]:
+        before = (1 << 63) - 1 if before_message_id is None else int(before_message_id)
+        rows = self._query(
+            f"SELECT {_columns(MESSAGE_COLUMNS)} FROM messages "
+            f"WHERE robot_id = ? AND message_id > ? AND message_id < ? ORDER BY message_id LIMIT ?",
+            (int(robot_id), int(since_message_id), before, int(limit)))
+        return [message_dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        robots, packages = self._query("SELECT (SELECT COUNT(*) FROM robots), (SELECT COUNT(*) FROM packages)")[0]
+        return {"kind": self.kind, "path": self.path, "bytes": size, "synchronous": self.synchronous,
+                "robots": robots, "packages": packages}
+
+    def close(self) -> None:
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for db in readers:
+            db.close()
+        self._db.close()
+
+
+def open_store(url: str) -> Optional[StateStore]:
+    """
+    Backend for a KVV_STORE value ("" -> None, "memory", "sqlite:<path>").
+    """
+    if not url:
+        return None
+    if url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:"):
+        path = url[len("sqlite:"):]
+        if not path:
+            raise StoreError("KVV_STORE=sqlite:<path> needs a database path.")
+        return SQLiteStore(path)
+    raise StoreError(f"Unknown KVV_STORE {url!r} (use 'memory' or 'sqlite:<path>').")
+
+
+# -------------------------
+# Write-behind
+# -------------------------
+_RESYNC = object()  # queue marker: the simulation state was replaced
+
+
+class StoreWriter:
+    """
+    Background thread that writes the changes of a simulation to a StateStore.
+
+    Args:
+        sim: The Simulation (robots, packages, clock).
+        store: Backend to write to.
+        interval_s: Time between batches.
+    """
+
+    def __init__(self, sim, store: StateStore, interval_s: float = FLUSH_INTERVAL_S):
+        self.sim = sim
+        self.store = store
+        self.interval_s = float(interval_s)
+        self._queue: Deque[Any] = deque()  # messages and _RESYNC markers, in order
+        self._robot_changes = track_changes()
+        self._package_changes = sim.packages.track_changes()
+        self._meta: Dict[str, str] = {}  # meta values in the store
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.rows_written = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_batch_ms = 0.0
+
+    def append(self, msg: Dict[str, Any]) -> None:
+        """
+        Queue one message (the message sink: a single deque append).
+        """
+        self._queue.append(msg)
+
+    def resync(self) -> None:
+        """
+        The simulation state was replaced: the next batch rewrites the store from scratch.
+        """
+        self._queue.append(_RESYNC)
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name="store-writer", daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def close(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+        untrack_changes(self._robot_changes)
+        self.sim.packages.untrack_changes(self._package_changes)
+        self.store.close()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.flush()
+            except (sqlite3.Error, OSError) as e:
+                self.errors += 1
+                self.last_error = repr(e)
+
+    def _meta_values(self) -> Dict[str, str]:
+        sim = self.sim
+        return {
+            "ticks": str(sim.ticks),
+            "date_and_time": sim.date_and_time.isoformat(),
+            "time_per_tick": str(sim.time_per_tick),
+            "seconds_per_tick": str(sim.seconds_per_tick),
+            "next_package_id": str(sim.packages.next_id),
+        }
+
+    def flush(self) -> int:
+        """
+        Write everything changed since the last batch. Returns the number of rows.
+        """
+        with self._write_lock:
+            t0 = time.perf_counter()
+            clear = False
+            queued: List[Dict[str, Any]] = []
+            queue = self._queue
+            while queue:
+                item = queue.popleft()
+                if item is _RESYNC:
+                    clear, queued = True, []  # older messages belong to the replaced state
+                else:
+                    queued.append(item)
+
+            sim = self.sim
+            fleet = sim.robots
+            robot_ids = self._robot_changes.pop()
+            package_ids = self._package_changes.pop()
+            if clear:
+                robots = list(fleet)
+                records = sim.packages.records()
+                removed: List[int] = []
+                queued = [m for robot in robots for m in robot.get_messages_since(0)[1]] + queued
+            else:
+                robots = [fleet[i] for i in robot_ids if i < len(fleet)]
+                records, removed = [], []
+                for package_id in package_ids:
+                    rec = sim.packages.get(package_id)
+                    if rec is None:
+                        removed.append(package_id)
+                    else:
+                        records.append(rec)
+
+            meta = self._meta_values()
+            changed_meta = meta if clear else {k: v for k, v in meta.items() if self._meta.get(k) != v}
+            if not (clear or robots or records or removed or queued or changed_meta):
+                return 0
+
+            now = time.time()
+            robot_rows = [robot_row(robot, now) for robot in robots]
+            package_rows = [package_row(rec) for rec in records]
+            message_rows = [message_row(m) for m in queued]
+            try:
+                self.store.write(robot_rows, package_rows, removed, message_rows, changed_meta, clear=clear)
+            except BaseException:
+                # keep the batch for the next attempt
+                self._robot_changes.ids.update(robot_ids)
+                self._package_changes.ids.update(package_ids)
+                queue.extendleft(reversed(queued))
+                if clear:
+                    queue.appendleft(_RESYNC)
+                raise
+            self._meta.update(changed_meta)
+
+            rows = len(robot_rows) + len(package_rows) + len(removed) + len(message_rows)
+            seconds = time.perf_counter() - t0
+            METRICS.observe("kvv_store_batch_seconds", seconds)
+            self.batches += 1
+            self.rows_written += rows
+            self.last_batch_ms = seconds * 1000.0
+            return rows
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            self.store.stats(),
+            enabled=True,
+            queued_messages=len(self._queue),
+            pending_robots=len(self._robot_changes),
+            pending_packages=len(self._package_changes),
+            batches=self.batches,
+            rows_written=self.rows_written,
+            last_batch_ms=round(self.last_batch_ms, 3),
+            interval_ms=self.interval_s * 1000.0,
+            errors=self.errors,
+            last_error=self.last_error,
+        )
+
+
+def load_stored_state(sim, stored: Dict[str, Any]) -> int:
+    """
+    Replace the simulation state with a state returned by StateStore.load().
+    Returns the number of restored robots.
+    """
+    records = [package_record(row) for row in stored["packages"]]
+    loaded: Dict[int, list] = {}
+    for rec in records:
+        if rec.state is PackageState.LOADED:
+            loaded.setdefault(rec.robot_id, []).append(rec.to_package())
+    messages = stored["messages"]
+    robots: List[Robot] = []
+    for row in stored["robots"]:
+        state = robot_state(row)
+        rid = state["robot_id"]
+        pkgs = loaded.get(rid)
+        if pkgs:
+            large = sum(1 for p in pkgs if p.size is PackageSize.LARGE)
+            state.update(_packages=pkgs, _num_large=large, _num_small=len(pkgs) - large)
+        msgs = messages.get(rid)
+        if msgs:
+            state["_messages"] = [message_dict(m) for m in msgs]
+        robots.append(Robot.from_state(state))
+
+    meta = stored["meta"]
+    date_and_time = meta.get("date_and_time")
+    sim.load_state(
+        robots=robots,
+        package_records=records,
+        next_package_id=int(meta.get("next_package_id", max((r.package_id for r in records), default=0))),
+        ticks=int(meta.get("ticks", 0)),
+        date_and_time=dt.datetime.fromisoformat(date_and_time) if date_and_time else dt.datetime.now(),
+        time_per_tick=int(meta.get("time_per_tick", sim.time_per_tick)),
+        seconds_per_tick=int(meta.get("seconds_per_tick", sim.seconds_per_tick)),
+        route_jobs=[],
+    )
+    return len(robots)
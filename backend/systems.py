@@ -0,0 +1,70 @@
+"""
+systems.py
+
+Per-tick batch systems for the TickEngine (see tick_engine.py).
+Every system is called once per tick with the Simulation and a TickContext and
+processes the whole fleet in one pass; no per-robot threads are involved.
+"""
+
+from __future__ import annotations
+
+from backend.tick_engine import TickContext
+
+
+MAX_MESSAGES_PER_ROBOT: int = 500
+
+
+def battery_drain_system(sim, ctx: TickContext) -> None:
+    """
+    Drain (or charge) all batteries; see EnergyModel.drain() in energy.py.
+    """
+    sim.energy.drain(sim.robots, ctx)
+
+
+def charging_system(sim, ctx: TickContext) -> None:
+    """
+    Send low-battery robots to chargers; see ChargerScheduler in energy.py.
+    """
+    sim.energy.schedule(sim.robots, ctx)
+
+
+def delivery_system(sim, ctx: TickContext) -> None:
+    """
+    Unload packages for all robots that arrived at a station since the last tick.
+    """
+    sim.process_arrivals()
+
+
+def message_retention_system(sim, ctx: TickContext) -> None:
+    """
+    Keep only the newest MAX_MESSAGES_PER_ROBOT messages of every robot. Older messages
+    can afterwards only be read back from the journal or the persistent store
+    (Simulation.message_history); a simulation without either loses them.
+    """
+    for robot in list(sim.robots):
+        robot.trim_messages(MAX_MESSAGES_PER_ROBOT)
+
+
+def trajectory_system(sim, ctx: TickContext) -> None:
+    """
+    Record the positions of all moving robots (and where they stop); see TrajectoryStore
+    in trajectory.py.
+    """
+    sim.trajectories.record(sim.robots)
+
+
+def conflicts_system(sim, ctx: TickContext) -> None:
+    """
+    Detect robots closer than the headway and hold followers; see conflicts.py.
+    """
+    sim.held_robots = sim.conflicts.step(sim)
+
+
+DEFAULT_SYSTEMS = (
+    ("battery_drain", battery_drain_system),
+    ("charging", charging_system),
+    ("delivery", delivery_system),
+    ("message_retention", message_retention_system),
+    ("trajectory", trajectory_system),
+    ("conflicts", conflicts_system),
+)
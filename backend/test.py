@@ -14,8 +14,8 @@ This module tests the API endpoints and functionalities, including:
 - Map retrieval and route generation
 - Package creation with various scenarios
 """
+import json
 import unittest
-from joblib import PrintTime
 import requests
 #import test
 
@@ -57,6 +57,55 @@ class TestAPIModule(unittest.TestCase):
         self.assertEqual(response.json(), {"message": "Hello World"})
         
         print("GET request successful.")
+
+    def test_ready(self):
+        """
+        Tests the readiness endpoint and the ready flag of the heartbeat.
+        """
+        response = requests.get(URL.rsplit("/api", 1)[0] + "/ready", timeout=TIMEOUT)
+        self.assertIn(response.status_code, (200, 503))
+        data = response.json()
+        self.assertEqual(data["ready"], response.status_code == 200)
+        self.assertIn("stations", data["stages"])
+        self.assertIsInstance(get_request("/sim/heartbeat").json()["ready"], bool)
+
+        print("Readiness tested.")
+
+    def test_debug_metrics(self):
+        """
+        Tests that requests show up in the Prometheus metrics.
+        """
+        get_request("/hello")
+        response = get_request("/debug/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        text = response.text
+        self.assertIn("# TYPE kvv_http_request_duration_seconds histogram", text)
+        self.assertIn('route="/api/hello"', text)
+        self.assertIn("kvv_robots ", text)
+        self.assertIn("kvv_route_jobs_active ", text)
+
+        print("Debug metrics tested.")
+
+    def test_debug_profile(self):
+        """
+        Tests a short sampling session (or that profiling is disabled without KVV_PROFILING=1).
+        """
+        response = requests.post(URL + "/debug/profile/start", json={"mode": "sample", "seconds": 5},
+                                 timeout=TIMEOUT)
+        if response.status_code == 403:
+            self.assertIn("error", response.json())
+            print("Profiling disabled.")
+            return
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["running"])
+        get_request("/hello")
+        response = post_request("/debug/profile/stop")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("MainThread", response.text)
+        self.assertEqual(post_request("/debug/profile/stop").status_code, 409)
+
+        print("Debug profiling tested.")
     
     def test_robot_create(self, test_count: int = 1):
         """
@@ -172,6 +221,56 @@ class TestAPIModule(unittest.TestCase):
 
         print("Robot status flags tested.")
     
+    def test_robot_read_hot_fields(self):
+        """
+        Tests that the cached full status and the hot status are both valid JSON.
+        """
+        robot_id = post_request("/robot/create").json()["robot_id"]
+
+        full = get_request("/robot/read", params={"robot_id": robot_id}).json()
+        self.assertIn("version", full["status"])
+        self.assertIn("packages", full["status"])
+        self.assertIsInstance(full["messages"], list)
+
+        hot = get_request("/robot/read", params={"robot_id": robot_id, "fields": "hot"}).json()
+        self.assertEqual(set(hot["status"]), {"robot_id", "progress", "position"})
+
+        print("Robot read (hot fields) tested.")
+
+    def test_robot_trajectory(self):
+        """
+        Tests the trajectory query and replay endpoints for a robot that has not moved.
+        """
+        robot_id = post_request("/robot/create").json()["robot_id"]
+
+        response = get_request("/robot/trajectory", params={"robot_id": robot_id, "max_points": 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 0)
+        self.assertEqual(response.json()["samples"], [])
+
+        response = get_request("/robot/trajectory/replay", params={"robot_id": robot_id, "speed": 10})
+        self.assertEqual(response.status_code, 404)
+        response = get_request("/robot/trajectory", params={"robot_id": robot_id, "start": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+        print("Robot trajectory tested.")
+
+    def test_robot_plan(self):
+        """
+        Tests the delivery route planner: robots without packages get no plan and
+        unknown robots are rejected.
+        """
+        robot_id = post_request("/robot/create").json()["robot_id"]
+        response = requests.post(URL + "/robot/plan", json={"robot_ids": [robot_id], "start": False},
+                                 timeout=TIMEOUT)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 0)
+
+        response = requests.post(URL + "/robot/plan", json={"robot_ids": [999999]}, timeout=TIMEOUT)
+        self.assertEqual(response.status_code, 404)
+
+        print("Robot plan tested.")
+
     @unittest.skip("delete endpoint not implemented")
     def test_delete_robot_by_id(self):
         """Test if a robot is deletable by his ID via /robot/delete/<robot_id> endpoint.
@@ -255,6 +354,219 @@ class TestAPIModuleSim(unittest.TestCase):
         
         print("Simulation heartbeat tested.")
 
+    def test_tick_stats(self):
+        """
+        Tests that the tick engine reports its systems and overruns.
+        """
+        response = get_request("/sim/tick_stats")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIsInstance(data["overruns"], int)
+        for name in ("battery_drain", "charging", "delivery", "message_retention"):
+            self.assertIn(name, data["systems"])
+
+        print("Tick stats tested.")
+
+    def test_chargers(self):
+        """
+        Tests the charger overview.
+        """
+        response = get_request("/sim/chargers")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(len(data["chargers"]) > 0)
+        self.assertIsInstance(data["queue_length"], int)
+
+        print("Chargers tested.")
+
+    def test_snapshot_restore(self):
+        """
+        Tests that a saved snapshot brings back the robots after a reset.
+        """
+        post_request("/sim/reset")
+        post_request("/robot/create", params={"battery_status": 42})
+        post_request("/robot/create")
+
+        response = post_request("/sim/snapshot", params={"name": "unittest"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["meta"]["robot_count"], 2)
+
+        post_request("/sim/reset")
+        response = post_request("/sim/restore", params={"name": "unittest"})
+        self.assertEqual(response.status_code, 200)
+        status = get_request("/robot/read", params={"robot_id": 0}).json()["status"]
+        self.assertEqual(status["battery_status"], 42)
+
+        self.assertEqual(post_request("/sim/restore", params={"name": "missing"}).status_code, 404)
+
+        print("Snapshot and restore tested.")
+
+    def test_journal_stats(self):
+        """
+        Tests the message journal overview.
+        """
+        response = get_request("/sim/journal")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIsInstance(data["last_seq"], int)
+        self.assertTrue(data["epoch"] >= 1)
+
+        print("Journal stats tested.")
+
+    def test_shared_state(self):
+        """
+        Tests the shared fleet state overview (404 unless the backend runs with KVV_SHARED_STATE).
+        """
+        response = get_request("/sim/shared_state")
+        self.assertIn(response.status_code, (200, 404))
+        data = response.json()
+        if response.status_code == 404:
+            self.assertIn("error", data)
+        else:
+            self.assertTrue(data["enabled"])
+            self.assertTrue(data["published"] <= data["capacity"])
+
+        print("Shared state tested.")
+
+    def test_shared_state_round_trip(self):
+        """
+        Tests that a worker view of the shared fleet state reads what the owner published
+        (in-process, independent of how the backend under test was started).
+        """
+        import os
+        import tempfile
+        from backend.robot import Robot
+        from backend.shared_state import SharedSimulation
+        from backend.simulation import Simulation
+
+        name = f"kvv-test-{os.getpid()}"
+        robots = [Robot(i) for i in range(3)]
+        journal_dir = tempfile.mkdtemp(prefix="kvv-test-journal-")
+        sim = Simulation(journal_dir=journal_dir, shared_state=name)
+        try:
+            sim.engine.stop()
+            sim.reset()  # own fleet list
+            sim.robots.extend(robots)
+            robots[1].reset_progress(49.0094, 8.4044)
+            robots[1].battery_status = 42.0
+            robots[1].add_message("ROUTE_TICK", "moved", 0.5)
+            sim.journal.flush()
+            sim.publisher.publish()
+
+            view = SharedSimulation(name, journal_dir)
+            try:
+                self.assertEqual(len(view.robots), 3)
+                for robot in robots:
+                    self.assertEqual(view.robots[robot.robot_id].to_dict(), json.loads(robot.to_json()))
+                last_id, messages = view.robots[1].get_messages_since(0)
+                self.assertEqual(last_id, robots[1].get_messages_since(0)[0])
+                self.assertEqual(messages[-1]["event"], "ROUTE_TICK")
+            finally:
+                view.close()
+        finally:
+            sim.close()
+
+        print("Shared state round trip tested.")
+
+    def test_store(self):
+        """
+        Tests the persistent store overview (404 unless the backend runs with KVV_STORE).
+        """
+        response = get_request("/sim/store")
+        self.assertIn(response.status_code, (200, 404))
+        data = response.json()
+        if response.status_code == 404:
+            self.assertIn("error", data)
+        else:
+            self.assertTrue(data["enabled"])
+            self.assertIn(data["kind"], ("memory", "sqlite"))
+            self.assertEqual(data["errors"], 0)
+
+        print("Store tested.")
+
+    def test_store_restart(self):
+        """
+        Tests that a SQLite store brings robots, packages and messages back after a restart
+        (in-process, independent of how the backend under test was started).
+        """
+        import os
+        import tempfile
+        from backend.packages import PackageSize
+        from backend.robot import Robot
+        from backend.simulation import Simulation
+        from backend.storage import SQLiteStore
+
+        path = os.path.join(tempfile.mkdtemp(prefix="kvv-test-store-"), "state.db")
+        robots = [Robot(i) for i in range(2)]
+        sim = Simulation(store=SQLiteStore(path))
+        sim.engine.stop()
+        sim.reset()  # own fleet list
+        sim.robots.extend(robots)
+        robots[0].reset_progress(49.0094, 8.4044)
+        robots[0].battery_status = 37.0
+        robots[0].add_message("ROUTE_TICK", "moved", 0.25)
+        rec = sim.packages.add(robots[1], "Karlsruhe Hauptbahnhof", "Durlach Bahnhof", PackageSize.SMALL)
+        sim.store_writer.flush()
+        sim.close()
+
+        restored = Simulation(store=SQLiteStore(path))
+        try:
+            restored.engine.stop()
+            self.assertEqual(len(restored.robots), 2)
+            self.assertEqual(restored.robots[0].battery_status, 37.0)
+            self.assertEqual(restored.robots[0].position, (49.0094, 8.4044))
+            self.assertEqual(restored.robots[0].get_messages_since(0)[1][-1]["event"], "ROUTE_TICK")
+            self.assertEqual([p.package_id for p in restored.robots[1].packages], [rec.package_id])
+            self.assertEqual(restored.packages.get(rec.package_id).destination, "Durlach Bahnhof")
+        finally:
+            restored.close()
+
+        print("Store restart tested.")
+
+    def test_conflicts(self):
+        """
+        Tests the conflict overview.
+        """
+        response = get_request("/sim/conflicts")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["headway_m"], 30.0)
+        self.assertIsInstance(data["active"], list)
+
+        print("Conflicts tested.")
+
+    def test_jobs(self):
+        """
+        Tests the route job list and the job controls.
+        """
+        response = get_request("/sim/jobs")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIsInstance(data["jobs"], list)
+        self.assertIn("active", data["stats"])
+
+        # unknown jobs cannot be controlled
+        response = post_request("/sim/jobs/999999/cancel")
+        self.assertEqual(response.status_code, 404)
+
+        print("Jobs tested.")
+
+class TestAPIModuleStations(unittest.TestCase):
+    def test_station_eta(self):
+        """
+        Tests the ETA board of a station.
+        """
+        response = get_request("/stations/de:08212:90/eta", params={"limit": 5})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["station"]["triasID"], "de:08212:90")
+        self.assertIsInstance(data["arrivals"], list)
+
+        self.assertEqual(get_request("/stations/unknown-station/eta").status_code, 404)
+        self.assertEqual(get_request("/stations/de:08212:90/eta", params={"limit": "x"}).status_code, 400)
+
+        print("Station ETA board tested.")
+
 class TestAPIModuleMap(unittest.TestCase):
     def test_map_GET(self):
         """
@@ -296,6 +608,20 @@ class TestAPIModuleMap(unittest.TestCase):
 
         print("Map route POST request (success) tested.")
 
+    def test_map_graphs(self):
+        """
+        Tests the graph cache overview.
+        """
+        response = get_request("/map/graphs")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIsInstance(data["cities"], list)
+        self.assertTrue(data["bytes"] <= data["budget_bytes"] or len(data["cities"]) == 1)
+        for key in ("hits", "coalesced", "disk_loads", "downloads", "evictions"):
+            self.assertGreaterEqual(data[key], 0)
+
+        print("Map graphs tested.")
+
     def test_map_lines(self):
         """
         Tests map/lines endpoint by checking if the response contains a list of lines.
@@ -313,6 +639,38 @@ class TestAPIModuleMap(unittest.TestCase):
 
         print("Map lines tested")
 
+    def test_map_matrix_invalid(self):
+        """
+        Tests that the distance matrix rejects missing origins and unknown stations
+        (both are checked before the road network is loaded).
+        """
+        response = requests.post(URL + "/map/matrix", json={}, timeout=TIMEOUT)
+        self.assertEqual(response.status_code, 400)
+
+        response = requests.post(URL + "/map/matrix", json={"origins": ["No Such Station"]}, timeout=TIMEOUT)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Unknown station", response.json()["error"])
+
+        print("Map matrix (invalid input) tested")
+
+    def test_map_dispatch_invalid(self):
+        """
+        Tests that batch dispatch validates every request before routing anything.
+        """
+        response = requests.post(URL + "/map/dispatch", json={"routes": []}, timeout=TIMEOUT)
+        self.assertEqual(response.status_code, 400)
+
+        robot_id = post_request("/robot/create").json()["robot_id"]
+        routes = [
+            {"robot_id": robot_id, "start": "Karlsruhe Hauptbahnhof", "end": "Durlach Bahnhof"},
+            {"robot_id": robot_id, "start": "Karlsruhe Hauptbahnhof", "end": "No Such Station"},
+        ]
+        response = requests.post(URL + "/map/dispatch", json={"routes": routes}, timeout=TIMEOUT)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["index"] for e in response.json()["errors"]], [1])
+
+        print("Map dispatch (invalid input) tested")
+
         # ---------------- PACKAGE API TESTS (NEU) ----------------
 
     def test_create_package_no_robots(self):
@@ -329,12 +687,7 @@ class TestAPIModuleMap(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertIn("error", response.json())
 
-    @unittest.skip("pkg/create endpoint currently unstable (500 Internal Server Error) – fix after submission")
     def test_create_package_success(self):
-    # NOTE:
-    # This test is skipped because the pkg/create endpoint currently throws
-    # an internal server error (500) for valid input.
-    # The issue is in backend logic, not in the test itself.
     # Roboter erstellen 
         requests.post(
             "http://localhost:5000/api/robot/create",
@@ -412,5 +765,70 @@ class TestAPIModuleMap(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("error", response.json())
 
+    def test_assign_packages(self):
+        """
+        Assigns a batch of packages and checks that no robot gets more than its capacity.
+        """
+        post_request("/sim/reset")
+        post_request("/robot/create")
+        post_request("/robot/create")
+
+        packages = [
+            {"start": "Karlsruhe Hauptbahnhof", "destination": "Durlach Bahnhof", "size": 1}
+            for _ in range(5)
+        ]
+        response = requests.post(URL + "/pkg/assign", json={"packages": packages, "commit": True}, timeout=TIMEOUT)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        # two robots can carry at most two large packages each
+        self.assertEqual(data["assigned_count"], 4)
+        self.assertEqual(data["unassigned"], [4])
+        robots = [a["robot_id"] for a in data["assignments"]]
+        self.assertEqual(sorted(robots), [0, 0, 1, 1])
+
+        status = get_request("/robot/read", params={"robot_id": 0}).json()["status"]
+        self.assertEqual(status["package_count_large"], 2)
+
+        # unknown station
+        response = requests.post(URL + "/pkg/assign", json={"packages": [
+            {"start": "Nowhere", "destination": "Durlach Bahnhof", "size": 0}]}, timeout=TIMEOUT)
+        self.assertEqual(response.status_code, 400)
+
+        print("Package assignment tested.")
+
+    def test_package_store_list_and_unload(self):
+        """
+        Creates packages, lists them by destination (paginated) and unloads them at the stop.
+        """
+        post_request("/sim/reset")
+        post_request("/robot/create")
+        for destination in ("Durlach Bahnhof", "Durlach Bahnhof", "Marktplatz"):
+            response = post_request("/pkg/create", params={
+                "robot_id": 0, "pkg_size": 0, "start": "Karlsruhe Hauptbahnhof", "destination": destination
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("package_id", response.json())
+
+        # same station, different spelling
+        data = get_request("/pkg/list", params={
+            "destination": "Karlsruhe Durlach Bahnhof, Germany", "limit": 1
+        }).json()
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(len(data["packages"]), 1)
+
+        response = post_request("/pkg/unload", params={"robot_id": 0, "station": "Durlach Bahnhof"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["delivered"]), 2)
+
+        data = get_request("/pkg/list", params={"robot_id": 0}).json()
+        self.assertEqual(data["total"], 1)
+        data = get_request("/pkg/list", params={"state": "delivered"}).json()
+        self.assertEqual(data["total"], 2)
+        status = get_request("/robot/read", params={"robot_id": 0}).json()["status"]
+        self.assertEqual(status["package_count"], 1)
+
+        print("Package store tested.")
+
 if __name__ == "__main__":
     unittest.main()
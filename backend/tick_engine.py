@@ -0,0 +1,208 @@
+"""
+tick_engine.py
+
+Drift-free tick loop for the simulation.
+
+Ticks are scheduled against absolute deadlines (start + n * interval) on the monotonic
+clock, so the time spent inside a tick does not shift the following ticks.
+If a tick takes longer than the interval, the overrun is counted and the missed
+deadlines are skipped instead of running a burst of catch-up ticks.
+
+Each tick runs a pipeline of registered "systems". A system is a callable
+`system(sim, ctx)` that processes the whole fleet in one batch. Every system is
+timed separately; an exception in one system is recorded and does not stop the loop.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.profiling import release_thread, sync_thread
+
+
+@dataclass
+class TickContext:
+    """
+    Information handed to every system for one tick.
+
+    tick: tick number (starts at 1)
+    sim_time: simulated date and time after this tick
+    sim_seconds: simulated seconds that passed in this tick
+    interval_s: real seconds per tick
+    """
+
+    tick: int
+    sim_time: dt.datetime
+    sim_seconds: float
+    interval_s: float
+
+
+TickSystem = Callable[[Any, TickContext], None]
+
+
+class SystemStats:
+    """
+    Timing statistics of one system.
+    """
+    __slots__ = ("calls", "errors", "total_s", "last_s", "max_s", "last_error")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.last_s = 0.0
+        self.max_s = 0.0
+        self.last_error: Optional[str] = None
+
+    def record(self, seconds: float) -> None:
+        self.calls += 1
+        self.total_s += seconds
+        self.last_s = seconds
+        if seconds > self.max_s:
+            self.max_s = seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "last_ms": round(self.last_s * 1000.0, 3),
+            "avg_ms": round(self.total_s / self.calls * 1000.0, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_s * 1000.0, 3),
+            "last_error": self.last_error,
+        }
+
+
+class TickEngine:
+    """
+    Runs `on_tick()` and then all registered systems once per interval.
+
+    Args:
+        sim: Object handed to the systems (the Simulation).
+        interval_s: Real seconds per tick.
+        on_tick: Called first in every tick; returns the TickContext
+                 (the Simulation advances its clock here).
+    """
+
+    def __init__(self, sim: Any, interval_s: float, on_tick: Callable[[], TickContext]):
+        self._sim = sim
+        self._interval = float(interval_s)
+        self._on_tick = on_tick
+        self._systems: List[Tuple[str, TickSystem]] = []
+        self._stats: Dict[str, SystemStats] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self.thread: Optional[threading.Thread] = None
+
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.tick_stats = SystemStats()
+
+    # -------------------------
+    # Systems
+    # -------------------------
+    def register(self, name: str, system: TickSystem) -> None:
+        """
+        Append a system to the pipeline (replaces a system with the same name in place).
+        """
+        with self._lock:
+            for i, (n, _) in enumerate(self._systems):
+                if n == name:
+                    self._systems[i] = (name, system)
+                    return
+            self._systems.append((name, system))
+            self._stats[name] = SystemStats()
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._systems = [(n, s) for n, s in self._systems if n != name]
+            self._stats.pop(name, None)
+
+    @property
+    def system_names(self) -> List[str]:
+        return [n for n, _ in self._systems]
+
+    # -------------------------
+    # Loop control
+    # -------------------------
+    @property
+    def interval_s(self) -> float:
+        return self._interval
+
+    @interval_s.setter
+    def interval_s(self, value: float) -> None:
+        self._interval = float(value)
+        self._wake.set()  # re-plan the next deadline with the new interval
+
+    def start(self) -> None:
+        self._stop = False
+        self.thread = threading.Thread(target=self._loop, name="tick-engine", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop = True
+        self._wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _loop(self) -> None:
+        last_deadline = time.monotonic()
+        next_deadline = last_deadline + self._interval
+
+        while not self._stop:
+            delay = next_deadline - time.monotonic()
+            if delay > 0 and self._wake.wait(delay):
+                self._wake.clear()
+                next_deadline = last_deadline + self._interval
+                continue
+
+            sync_thread()  # cProfile sessions (profiling.py)
+            self.run_tick()
+
+            last_deadline = next_deadline
+            next_deadline += self._interval
+            now = time.monotonic()
+            if now > next_deadline:
+                missed = int((now - next_deadline) // self._interval) + 1
+                self.overruns += 1
+                self.skipped_ticks += missed
+                last_deadline += missed * self._interval
+                next_deadline += missed * self._interval
+        release_thread()
+
+    def run_tick(self) -> TickContext:
+        """
+        Run one tick synchronously (also usable from tests and benchmarks).
+        """
+        t0 = time.perf_counter()
+        ctx = self._on_tick()
+        with self._lock:
+            systems = list(self._systems)
+
+        for name, system in systems:
+            stats = self._stats.get(name)
+            s0 = time.perf_counter()
+            try:
+                system(self._sim, ctx)
+            except Exception as e:  # keep ticking, but make the failure visible
+                if stats is not None:
+                    stats.errors += 1
+                    stats.last_error = f"{type(e).__name__}: {e}"
+            if stats is not None:
+                stats.record(time.perf_counter() - s0)
+
+        self.tick_stats.record(time.perf_counter() - t0)
+        return ctx
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_s": self._interval,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "tick": self.tick_stats.to_dict(),
+            "systems": {name: st.to_dict() for name, st in list(self._stats.items())},
+        }
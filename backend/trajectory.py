@@ -0,0 +1,257 @@
+"""
+trajectory.py
+
+Position history of all robots.
+
+The trajectory system (see systems.py) samples the whole fleet once per tick: positions
+are gathered into numpy arrays, and only robots that moved and whose last sample is at
+least `resolution_s` old get a new sample. A robot that stops gets one more sample at
+the stop, and one at the stop position with the time of the previous tick when it
+drives off again, so interpolation does not spread a stop over the next movement.
+Samples (t, lat, lon, progress) are stored per robot in a growable structured array;
+samples older than `retention_s` are dropped.
+
+With `tolerance_m` > 0 a sample that lies on the straight line between its neighbours
+(at the position and time linear interpolation would give, within tolerance_m meters) is
+replaced by the newer sample, so a robot driving along a straight street at constant
+speed only keeps the corner points.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from backend.geodesy import M_PER_DEG_LAT, M_PER_DEG_LON
+from backend.robot import Robot
+
+
+SAMPLE_DTYPE = np.dtype([("t", "<f8"), ("lat", "<f8"), ("lon", "<f8"), ("progress", "<f4")])
+
+
+def _sed_m(a, b, c) -> float:
+    """
+    Distance in meters between sample b and the position interpolated at b's time on
+    the line a -> c (synchronized euclidean distance, local flat approximation).
+    Using time instead of a pure point-to-line distance also keeps stops and speed changes.
+    """
+    dt_ac = c[0] - a[0]
+    f = (b[0] - a[0]) / dt_ac if dt_ac > 0 else 0.0
+    lat = a[1] + (c[1] - a[1]) * f
+    lon = a[2] + (c[2] - a[2]) * f
+    k = math.cos(math.radians(a[1])) * M_PER_DEG_LON
+    return math.hypot((b[1] - lat) * M_PER_DEG_LAT, (b[2] - lon) * k)
+
+
+class Track:
+    """
+    Samples of one robot. data[start:n] holds the valid samples, oldest first.
+    The last two samples are mirrored as tuples so that appending needs no numpy reads.
+    """
+    __slots__ = ("data", "start", "n", "prev", "last")
+
+    def __init__(self, capacity: int = 64):
+        self.data = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self.start = 0
+        self.n = 0
+        self.prev: Optional[tuple] = None
+        self.last: Optional[tuple] = None
+
+    def __len__(self) -> int:
+        return self.n - self.start
+
+    @property
+    def last_t(self) -> float:
+        return self.last[0] if self.last is not None and self.n > self.start else -math.inf
+
+    def append(self, t: float, lat: float, lon: float, progress: float, tolerance_m: float) -> None:
+        sample = (t, lat, lon, progress)
+        if (tolerance_m > 0.0 and self.n - self.start >= 2
+                and _sed_m(self.prev, self.last, sample) <= tolerance_m):
+            self.n -= 1  # the last sample is redundant
+            self.last = self.prev
+        if self.n == len(self.data):
+            if self.start > len(self.data) // 2:
+                # more than half is expired: compact instead of growing
+                live = self.n - self.start
+                self.data[:live] = self.data[self.start:self.n]
+                self.start, self.n = 0, live
+            else:
+                grown = np.zeros(len(self.data) * 2, dtype=SAMPLE_DTYPE)
+                grown[:self.n] = self.data[:self.n]
+                self.data = grown
+        self.data[self.n] = sample
+        self.n += 1
+        self.prev, self.last = self.last, sample
+
+    def expire(self, before_t: float) -> None:
+        t = self.data["t"][self.start:self.n]
+        self.start += int(np.searchsorted(t, before_t, side="left"))
+
+    def samples(self, t0: float = -math.inf, t1: float = math.inf) -> np.ndarray:
+        """Copy of the samples with t0 <= t <= t1."""
+        live = self.data[self.start:self.n]
+        lo = int(np.searchsorted(live["t"], t0, side="left"))
+        hi = int(np.searchsorted(live["t"], t1, side="right"))
+        return live[lo:hi].copy()
+
+
+def decimate(samples: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Reduce samples to at most max_points (evenly spaced, first and last are kept).
+    """
+    n = len(samples)
+    if max_points <= 0 or n <= max_points:
+        return samples
+    if max_points == 1:
+        return samples[-1:]
+    idx = np.unique(np.linspace(0, n - 1, max_points).round().astype(np.int64))
+    return samples[idx]
+
+
+def replay(samples: np.ndarray, speed: float = 1.0, fps: float = 10.0,
+           sleep=time.sleep) -> Iterator[Dict[str, Any]]:
+    """
+    Play a trajectory back: yields interpolated frames `fps` times per second while the
+    recorded time runs `speed` times faster than real time.
+    """
+    if len(samples) == 0:
+        return
+    speed = max(float(speed), 1e-6)
+    fps = min(max(float(fps), 0.1), 60.0)
+    t = samples["t"]
+    step = speed / fps  # recorded seconds per frame
+    frames = np.arange(t[0], t[-1], step) if t[-1] > t[0] else np.empty(0)
+    frames = np.append(frames, t[-1])
+    lat = np.interp(frames, t, samples["lat"])
+    lon = np.interp(frames, t, samples["lon"])
+    prog = np.interp(frames, t, samples["progress"])
+
+    start = time.monotonic()
+    for i in range(len(frames)):
+        delay = start + i / fps - time.monotonic()
+        if delay > 0:
+            sleep(delay)
+        yield {"t": float(frames[i]), "position": (float(lat[i]), float(lon[i])),
+               "progress": round(float(prog[i]), 6)}
+
+
+class TrajectoryStore:
+    """
+    Trajectories of the fleet.
+
+    Args:
+        resolution_s: Minimum time between two samples of a robot (the effective
+                      resolution is never finer than one tick).
+        retention_s: Samples older than this are dropped.
+        tolerance_m: Straight-line simplification tolerance (0 keeps every sample).
+    """
+
+    def __init__(self, resolution_s: float = 1.0, retention_s: float = 3600.0, tolerance_m: float = 1.0):
+        self.resolution_s = float(resolution_s)
+        self.retention_s = float(retention_s)
+        self.tolerance_m = float(tolerance_m)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tracks: Dict[int, Track] = {}
+            self._last_lat = np.empty(0)
+            self._last_lon = np.empty(0)
+            self._stopped = np.empty(0, dtype=bool)  # stop sample taken, not moved since
+            self._last_now = -math.inf  # time of the previous record()
+            self._last_expire = 0.0
+
+    def record(self, robots: Sequence[Robot], now: Optional[float] = None) -> int:
+        """
+        Sample the fleet once. Returns the number of stored samples.
+        """
+        now = time.time() if now is None else float(now)
+        n = len(robots)
+        if n == 0:
+            return 0
+        pos = [r.position for r in robots]
+        lat = np.fromiter((p[0] if p else np.nan for p in pos), dtype=np.float64, count=n)
+        lon = np.fromiter((p[1] if p else np.nan for p in pos), dtype=np.float64, count=n)
+
+        with self._lock:
+            if len(self._last_lat) != n:  # fleet changed: every robot counts as moved
+                self._last_lat = np.full(n, np.nan)
+                self._last_lon = np.full(n, np.nan)
+                self._stopped = np.zeros(n, dtype=bool)
+            prev_now, self._last_now = self._last_now, now
+            known = ~np.isnan(lat)
+            moved = known & ((lat != self._last_lat) | (lon != self._last_lon))
+            idx = np.flatnonzero(moved)
+            done = []
+            stored = 0
+            tracks, resolution, tolerance, stopped = self._tracks, self.resolution_s, self.tolerance_m, self._stopped
+            for i, la, lo in zip(idx.tolist(), lat[idx].tolist(), lon[idx].tolist()):
+                robot = robots[i]
+                track = tracks.get(robot.robot_id)
+                if track is None:
+                    track = tracks[robot.robot_id] = Track()
+                elif now - track.last_t < resolution:
+                    continue
+                if stopped[i] and prev_now > track.last_t:
+                    # drives off: it stood at the stop until the previous tick
+                    _, s_lat, s_lon, s_progress = track.last
+                    track.append(prev_now, s_lat, s_lon, s_progress, tolerance)
+                    stored += 1
+                track.append(now, la, lo, robot.progress, tolerance)
+                done.append(i)
+            self._last_lat[done] = lat[done]
+            self._last_lon[done] = lon[done]
+            stopped[done] = False
+            stored += len(done)
+
+            # robots that did not move since their last sample: one sample at the stop
+            for i in np.flatnonzero(known & ~moved & ~stopped).tolist():
+                robot = robots[i]
+                track = tracks.get(robot.robot_id)
+                if track is None or now - track.last_t < resolution:
+                    continue
+                track.append(now, float(lat[i]), float(lon[i]), robot.progress, tolerance)
+                stopped[i] = True
+                stored += 1
+
+            # retention check once per second is plenty
+            if now - self._last_expire >= 1.0:
+                self._last_expire = now
+                cutoff = now - self.retention_s
+                for track in self._tracks.values():
+                    if track.n > track.start and track.data["t"][track.start] < cutoff:
+                        track.expire(cutoff)
+            return stored
+
+    def query(self, robot_id: int, t0: Optional[float] = None, t1: Optional[float] = None,
+              max_points: int = 0) -> np.ndarray:
+        """
+        Samples of a robot in [t0, t1], decimated to max_points (0 = all).
+        """
+        with self._lock:
+            track = self._tracks.get(robot_id)
+            if track is None:
+                return np.zeros(0, dtype=SAMPLE_DTYPE)
+            samples = track.samples(-math.inf if t0 is None else t0, math.inf if t1 is None else t1)
+        return decimate(samples, max_points)
+
+    @staticmethod
+    def to_list(samples: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {"t": t, "position": (lat, lon), "progress": round(p, 6)}
+            for t, lat, lon, p in samples.tolist()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sum(len(t) for t in self._tracks.values())
+            nbytes = sum(t.data.nbytes for t in self._tracks.values())
+        return {"robots": len(self._tracks), "samples": samples, "bytes": nbytes,
+                "resolution_s": self.resolution_s, "retention_s": self.retention_s,
+                "tolerance_m": self.tolerance_m}
@@ -0,0 +1,137 @@
+"""
+warmup.py
+
+Background warmup after the backend starts.
+
+Importing backend.app only loads Flask, numpy and the simulation, so robot / sim
+endpoints answer right after the start. The heavy parts are loaded on first use
+(scipy in road_network / stations, OSMnx + Folium in geography / api.map). To keep that
+first use from being slow, a background thread loads them right after the start:
+
+    stations      station catalog, name index, coordinates, KD-tree, distance matrix
+    tram_lines    KVV line catalog
+    routing       scipy sparse graph routines (road_network.py)
+    geo_stack     OSMnx, Folium (about a second of imports)
+    road_network  drive network of the default city into the graph cache: read from
+                  backend/graphs/ or, the first time, OSMnx download + CSR matrix
+
+The process is ready (GET /ready, "ready" in /api/sim/heartbeat) once every stage has
+finished. A failed stage (e.g. the road network without internet access) does not block
+readiness: the endpoints that need it load it again on demand and report the error.
+
+Disabled with KVV_WARMUP=0 (tests and benchmarks that replace the road network).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.metrics import METRICS
+
+WARMUP_ENABLED: bool = os.environ.get("KVV_WARMUP", "1") == "1"
+
+
+def _stations() -> None:
+    from backend.stations import (station_distance_matrix, station_index, station_latlon,
+                                  station_tree)
+
+    station_index("Karlsruhe Hauptbahnhof")  # builds the name index
+    station_latlon()
+    station_tree()
+    station_distance_matrix()
+
+
+def _tram_lines() -> None:
+    from backend.tram_lines import list_lines
+
+    list_lines()
+
+
+def _routing() -> None:
+    import scipy.sparse.csgraph  # noqa: F401
+    import scipy.spatial  # noqa: F401
+
+
+def _geo_stack() -> None:
+    import branca.element  # noqa: F401
+    import folium  # noqa: F401
+    import osmnx  # noqa: F401
+
+
+def _road_network() -> None:
+    from backend.road_network import load_road_network
+
+    load_road_network()
+
+
+STAGES: List[Tuple[str, Callable[[], Any]]] = [
+    ("stations", _stations),
+    ("tram_lines", _tram_lines),
+    ("routing", _routing),
+    ("geo_stack", _geo_stack),
+    ("road_network", _road_network),
+]
+
+
+class Warmup:
+    """
+    Runs the stages one after another in a daemon thread and records their state.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[], Any]]] = STAGES):
+        self._stages = list(stages)
+        self._state: Dict[str, Dict[str, Any]] = {
+            name: {"state": "pending", "seconds": None, "error": None} for name, _ in self._stages
+        }
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self.created_at = time.time()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self.thread.start()
+
+    def skip(self) -> None:
+        """
+        No warmup: everything is loaded on first use, the process is ready at once.
+        """
+        with self._lock:
+            for st in self._state.values():
+                st["state"] = "skipped"
+        self._done.set()
+
+    def _run(self) -> None:
+        for name, stage in self._stages:
+            with self._lock:
+                self._state[name]["state"] = "running"
+            t0 = time.perf_counter()
+            try:
+                stage()
+                state, error = "done", None
+            except Exception as e:  # a failed stage is loaded again on demand
+                state, error = "failed", f"{type(e).__name__}: {e}"
+            seconds = time.perf_counter() - t0
+            METRICS.observe("kvv_warmup_stage_seconds", seconds, stage=name)
+            with self._lock:
+                self._state[name].update(state=state, seconds=round(seconds, 3), error=error)
+        self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: dict(st) for name, st in self._state.items()}
+        return {"ready": self.ready, "uptime_s": round(time.time() - self.created_at, 3), "stages": stages}
+
+
+WARMUP = Warmup()